@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agenda de Execuções do Pipeline GLPI
+====================================
+
+Núcleo de agendamento usado pelo agendador contínuo: os horários seguem uma
+grade fixa (intervalo a partir de uma origem ou expressão cron), calculada a
+partir do horário previsto e não do fim da execução anterior, de modo que a
+duração das execuções não desloca os horários seguintes.
+
+- Intervalo fixo: qualquer duração, inclusive abaixo de um minuto (ex.: 30s)
+- Cron: 5 campos (minuto, hora, dia do mês, mês, dia da semana), com *, listas,
+  faixas e passos (ex.: "*/15 8-18 * * 1-5")
+- Jitter: atraso aleatório de até N segundos sobre cada horário da grade
+- Execuções perdidas (execução anterior mais longa que o intervalo): 'pular'
+  segue para o próximo horário da grade; 'recuperar' executa uma vez
+  imediatamente e depois volta à grade
+- Espera por evento: acorda no horário previsto ou assim que a parada é pedida
+
+Autor: Sistema de Análise GLPI
+Data: 2024
+"""
+
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+# Políticas para horários da grade que passaram durante uma execução
+POLITICAS_ATRASO = ('pular', 'recuperar')
+
+# No Windows a espera de um Event não é interrompida por Ctrl+C: espera em fatias de 1 segundo
+FATIA_ESPERA = 1.0 if os.name == 'nt' else None
+
+# Limite de horários percorridos ao contar execuções perdidas
+LIMITE_CONTAGEM_PERDIDAS = 100000
+
+# Campos da expressão cron: (nome, mínimo, máximo)
+CAMPOS_CRON = [
+    ('minuto', 0, 59),
+    ('hora', 0, 23),
+    ('dia do mês', 1, 31),
+    ('mês', 1, 12),
+    ('dia da semana', 0, 7),
+]
+
+
+def interpretar_intervalo(texto: str) -> float:
+    """
+    Converte um intervalo em texto para segundos.
+    
+    Args:
+        texto: Número com sufixo s, m ou h (ex.: '30s', '15m', '1h'); sem sufixo, minutos
+    
+    Returns:
+        float: Intervalo em segundos
+    """
+    texto = texto.strip().lower()
+    multiplicadores = {'s': 1, 'm': 60, 'h': 3600}
+    multiplicador = multiplicadores.get(texto[-1:]) if texto else None
+    numero = texto[:-1] if multiplicador else texto
+    
+    try:
+        segundos = float(numero) * (multiplicador or 60)
+    except ValueError:
+        raise ValueError(f"Intervalo inválido: '{texto}' (use, por exemplo, 30s, 15m ou 1h)")
+    if segundos <= 0:
+        raise ValueError(f"Intervalo deve ser positivo: '{texto}'")
+    return segundos
+
+
+def formatar_intervalo(segundos: float) -> str:
+    """
+    Descreve um intervalo em segundos na maior unidade exata.
+    
+    Args:
+        segundos: Intervalo em segundos
+    
+    Returns:
+        str: Intervalo legível (ex.: '60 minutos', '30 segundos')
+    """
+    if segundos % 3600 == 0:
+        return f"{segundos / 3600:g} hora(s)"
+    if segundos % 60 == 0:
+        return f"{segundos / 60:g} minutos"
+    return f"{segundos:g} segundos"
+
+
+class IntervaloFixo:
+    """
+    Horários a cada intervalo fixo a partir de uma origem (taxa fixa, sem deriva).
+    """
+    
+    def __init__(self, segundos: float, origem: Optional[datetime] = None):
+        """
+        Inicializa o intervalo.
+        
+        Args:
+            segundos: Intervalo entre execuções, em segundos (pode ser menor que um minuto)
+            origem: Primeiro horário da grade (padrão: início da agenda)
+        """
+        if segundos <= 0:
+            raise ValueError("O intervalo deve ser positivo")
+        self.intervalo = timedelta(seconds=segundos)
+        self.origem = origem
+    
+    def proxima(self, apos: datetime) -> datetime:
+        """
+        Calcula o primeiro horário da grade estritamente posterior a um instante.
+        
+        Args:
+            apos: Instante de referência
+        
+        Returns:
+            datetime: Próximo horário da grade
+        """
+        if self.origem is None or apos < self.origem:
+            return self.origem or apos + self.intervalo
+        
+        passos = (apos - self.origem) // self.intervalo + 1
+        return self.origem + passos * self.intervalo
+    
+    def __str__(self) -> str:
+        """Descrição da regra para os logs."""
+        return f"a cada {formatar_intervalo(self.intervalo.total_seconds())}"
+
+
+class ExpressaoCron:
+    """
+    Horários definidos por uma expressão cron de 5 campos (resolução de um minuto).
+    
+    Como no cron tradicional, quando dia do mês e dia da semana são ambos
+    restritos, basta um deles coincidir; domingo é 0 ou 7.
+    """
+    
+    def __init__(self, expressao: str):
+        """
+        Interpreta a expressão.
+        
+        Args:
+            expressao: Expressão cron (ex.: "0 * * * *" para toda hora cheia)
+        """
+        campos = expressao.split()
+        if len(campos) != len(CAMPOS_CRON):
+            raise ValueError(f"Expressão cron inválida: '{expressao}' (esperados 5 campos)")
+        
+        self.expressao = expressao
+        valores = [self._interpretar_campo(campo, *definicao) for campo, definicao in zip(campos, CAMPOS_CRON)]
+        self.minutos, self.horas, self.dias, self.meses, dias_semana = valores
+        self.dias_semana = {dia % 7 for dia in dias_semana}
+        
+        # Campos iniciados por '*' não restringem o dia
+        self.dia_restrito = not campos[2].startswith('*')
+        self.dia_semana_restrito = not campos[4].startswith('*')
+        
+        # Expressões que nunca coincidem (ex.: 30 de fevereiro) são rejeitadas aqui
+        self.proxima(datetime(2000, 1, 1))
+    
+    @staticmethod
+    def _interpretar_campo(campo: str, nome: str, minimo: int, maximo: int) -> set:
+        """
+        Interpreta um campo: '*', valores, faixas 'a-b' e passos '/n', separados por vírgula.
+        
+        Args:
+            campo: Texto do campo
+            nome: Nome do campo para as mensagens de erro
+            minimo: Menor valor aceito
+            maximo: Maior valor aceito
+        
+        Returns:
+            set: Valores do campo
+        """
+        valores = set()
+        for parte in campo.split(','):
+            faixa, _, passo = parte.partition('/')
+            try:
+                passo = int(passo) if passo else 1
+                if faixa == '*':
+                    inicio, fim = minimo, maximo
+                elif '-' in faixa:
+                    inicio, fim = (int(valor) for valor in faixa.split('-', 1))
+                else:
+                    inicio = int(faixa)
+                    fim = maximo if parte.count('/') else inicio
+            except ValueError:
+                raise ValueError(f"Campo {nome} inválido na expressão cron: '{campo}'")
+            
+            if passo <= 0 or not minimo <= inicio <= fim <= maximo:
+                raise ValueError(f"Campo {nome} fora do intervalo {minimo}-{maximo}: '{campo}'")
+            valores.update(range(inicio, fim + 1, passo))
+        return valores
+    
+    def _dia_coincide(self, data: datetime) -> bool:
+        """
+        Verifica o dia do mês e o dia da semana de uma data.
+        
+        Args:
+            data: Data verificada
+        
+        Returns:
+            bool: True se o dia é aceito pela expressão
+        """
+        no_mes = data.day in self.dias
+        na_semana = (data.weekday() + 1) % 7 in self.dias_semana
+        if self.dia_restrito and self.dia_semana_restrito:
+            return no_mes or na_semana
+        return no_mes and na_semana
+    
+    def proxima(self, apos: datetime) -> datetime:
+        """
+        Calcula o primeiro horário da expressão estritamente posterior a um instante.
+        
+        Args:
+            apos: Instante de referência
+        
+        Returns:
+            datetime: Próximo horário (segundos zerados)
+        """
+        horario = apos.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = apos.year + 5
+        
+        # Avança pelo maior campo que não coincide, sem percorrer minuto a minuto
+        while horario.year <= limite:
+            if horario.month not in self.meses:
+                ano, mes = divmod(horario.month, 12)
+                horario = horario.replace(year=horario.year + ano, month=mes + 1, day=1, hour=0, minute=0)
+            elif not self._dia_coincide(horario):
+                horario = (horario + timedelta(days=1)).replace(hour=0, minute=0)
+            elif horario.hour not in self.horas:
+                horario = (horario + timedelta(hours=1)).replace(minute=0)
+            elif horario.minute not in self.minutos:
+                horario += timedelta(minutes=1)
+            else:
+                return horario
+        
+        raise ValueError(f"Expressão cron sem horários válidos: '{self.expressao}'")
+    
+    def __str__(self) -> str:
+        """Descrição da regra para os logs."""
+        return f"cron '{self.expressao}'"
+
+
+class AgendaExecucoes:
+    """
+    Horários das execuções sobre uma grade fixa, com jitter e política para execuções perdidas.
+    """
+    
+    def __init__(self, regra, jitter_segundos: float = 0.0, politica_atraso: str = 'pular',
+                 executar_ao_iniciar: bool = True):
+        """
+        Inicializa a agenda.
+        
+        Args:
+            regra: IntervaloFixo ou ExpressaoCron
+            jitter_segundos: Atraso aleatório máximo somado a cada horário da grade
+            politica_atraso: 'pular' ou 'recuperar' (horários que passaram durante uma execução)
+            executar_ao_iniciar: Executa imediatamente ao iniciar, antes do primeiro horário da grade
+        """
+        if politica_atraso not in POLITICAS_ATRASO:
+            raise ValueError(f"Política de atraso inválida: {politica_atraso} (use {' ou '.join(POLITICAS_ATRASO)})")
+        if jitter_segundos < 0:
+            raise ValueError("O jitter não pode ser negativo")
+        
+        self.regra = regra
+        self.jitter = timedelta(seconds=jitter_segundos)
+        self.politica_atraso = politica_atraso
+        self.executar_ao_iniciar = executar_ao_iniciar
+        
+        # Horário previsto na grade (sem jitter) e horário efetivo da próxima execução
+        self.proxima_nominal = None
+        self.proximo_horario = None
+        self.execucoes_perdidas = 0
+    
+    def iniciar(self, agora: Optional[datetime] = None) -> datetime:
+        """
+        Define o primeiro horário de execução.
+        
+        Args:
+            agora: Instante de início (padrão: agora)
+        
+        Returns:
+            datetime: Horário da primeira execução
+        """
+        agora = agora or datetime.now()
+        if isinstance(self.regra, IntervaloFixo) and self.regra.origem is None:
+            self.regra.origem = agora
+        
+        if self.executar_ao_iniciar:
+            self.proxima_nominal = self.proximo_horario = agora
+        else:
+            self._agendar(self.regra.proxima(agora))
+        return self.proximo_horario
+    
+    def concluir(self, agora: Optional[datetime] = None) -> datetime:
+        """
+        Calcula o horário seguinte após uma execução, a partir do horário previsto da execução concluída.
+        
+        Args:
+            agora: Instante de conclusão (padrão: agora)
+        
+        Returns:
+            datetime: Horário da próxima execução
+        """
+        agora = agora or datetime.now()
+        nominal = self.regra.proxima(self.proxima_nominal)
+        
+        # Horários da grade que passaram enquanto a execução durava
+        self.execucoes_perdidas = 0
+        while nominal <= agora and self.execucoes_perdidas < LIMITE_CONTAGEM_PERDIDAS:
+            self.execucoes_perdidas += 1
+            nominal = self.regra.proxima(nominal)
+        
+        if self.execucoes_perdidas and self.politica_atraso == 'recuperar':
+            # Uma única execução cobre os horários perdidos; a grade segue a partir dela
+            self.proxima_nominal = self.proximo_horario = agora
+        else:
+            self._agendar(self.regra.proxima(agora) if self.execucoes_perdidas else nominal)
+        return self.proximo_horario
+    
+    def _agendar(self, nominal: datetime) -> None:
+        """
+        Registra o próximo horário da grade e o horário efetivo, com o jitter sorteado.
+        
+        Args:
+            nominal: Horário previsto na grade
+        """
+        self.proxima_nominal = nominal
+        atraso = random.uniform(0, self.jitter.total_seconds()) if self.jitter else 0.0
+        self.proximo_horario = nominal + timedelta(seconds=atraso)
+    
+    def aguardar(self, parada: threading.Event) -> bool:
+        """
+        Espera até o horário da próxima execução ou até a parada ser pedida.
+        
+        Args:
+            parada: Evento sinalizado para encerrar a espera
+        
+        Returns:
+            bool: True no horário da execução, False se a parada foi pedida
+        """
+        while not parada.is_set():
+            # O restante é recalculado a cada despertar (ajustes de relógio, suspensão da máquina)
+            restante = (self.proximo_horario - datetime.now()).total_seconds()
+            if restante <= 0:
+                return True
+            if FATIA_ESPERA is not None:
+                restante = min(restante, FATIA_ESPERA)
+            parada.wait(restante)
+        return False
+    
+    def __str__(self) -> str:
+        """Descrição da agenda para os logs."""
+        descricao = str(self.regra)
+        if self.jitter:
+            descricao += f", jitter de até {formatar_intervalo(self.jitter.total_seconds())}"
+        return f"{descricao}, execuções perdidas: {self.politica_atraso}"
+
+
+def proximos_horarios(regra, apos: datetime, quantidade: int = 3) -> List[datetime]:
+    """
+    Lista os próximos horários de uma regra (para conferência nos logs).
+    
+    Args:
+        regra: IntervaloFixo ou ExpressaoCron
+        apos: Instante de referência
+        quantidade: Quantidade de horários
+    
+    Returns:
+        List[datetime]: Horários em ordem
+    """
+    horarios = []
+    for _ in range(quantidade):
+        apos = regra.proxima(apos)
+        horarios.append(apos)
+    return horarios
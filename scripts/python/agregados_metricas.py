@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agregados parciais e mescláveis das métricas de tickets GLPI
+Permitem calcular as métricas do analisador bloco a bloco, sem manter o histórico inteiro em memória:
+contagens por dimensão, mês e dia da semana, somas e sketches de TTR por grupo e SLA por prioridade
+"""
+
+import math
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from colunas_derivadas import ColunasDerivadas
+from indice_relacionamentos import SEPARADOR_MULTIPLOS
+
+# Valores guardados exatamente por sketch antes de passar para buckets logarítmicos
+LIMITE_VALORES_EXATOS = 100000
+
+# Erro relativo máximo dos quantis depois da conversão para buckets (0,5%)
+ERRO_RELATIVO_PADRAO = 0.005
+
+# Métricas calculadas por AgregadosMetricas, declaradas de antemão e avaliadas em uma passada por bloco:
+# - contagem e percentual de tickets por dimensão (nas múltiplas, cada valor de 'A; B' conta o ticket)
+# - contagem e percentual por mês e dia da semana de criação, com o período coberto
+# - TTR geral (média, mediana, mínimo, máximo e percentis) e TTR por dimensão (média, mediana e contagem)
+# - SLA geral e por prioridade (total, dentro do limite e TTR médio)
+DIMENSOES = ('Status', 'Entidade', 'Grupo', 'Categoria', 'Técnico', 'Localização')
+DIMENSOES_MULTIPLAS = ('Grupo', 'Técnico')
+DIMENSOES_TTR = ('Grupo',)
+
+# Nomes dos dias da semana, na ordem de Series.dt.dayofweek
+DIAS_SEMANA = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# Percentis de TTR exibidos pelo analisador
+PERCENTIS_TTR = (0.25, 0.75, 0.90, 0.95)
+
+
+def explodir_multiplos(df, coluna):
+    """Uma linha por valor das colunas com vários vínculos por ticket (ex.: 'Técnico A; Técnico B')"""
+    valores = df[coluna]
+    if isinstance(valores.dtype, pd.CategoricalDtype):
+        return _explodir_categorias(df, coluna)
+    
+    try:
+        partes = valores.str.split(SEPARADOR_MULTIPLOS, regex=False)
+    except AttributeError:
+        return df  # Coluna sem texto (ex.: toda vazia)
+    
+    if not (partes.str.len() > 1).any():
+        return df
+    return df.assign(**{coluna: partes}).explode(coluna)
+
+
+def _explodir_categorias(df, coluna):
+    """Explosão de uma coluna categórica feita sobre as categorias, sem dividir o texto de cada ticket"""
+    valores = df[coluna]
+    partes = [str(categoria).split(SEPARADOR_MULTIPLOS) for categoria in valores.cat.categories]
+    
+    # Partes de cada categoria em um vetor único; a posição extra ao final atende os valores vazios (código -1)
+    quantidades = np.array([len(lista) for lista in partes] + [1])
+    codigos = valores.cat.codes.to_numpy()
+    por_linha = quantidades[codigos]
+    if not (por_linha > 1).any():
+        return df
+    
+    novas_categorias = sorted({parte for lista in partes for parte in lista})
+    posicoes = {categoria: indice for indice, categoria in enumerate(novas_categorias)}
+    codigos_partes = np.array([posicoes[parte] for lista in partes for parte in lista] + [-1])
+    inicios = np.concatenate([[0], np.cumsum(quantidades[:-1])])
+    
+    linhas = np.repeat(np.arange(len(df)), por_linha)
+    deslocamentos = np.arange(len(linhas)) - np.repeat(np.cumsum(por_linha) - por_linha, por_linha)
+    novos_codigos = codigos_partes[np.repeat(inicios[codigos], por_linha) + deslocamentos]
+    
+    explodidos = pd.Categorical.from_codes(novos_codigos, categories=novas_categorias).remove_unused_categories()
+    return df.iloc[linhas].assign(**{coluna: explodidos})
+
+
+def contar_valores(df, coluna):
+    """Tickets por valor de uma dimensão (nas múltiplas, cada valor conta o ticket), sem as categorias ausentes"""
+    if coluna in DIMENSOES_MULTIPLAS and isinstance(df[coluna].dtype, pd.CategoricalDtype):
+        # Contagem por categoria repassada a cada parte, sem gerar uma linha por (ticket, valor)
+        partes = Counter()
+        for categoria, quantidade in df[coluna].value_counts().items():
+            for parte in str(categoria).split(SEPARADOR_MULTIPLOS):
+                partes[parte] += quantidade
+        contagem = pd.Series(dict(sorted(partes.items())), dtype='int64', name='count')
+        contagem = contagem.sort_values(ascending=False, kind='stable')
+    elif coluna in DIMENSOES_MULTIPLAS:
+        contagem = explodir_multiplos(df[[coluna]], coluna)[coluna].value_counts()
+    elif coluna == 'Localização':
+        # Contagem sobre os números, sem os vazios (NaN/NA viraria um rótulo 'nan' ou '<NA>', conforme a
+        # versão do pandas); apenas os rótulos do resultado viram texto
+        contagem = df[coluna].value_counts()
+        contagem.index = contagem.index.astype(str)
+    else:
+        contagem = df[coluna].value_counts()
+    return contagem[contagem > 0]
+
+
+def contar_dias_semana(dias):
+    """Tickets por dia da semana (nomes em inglês, como Series.dt.day_name), a partir do número do dia"""
+    contagem = dias.value_counts()
+    contagem.index = [DIAS_SEMANA[int(dia)] for dia in contagem.index]
+    return contagem
+
+
+def _somar(contador, contagem, sinal):
+    """Soma (ou subtrai, com sinal=-1) uma contagem do pandas a um Counter, sem rótulos vazios"""
+    # NaN não é igual a si mesmo: ao desserializar o estado, cada NaN viraria uma chave distinta
+    contagem = contagem[contagem.index.notna()]
+    if sinal > 0:
+        contador.update(contagem.to_dict())
+    else:
+        contador.subtract(contagem.to_dict())
+
+
+def _alterar_sketch(sketch, valores, sinal):
+    """Adiciona valores ao sketch (ou os remove, com sinal=-1)"""
+    if sinal > 0:
+        sketch.adicionar(valores)
+    else:
+        sketch.remover(valores)
+
+
+class SketchQuantis:
+    """Quantis mescláveis: exatos até limite_exatos valores, depois em buckets logarítmicos com erro relativo limitado"""
+    
+    def __init__(self, erro_relativo=ERRO_RELATIVO_PADRAO, limite_exatos=LIMITE_VALORES_EXATOS):
+        """Cria o sketch vazio (limite_exatos=None mantém os quantis sempre exatos)"""
+        self.gamma = (1 + erro_relativo) / (1 - erro_relativo)
+        self.log_gamma = math.log(self.gamma)
+        self.limite_exatos = limite_exatos
+        
+        # Enquanto exato, os valores ficam em arrays; depois, apenas contagens por bucket
+        self.valores = []
+        self.buckets = None
+        self.nao_positivos = 0
+        
+        self.total = 0
+        self.minimo = math.inf
+        self.maximo = -math.inf
+    
+    @property
+    def exato(self):
+        """Indica se os quantis ainda são calculados sobre os valores originais"""
+        return self.buckets is None
+    
+    def adicionar(self, valores):
+        """Incorpora um array de valores (NaN são ignorados)"""
+        valores = np.asarray(valores, dtype='float64')
+        valores = valores[~np.isnan(valores)]
+        if not len(valores):
+            return
+        
+        self.total += len(valores)
+        self.minimo = min(self.minimo, float(valores.min()))
+        self.maximo = max(self.maximo, float(valores.max()))
+        
+        if self.exato:
+            self.valores.append(valores)
+            if self._acima_do_limite():
+                self._converter_em_buckets()
+        else:
+            self._adicionar_buckets(valores)
+    
+    def remover(self, valores):
+        """Retira valores incorporados antes (em buckets, os extremos passam a ser estimados pelos buckets)"""
+        valores = np.asarray(valores, dtype='float64')
+        valores = valores[~np.isnan(valores)]
+        if not len(valores):
+            return
+        
+        if self.exato:
+            atuais = np.sort(np.concatenate(self.valores)) if self.valores else np.empty(0)
+            retirados = np.sort(valores)
+            
+            # Cada valor retirado ocupa a posição da sua primeira ocorrência mais a ordem entre os repetidos
+            ordem = np.arange(len(retirados)) - np.searchsorted(retirados, retirados, side='left')
+            posicoes = np.searchsorted(atuais, retirados, side='left') + ordem
+            encontrados = posicoes < len(atuais)
+            encontrados[encontrados] = atuais[posicoes[encontrados]] == retirados[encontrados]
+            
+            manter = np.ones(len(atuais), dtype=bool)
+            manter[posicoes[encontrados]] = False
+            atuais = atuais[manter]
+            
+            self.valores = [atuais]
+            self.total = len(atuais)
+            self.minimo = float(atuais[0]) if len(atuais) else math.inf
+            self.maximo = float(atuais[-1]) if len(atuais) else -math.inf
+            return
+        
+        positivos = valores[valores > 0]
+        self.nao_positivos = max(self.nao_positivos - (len(valores) - len(positivos)), 0)
+        indices, contagens = np.unique(np.ceil(np.log(positivos) / self.log_gamma).astype('int64'), return_counts=True)
+        self.buckets.subtract(dict(zip(indices.tolist(), contagens.tolist())))
+        self.buckets = +self.buckets
+        self.total = self.nao_positivos + sum(self.buckets.values())
+        
+        if not self.total:
+            self.minimo, self.maximo = math.inf, -math.inf
+            return
+        if self.buckets and (valores.min() <= self.minimo or valores.max() >= self.maximo):
+            estimativas = [2 * self.gamma ** indice / (self.gamma + 1) for indice in (min(self.buckets), max(self.buckets))]
+            if not (self.nao_positivos and self.minimo <= 0):
+                self.minimo = estimativas[0]
+            self.maximo = estimativas[1]
+    
+    def _acima_do_limite(self):
+        """Indica se os valores guardados passaram do limite para os quantis exatos"""
+        return self.limite_exatos is not None and self.total > self.limite_exatos
+    
+    def _adicionar_buckets(self, valores):
+        """Soma valores às contagens dos buckets logarítmicos"""
+        positivos = valores[valores > 0]
+        self.nao_positivos += len(valores) - len(positivos)
+        indices, contagens = np.unique(np.ceil(np.log(positivos) / self.log_gamma).astype('int64'), return_counts=True)
+        self.buckets.update(dict(zip(indices.tolist(), contagens.tolist())))
+    
+    def _converter_em_buckets(self):
+        """Troca os valores guardados pelas contagens dos buckets"""
+        valores = np.concatenate(self.valores) if self.valores else np.empty(0)
+        self.valores = None
+        self.buckets = Counter()
+        self._adicionar_buckets(valores)
+    
+    def mesclar(self, outro):
+        """Incorpora outro sketch (com o mesmo erro relativo)"""
+        if not outro.total:
+            return
+        
+        self.total += outro.total
+        self.minimo = min(self.minimo, outro.minimo)
+        self.maximo = max(self.maximo, outro.maximo)
+        
+        if self.exato and outro.exato:
+            self.valores.extend(outro.valores)
+            if self._acima_do_limite():
+                self._converter_em_buckets()
+            return
+        
+        if self.exato:
+            self._converter_em_buckets()
+        if outro.exato:
+            self._adicionar_buckets(np.concatenate(outro.valores))
+        else:
+            self.buckets.update(outro.buckets)
+            self.nao_positivos += outro.nao_positivos
+    
+    def quantil(self, q):
+        """Quantil q (0 a 1); interpolação linear enquanto exato, como o pandas"""
+        if not self.total:
+            return math.nan
+        if self.exato:
+            # Valores de vários blocos são unidos uma única vez, para as consultas seguintes
+            if len(self.valores) > 1:
+                self.valores = [np.concatenate(self.valores)]
+            return float(np.quantile(self.valores[0], q))
+        
+        posicao = q * (self.total - 1)
+        acumulado = self.nao_positivos
+        if posicao < acumulado:
+            return min(0.0, self.maximo)
+        
+        for indice in sorted(self.buckets):
+            acumulado += self.buckets[indice]
+            if acumulado > posicao:
+                # Ponto do bucket com erro relativo mínimo, limitado aos extremos observados
+                estimativa = 2 * self.gamma ** indice / (self.gamma + 1)
+                return min(max(estimativa, self.minimo), self.maximo)
+        return self.maximo
+
+
+class AgregadosMetricas:
+    """Agregados parciais das métricas do analisador, atualizados bloco a bloco e mescláveis entre si"""
+    
+    def __init__(self, nomes_prioridade, sla_config, limite_exatos=LIMITE_VALORES_EXATOS, descartar_duplicatas=True):
+        """Cria os agregados vazios (nomes_prioridade: código -> nome; sla_config: nome -> horas)"""
+        self.nomes_prioridade = nomes_prioridade
+        self.sla_config = sla_config
+        
+        # Limite de valores exatos dos sketches de TTR (None: quantis sempre exatos) e descarte de IDs repetidos
+        self.limite_exatos = limite_exatos
+        self.descartar_duplicatas = descartar_duplicatas
+        
+        self.total = 0
+        self.duplicatas = 0
+        self.colunas = set()
+        
+        # Bitmap dos IDs já vistos, para descartar tickets repetidos entre blocos
+        self.ids_vistos = np.zeros(0, dtype='uint8')
+        
+        self.contagens = {}
+        self.por_mes = Counter()
+        self.por_dia = Counter()
+        self.data_min = None
+        self.data_max = None
+        
+        self.ttr = self._novo_sketch()
+        self.ttr_soma = 0.0
+        self.ttr_dimensoes = {coluna: {} for coluna in DIMENSOES_TTR}
+        
+        self.sla_total = 0
+        self.sla_dentro = 0
+        self.sla_prioridade = {}
+    
+    def _novo_sketch(self):
+        """Sketch de quantis com o limite de valores exatos destes agregados"""
+        return SketchQuantis(limite_exatos=self.limite_exatos)
+    
+    def _primeiras_ocorrencias(self, ids):
+        """Máscara dos IDs ainda não vistos (em blocos anteriores ou antes no mesmo bloco), marcando-os"""
+        if len(ids) and ids.max() >> 3 >= len(self.ids_vistos):
+            tamanho = max((int(ids.max()) >> 3) + 1, 2 * len(self.ids_vistos))
+            self.ids_vistos = np.concatenate([self.ids_vistos, np.zeros(tamanho - len(self.ids_vistos), dtype='uint8')])
+        
+        posicoes = ids >> 3
+        bits = np.left_shift(1, ids & 7).astype('uint8')
+        novos = (self.ids_vistos[posicoes] & bits) == 0
+        
+        primeiras = np.zeros(len(ids), dtype=bool)
+        primeiras[np.unique(ids, return_index=True)[1]] = True
+        novos &= primeiras
+        
+        np.bitwise_or.at(self.ids_vistos, posicoes[novos], bits[novos])
+        return novos
+    
+    def atualizar(self, bloco, derivadas=None):
+        """Incorpora um bloco de tickets (colunas do esquema do analisador, datas já convertidas)"""
+        if self.descartar_duplicatas and 'ID' in bloco.columns:
+            novos = self._primeiras_ocorrencias(bloco['ID'].to_numpy(dtype='int64'))
+            if not novos.all():
+                self.duplicatas += int((~novos).sum())
+                bloco = bloco[novos]
+                derivadas = None
+        
+        self._incorporar(bloco, derivadas, 1)
+        
+        if 'Data Criação' in bloco.columns:
+            data_min, data_max = bloco['Data Criação'].min(), bloco['Data Criação'].max()
+            if pd.notna(data_min):
+                self.data_min = data_min if self.data_min is None else min(self.data_min, data_min)
+                self.data_max = data_max if self.data_max is None else max(self.data_max, data_max)
+    
+    def remover(self, bloco, derivadas=None):
+        """Retira a contribuição de tickets incorporados antes (data_min/data_max não são recalculados aqui)"""
+        self._incorporar(bloco, derivadas, -1)
+    
+    def _incorporar(self, bloco, derivadas, sinal):
+        """Soma (sinal=1) ou subtrai (sinal=-1) a contribuição de um bloco de tickets em todos os agregados"""
+        self.total += sinal * len(bloco)
+        self.colunas.update(bloco.columns)
+        
+        # Contagens por dimensão
+        for coluna in DIMENSOES:
+            if coluna in bloco.columns:
+                _somar(self.contagens.setdefault(coluna, Counter()), contar_valores(bloco, coluna), sinal)
+        
+        # Colunas derivadas já calculadas para o bloco podem ser reaproveitadas
+        if derivadas is None:
+            derivadas = ColunasDerivadas(bloco, self.nomes_prioridade, self.sla_config)
+        
+        # Distribuição temporal
+        if 'Data Criação' in bloco.columns:
+            _somar(self.por_mes, derivadas.mes_criacao.value_counts(), sinal)
+            _somar(self.por_dia, contar_dias_semana(derivadas.dia_semana), sinal)
+        
+        # TTR e SLA dos tickets resolvidos
+        if 'Tempo Solução (min)' not in bloco.columns:
+            return
+        ttr_horas = derivadas.ttr_horas
+        
+        _alterar_sketch(self.ttr, ttr_horas.to_numpy(), sinal)
+        self.ttr_soma += sinal * float(ttr_horas.sum())
+        
+        for coluna, parciais in self.ttr_dimensoes.items():
+            if coluna not in bloco.columns:
+                continue
+            por_valor = explodir_multiplos(pd.DataFrame({coluna: bloco[coluna][derivadas.resolvidos].array,
+                                                         'ttr_horas': ttr_horas.to_numpy()}), coluna)
+            grupos = por_valor.groupby(coluna, observed=True)['ttr_horas']
+            for valor, quantidade, soma in grupos.agg(['count', 'sum']).itertuples():
+                parcial = parciais.setdefault(valor, [0, 0.0, self._novo_sketch()])
+                parcial[0] += sinal * int(quantidade)
+                parcial[1] += sinal * float(soma)
+            for valor, valores in grupos:
+                _alterar_sketch(parciais[valor][2], valores.to_numpy(), sinal)
+            del por_valor, grupos
+        
+        if 'Prioridade' in bloco.columns:
+            self.sla_total += sinal * len(ttr_horas)
+            self.sla_dentro += sinal * int(derivadas.dentro_sla.sum())
+            
+            por_prioridade = pd.DataFrame({'prioridade_nome': derivadas.prioridade_nome.array,
+                                           'dentro_sla': derivadas.dentro_sla.to_numpy(), 'ttr_horas': ttr_horas.to_numpy()})
+            resumo = por_prioridade.groupby('prioridade_nome', observed=True).agg(
+                quantidade=('dentro_sla', 'size'), dentro=('dentro_sla', 'sum'), soma=('ttr_horas', 'sum'))
+            for nome, quantidade, dentro, soma in resumo.itertuples():
+                parcial = self.sla_prioridade.setdefault(nome, [0, 0, 0.0])
+                parcial[0] += sinal * int(quantidade)
+                parcial[1] += sinal * int(dentro)
+                parcial[2] += sinal * float(soma)
+    
+    def mesclar(self, outro):
+        """Incorpora os agregados de outro conjunto de blocos (ex.: outra partição do histórico)"""
+        tamanho = max(len(self.ids_vistos), len(outro.ids_vistos))
+        ids_vistos = np.zeros(tamanho, dtype='uint8')
+        ids_vistos[:len(self.ids_vistos)] |= self.ids_vistos
+        ids_vistos[:len(outro.ids_vistos)] |= outro.ids_vistos
+        self.ids_vistos = ids_vistos
+        
+        self.total += outro.total
+        self.duplicatas += outro.duplicatas
+        self.colunas.update(outro.colunas)
+        
+        for coluna, contagem in outro.contagens.items():
+            self.contagens.setdefault(coluna, Counter()).update(contagem)
+        self.por_mes.update(outro.por_mes)
+        self.por_dia.update(outro.por_dia)
+        for data in (outro.data_min, outro.data_max):
+            if data is not None:
+                self.data_min = data if self.data_min is None else min(self.data_min, data)
+                self.data_max = data if self.data_max is None else max(self.data_max, data)
+        
+        self.ttr.mesclar(outro.ttr)
+        self.ttr_soma += outro.ttr_soma
+        for coluna, parciais in outro.ttr_dimensoes.items():
+            for valor, (quantidade, soma, sketch) in parciais.items():
+                parcial = self.ttr_dimensoes[coluna].setdefault(valor, [0, 0.0, self._novo_sketch()])
+                parcial[0] += quantidade
+                parcial[1] += soma
+                parcial[2].mesclar(sketch)
+        
+        self.sla_total += outro.sla_total
+        self.sla_dentro += outro.sla_dentro
+        for nome, (quantidade, dentro, soma) in outro.sla_prioridade.items():
+            parcial = self.sla_prioridade.setdefault(nome, [0, 0, 0.0])
+            parcial[0] += quantidade
+            parcial[1] += dentro
+            parcial[2] += soma
+    
+    def finalizar(self):
+        """Resultados finais, lidos tanto pela exibição no console quanto pela exportação em CSV"""
+        resultados = {'total': self.total, 'contagens': {}, 'percentuais': {}, 'temporal': None, 'ttr': None,
+                      'ttr_por_dimensao': {}, 'sla': None}
+        
+        for coluna, contagem in self.contagens.items():
+            # Mais frequentes primeiro; empates em ordem alfabética, para um resultado estável
+            # (valores zerados pela remoção de tickets ficam de fora)
+            ordenados = sorted((+contagem).items(), key=lambda item: (-item[1], str(item[0])))
+            resultados['contagens'][coluna] = pd.Series(dict(ordenados), dtype='int64', name='count')
+            resultados['percentuais'][coluna] = self._percentuais(resultados['contagens'][coluna])
+        
+        if 'Data Criação' in self.colunas:
+            por_dia = pd.Series(+self.por_dia, dtype='int64')
+            resultados['temporal'] = {
+                'por_mes': pd.Series(+self.por_mes, dtype='int64').sort_index(),
+                'por_dia': por_dia,
+                'percentual_dia': self._percentuais(por_dia),
+                'data_min': self.data_min,
+                'data_max': self.data_max,
+            }
+        
+        if self.ttr.total:
+            resultados['ttr'] = {
+                'quantidade': self.ttr.total,
+                'media': self.ttr_soma / self.ttr.total,
+                'mediana': self.ttr.quantil(0.5),
+                'minimo': self.ttr.minimo,
+                'maximo': self.ttr.maximo,
+                'percentis': {q: self.ttr.quantil(q) for q in PERCENTIS_TTR},
+            }
+            
+            for coluna, parciais in self.ttr_dimensoes.items():
+                if coluna not in self.colunas:
+                    continue
+                valores = sorted((valor for valor, parcial in parciais.items() if parcial[0] > 0), key=str)
+                resultados['ttr_por_dimensao'][coluna] = pd.DataFrame({
+                    'mean': [parciais[valor][1] / parciais[valor][0] for valor in valores],
+                    'median': [parciais[valor][2].quantil(0.5) for valor in valores],
+                    'count': [parciais[valor][0] for valor in valores],
+                }, index=pd.Index(valores, name=coluna))
+        
+        if 'Prioridade' in self.colunas and 'Tempo Solução (min)' in self.colunas:
+            nomes = sorted(nome for nome, parcial in self.sla_prioridade.items() if parcial[0] > 0)
+            por_prioridade = pd.DataFrame({
+                ('dentro_sla', 'count'): [self.sla_prioridade[nome][0] for nome in nomes],
+                ('dentro_sla', 'sum'): [self.sla_prioridade[nome][1] for nome in nomes],
+                ('ttr_horas', 'mean'): [self.sla_prioridade[nome][2] / self.sla_prioridade[nome][0] for nome in nomes],
+            }, index=pd.Index(nomes, name='prioridade_nome'))
+            resultados['sla'] = {'total': self.sla_total, 'dentro': self.sla_dentro, 'por_prioridade': por_prioridade}
+        
+        return resultados
+    
+    def _percentuais(self, contagem):
+        """Percentual de cada contagem sobre o total de tickets"""
+        return contagem / self.total * 100
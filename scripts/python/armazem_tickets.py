@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Armazém local (SQLite) dos tickets GLPI extraídos
+Cada ticket é gravado uma única vez por ID (upsert); as visões completa, dos últimos 6 meses e por
+status/entidade/grupo são consultas indexadas, sem arquivos completos separados. Os campos da API e as
+relações de cada ticket também são guardados: o modo incremental aplica o delta sobre o próprio armazém
+"""
+
+import heapq
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from indice_relacionamentos import PAPEIS
+
+import datas_glpi
+from saida_colunar import ORDEM_COLUNAS, COLUNAS_INTEIRAS, COLUNAS_DECIMAIS
+
+# Tickets acumulados antes de cada gravação em lote
+TAMANHO_LOTE = 1000
+
+# Colunas do CSV gravadas no armazém (o ID é a própria chave)
+COLUNAS_ARMAZEM = [coluna for coluna in ORDEM_COLUNAS if coluna != 'ID']
+
+# Campos da API indexados para as consultas por período, status, entidade e modificação: coluna -> campo
+# (o código de status fica em status_glpi, pois nomes de coluna no SQLite não diferenciam maiúsculas
+# e a coluna Status do CSV guarda o nome traduzido)
+CAMPOS_INDEXADOS = {'date': 'date', 'date_mod': 'date_mod', 'status_glpi': 'status', 'entities_id': 'entities_id'}
+
+# Campos da API lidos na formatação de um ticket, guardados (JSON) para reformatar o armazém sem a API
+CAMPOS_API = ('id', 'name', 'content', 'status', 'priority', 'urgency', 'impact', 'itilcategories_id',
+              'entities_id', 'date', 'date_mod', 'solvedate', 'closedate', 'solve_delay_stat',
+              'close_delay_stat', 'satisfaction', 'type', 'locations_id', 'global_validation')
+
+# Campo da API de cada coluna de data: no armazém as datas ficam sempre no layout ISO,
+# independente do formato escolhido para o CSV
+CAMPOS_API_DATAS = {'Data Criação': 'date', 'Data Modificação': 'date_mod',
+                    'Data Solução': 'solvedate', 'Data Fechamento': 'closedate'}
+
+
+def _tipo_coluna(coluna):
+    """Tipo SQLite de uma coluna do CSV"""
+    if coluna in COLUNAS_INTEIRAS:
+        return 'INTEGER'
+    if coluna in COLUNAS_DECIMAIS:
+        return 'REAL'
+    return 'TEXT'
+
+
+def _identificador(coluna):
+    """Nome de coluna entre aspas (as colunas do CSV têm acentos e espaços)"""
+    return '"' + coluna.replace('"', '""') + '"'
+
+
+class ArmazemTickets:
+    """Tabela de tickets com upsert por ID e índices em date, date_mod, status, entities_id e grupo,
+    mais os campos da API e as relações (requerentes, técnicos e grupos) de cada ticket
+    
+    A coluna execucao guarda o momento da gravação de cada ticket e tickets_excluidos o da remoção:
+    quem lê o armazém (ex.: o estado das métricas) encontra pelo índice só o que mudou desde uma marca"""
+    
+    def __init__(self, arquivo):
+        """Abre (ou cria) o banco SQLite do armazém"""
+        self.arquivo = arquivo
+        self.pendentes = []
+        self.execucao = None
+        
+        os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+        self.conexao = sqlite3.connect(arquivo)
+        self.conexao.execute("PRAGMA journal_mode = WAL")
+        
+        colunas = ',\n'.join(f"                {_identificador(coluna)} {_tipo_coluna(coluna)}" for coluna in COLUNAS_ARMAZEM)
+        self.conexao.executescript(f"""
+            CREATE TABLE IF NOT EXISTS tickets (
+                id INTEGER PRIMARY KEY,
+                date TEXT,
+                date_mod TEXT,
+                status_glpi INTEGER,
+                entities_id INTEGER,
+                execucao TEXT NOT NULL,
+                dados_api TEXT,
+{colunas}
+            );
+            CREATE TABLE IF NOT EXISTS ticket_grupos (
+                ticket_id INTEGER NOT NULL,
+                grupo_id INTEGER NOT NULL,
+                PRIMARY KEY (ticket_id, grupo_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS ticket_relacoes (
+                ticket_id INTEGER NOT NULL,
+                papel TEXT NOT NULL,
+                ordem INTEGER NOT NULL,
+                valor_id INTEGER NOT NULL,
+                PRIMARY KEY (ticket_id, papel, ordem)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS tickets_excluidos (
+                id INTEGER PRIMARY KEY,
+                execucao TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS estado_carga (
+                chave TEXT PRIMARY KEY,
+                valor TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_tickets_date ON tickets (date);
+            CREATE INDEX IF NOT EXISTS idx_tickets_date_mod ON tickets (date_mod);
+            CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status_glpi);
+            CREATE INDEX IF NOT EXISTS idx_tickets_entities_id ON tickets (entities_id);
+            CREATE INDEX IF NOT EXISTS idx_tickets_execucao ON tickets (execucao);
+            CREATE INDEX IF NOT EXISTS idx_tickets_excluidos_execucao ON tickets_excluidos (execucao);
+            CREATE INDEX IF NOT EXISTS idx_ticket_grupos_grupo ON ticket_grupos (grupo_id);
+        """)
+        
+        # Armazéns anteriores aos campos da API: a coluna começa vazia e a próxima carga completa a preenche
+        if 'dados_api' not in {linha[1] for linha in self.conexao.execute("PRAGMA table_info(tickets)")}:
+            self.conexao.execute("ALTER TABLE tickets ADD COLUMN dados_api TEXT")
+        
+        nomes = ['id', *CAMPOS_INDEXADOS, 'execucao', 'dados_api', *COLUNAS_ARMAZEM]
+        atualizacoes = ', '.join(f"{_identificador(nome)} = excluded.{_identificador(nome)}" for nome in nomes[1:])
+        self.sql_upsert = (
+            f"INSERT INTO tickets ({', '.join(map(_identificador, nomes))}) "
+            f"VALUES ({', '.join('?' * len(nomes))}) "
+            f"ON CONFLICT (id) DO UPDATE SET {atualizacoes}"
+        )
+    
+    def _registro(self, ticket, linha, execucao):
+        """Monta a tupla gravada no banco a partir do ticket da API e da linha formatada"""
+        registro = [int(ticket['id'])]
+        for campo in CAMPOS_INDEXADOS.values():
+            valor = ticket.get(campo)
+            registro.append(None if valor in ('', 'NULL') else valor)
+        registro.append(execucao)
+        registro.append(json.dumps({campo: ticket[campo] for campo in CAMPOS_API if campo in ticket}, ensure_ascii=False))
+        
+        for coluna in COLUNAS_ARMAZEM:
+            if coluna in CAMPOS_API_DATAS:
+                valor = datas_glpi.formatar_data_glpi(ticket.get(CAMPOS_API_DATAS[coluna]), 'iso')
+            else:
+                valor = linha.get(coluna)
+            registro.append(None if valor == '' else valor)
+        return registro
+    
+    def _gravar(self, itens, execucao):
+        """Grava um lote de (ticket, linha, relações {papel: IDs}), sem confirmar a transação"""
+        ids = [(int(ticket['id']),) for ticket, _, _ in itens]
+        self.conexao.executemany(self.sql_upsert, [self._registro(ticket, linha, execucao) for ticket, linha, _ in itens])
+        self.conexao.executemany("DELETE FROM ticket_grupos WHERE ticket_id = ?", ids)
+        self.conexao.executemany(
+            "INSERT OR IGNORE INTO ticket_grupos (ticket_id, grupo_id) VALUES (?, ?)",
+            [(int(ticket['id']), int(grupo_id)) for ticket, _, relacoes in itens for grupo_id in relacoes.get('grupo', ())]
+        )
+        self.conexao.executemany("DELETE FROM ticket_relacoes WHERE ticket_id = ?", ids)
+        self.conexao.executemany(
+            "INSERT INTO ticket_relacoes (ticket_id, papel, ordem, valor_id) VALUES (?, ?, ?, ?)",
+            [(int(ticket['id']), papel, ordem, int(valor_id))
+             for ticket, _, relacoes in itens
+             for papel in PAPEIS
+             for ordem, valor_id in enumerate(relacoes.get(papel, ()))]
+        )
+    
+    def _remover(self, ids, execucao):
+        """Remove tickets e suas relações, registrando a remoção, sem confirmar a transação"""
+        ids = [(int(ticket_id),) for ticket_id in ids]
+        self.conexao.executemany("DELETE FROM ticket_grupos WHERE ticket_id = ?", ids)
+        self.conexao.executemany("DELETE FROM ticket_relacoes WHERE ticket_id = ?", ids)
+        self.conexao.executemany("DELETE FROM tickets WHERE id = ?", ids)
+        self.conexao.executemany(
+            "INSERT OR REPLACE INTO tickets_excluidos (id, execucao) VALUES (?, ?)",
+            [(ticket_id, execucao) for ticket_id, in ids]
+        )
+    
+    def upsert(self, itens, removidos=()):
+        """Insere ou atualiza, por ID, tickets (ticket da API, linha formatada, relações {papel: IDs}) e
+        remove os IDs em removidos, em uma única transação"""
+        execucao = datetime.now().isoformat()
+        with self.conexao:
+            self._gravar(list(itens), execucao)
+            self._remover(removidos, execucao)
+    
+    def remover(self, ids):
+        """Remove tickets do armazém"""
+        with self.conexao:
+            self._remover(ids, datetime.now().isoformat())
+    
+    def iniciar_carga(self):
+        """Inicia uma carga em lotes: nada fica visível até concluir_carga"""
+        self.execucao = datetime.now().isoformat()
+        self.pendentes = []
+    
+    def adicionar(self, ticket, linha, grupos=()):
+        """Acumula um ticket da carga em andamento, gravando em lotes"""
+        self.pendentes.append((ticket, linha, grupos))
+        if len(self.pendentes) >= TAMANHO_LOTE:
+            self._gravar(self.pendentes, self.execucao)
+            self.pendentes = []
+    
+    def concluir_carga(self, sucesso=True, sincronizar=False, completa=False):
+        """Confirma a carga (ou a desfaz); com sincronizar=True, remove os tickets que não vieram nela e,
+        com completa=True, registra que as relações de todos os tickets foram gravadas (base do modo incremental)"""
+        try:
+            if not sucesso:
+                self.conexao.rollback()
+                return False
+            
+            if self.pendentes:
+                self._gravar(self.pendentes, self.execucao)
+            
+            if sincronizar:
+                # Carga completa: tickets ausentes foram excluídos no GLPI
+                self.conexao.execute(
+                    "INSERT OR REPLACE INTO tickets_excluidos (id, execucao) SELECT id, ? FROM tickets WHERE execucao != ?",
+                    (self.execucao, self.execucao)
+                )
+                for tabela in ('ticket_grupos', 'ticket_relacoes'):
+                    self.conexao.execute(
+                        f"DELETE FROM {tabela} WHERE ticket_id IN (SELECT id FROM tickets WHERE execucao != ?)",
+                        (self.execucao,)
+                    )
+                self.conexao.execute("DELETE FROM tickets WHERE execucao != ?", (self.execucao,))
+                
+                # Relações obtidas com falhas toleradas (listagem não estrita) não servem de base ao modo incremental
+                if completa:
+                    self.conexao.execute("INSERT OR REPLACE INTO estado_carga (chave, valor) VALUES ('completa', '1')")
+                else:
+                    self.conexao.execute("DELETE FROM estado_carga WHERE chave = 'completa'")
+            
+            self.conexao.commit()
+            return True
+        
+        except Exception as e:
+            self.conexao.rollback()
+            print(f"[ERRO] Erro ao gravar armazém de tickets: {e}")
+            return False
+        
+        finally:
+            self.pendentes = []
+            self.execucao = None
+    
+    def consultar(self, data_inicial=None, data_final=None, status=None, entidade_id=None, grupo_id=None,
+                  colunas=None):
+        """Cursor com as linhas (colunas do CSV, datas em ISO) dos tickets filtrados; colunas limita a leitura (o ID sempre vem)"""
+        condicoes = []
+        parametros = []
+        
+        # Período pela data de criação, comparada no layout da API (AAAA-MM-DD HH:MM:SS)
+        if data_inicial is not None:
+            condicoes.append("date >= ?")
+            parametros.append(data_inicial.strftime(datas_glpi.FORMATO_API))
+        if data_final is not None:
+            condicoes.append("date <= ?")
+            parametros.append(data_final.strftime(datas_glpi.FORMATO_API))
+        if status is not None:
+            condicoes.append("status_glpi = ?")
+            parametros.append(status)
+        if entidade_id is not None:
+            condicoes.append("entities_id = ?")
+            parametros.append(entidade_id)
+        if grupo_id is not None:
+            condicoes.append("id IN (SELECT ticket_id FROM ticket_grupos WHERE grupo_id = ?)")
+            parametros.append(grupo_id)
+        
+        selecionadas = [coluna for coluna in COLUNAS_ARMAZEM if colunas is None or coluna in colunas]
+        colunas = ', '.join(['id AS "ID"', *map(_identificador, selecionadas)])
+        filtro = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        return self.conexao.execute(f"SELECT {colunas} FROM tickets {filtro} ORDER BY id", parametros)
+    
+    def total(self):
+        """Quantidade de tickets armazenados"""
+        return self.conexao.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+    
+    def completo(self):
+        """Indica se a última carga completa gravou os campos da API e as relações de todos os tickets"""
+        linha = self.conexao.execute("SELECT valor FROM estado_carga WHERE chave = 'completa'").fetchone()
+        return linha is not None and linha[0] == '1'
+    
+    def ids(self):
+        """IDs dos tickets armazenados"""
+        return {linha[0] for linha in self.conexao.execute("SELECT id FROM tickets")}
+    
+    def existentes(self, ids):
+        """IDs, entre os informados, dos tickets presentes no armazém"""
+        ids = sorted(int(ticket_id) for ticket_id in ids)
+        existentes = set()
+        for inicio in range(0, len(ids), TAMANHO_LOTE):
+            lote = ids[inicio:inicio + TAMANHO_LOTE]
+            existentes.update(linha[0] for linha in self.conexao.execute(
+                f"SELECT id FROM tickets WHERE id IN ({', '.join('?' * len(lote))})", lote))
+        return existentes
+    
+    def tickets_api(self, substitutos=(), removidos=()):
+        """Itera, em ordem de ID, os campos da API dos tickets armazenados, com os substitutos aplicados (upsert
+        por ID) e sem os removidos; a leitura usa outra conexão, então a carga em andamento não a afeta"""
+        substitutos = sorted(substitutos, key=lambda ticket: int(ticket['id']))
+        ignorados = {int(ticket['id']) for ticket in substitutos} | {int(ticket_id) for ticket_id in removidos}
+        
+        leitura = sqlite3.connect(self.arquivo)
+        try:
+            cursor = leitura.execute("SELECT id, dados_api FROM tickets ORDER BY id")
+            armazenados = (
+                json.loads(dados)
+                for linhas in iter(lambda: cursor.fetchmany(TAMANHO_LOTE), [])
+                for ticket_id, dados in linhas if ticket_id not in ignorados
+            )
+            yield from heapq.merge(armazenados, substitutos, key=lambda ticket: int(ticket['id']))
+        finally:
+            leitura.close()
+    
+    def carregar_relacionamentos(self, indice, ignorados=()):
+        """Incorpora ao índice as relações gravadas, exceto as dos tickets em ignorados"""
+        ignorados = {int(ticket_id) for ticket_id in ignorados}
+        cursor = self.conexao.execute(
+            "SELECT ticket_id, papel, valor_id FROM ticket_relacoes ORDER BY ticket_id, papel, ordem")
+        for linhas in iter(lambda: cursor.fetchmany(TAMANHO_LOTE), []):
+            for ticket_id, papel, valor_id in linhas:
+                if ticket_id not in ignorados:
+                    indice.adicionar(papel, ticket_id, valor_id)
+        return indice
+    
+    def fechar(self):
+        """Fecha a conexão com o banco"""
+        self.conexao.close()
+
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache persistente (SQLite) das dimensões do GLPI usadas na extração
+Usuários, entidades, categorias e grupos (id -> nome), com TTL por dimensão e marca de date_mod
+para renovação incremental
+"""
+
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+# TTL padrão de cada dimensão, em minutos
+TTL_PADRAO_MINUTOS = {
+    'usuarios': 6 * 60,
+    'entidades': 24 * 60,
+    'categorias': 24 * 60,
+    'grupos': 24 * 60,
+}
+
+
+class CacheDimensoes:
+    """Cache em disco das dimensões id -> nome, com validade por dimensão"""
+    
+    def __init__(self, arquivo, ttl_minutos=None):
+        """Abre (ou cria) o banco SQLite do cache"""
+        self.arquivo = arquivo
+        self.ttl_minutos = dict(TTL_PADRAO_MINUTOS)
+        self.ttl_minutos.update(ttl_minutos or {})
+        
+        os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+        self.conexao = sqlite3.connect(arquivo)
+        self.conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS itens (
+                dimensao TEXT NOT NULL,
+                id TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                date_mod TEXT,
+                PRIMARY KEY (dimensao, id)
+            );
+            CREATE TABLE IF NOT EXISTS dimensoes (
+                dimensao TEXT PRIMARY KEY,
+                atualizado_em REAL NOT NULL,
+                date_mod_max TEXT
+            );
+        """)
+    
+    def carregar(self, dimensao):
+        """Retorna o dicionário id -> nome armazenado para a dimensão"""
+        cursor = self.conexao.execute("SELECT id, nome FROM itens WHERE dimensao = ?", (dimensao,))
+        return dict(cursor.fetchall())
+    
+    def obter(self, dimensao, ids):
+        """Retorna o dicionário id -> nome apenas dos ids informados que estão armazenados"""
+        ids = list(ids)
+        encontrados = {}
+        
+        # Lotes abaixo do limite de parâmetros do SQLite
+        for inicio in range(0, len(ids), 500):
+            lote = ids[inicio:inicio + 500]
+            cursor = self.conexao.execute(
+                f"SELECT id, nome FROM itens WHERE dimensao = ? AND id IN ({', '.join('?' * len(lote))})",
+                (dimensao, *lote)
+            )
+            encontrados.update(cursor.fetchall())
+        
+        return encontrados
+    
+    def _metadados(self, dimensao):
+        """Retorna (atualizado_em, date_mod_max) da dimensão, ou None se nunca foi salva"""
+        return self.conexao.execute(
+            "SELECT atualizado_em, date_mod_max FROM dimensoes WHERE dimensao = ?", (dimensao,)
+        ).fetchone()
+    
+    def idade_minutos(self, dimensao):
+        """Minutos desde a última renovação da dimensão (None se nunca foi salva)"""
+        metadados = self._metadados(dimensao)
+        if metadados is None:
+            return None
+        return (time.time() - metadados[0]) / 60
+    
+    def expirado(self, dimensao):
+        """Indica se a cópia local da dimensão passou do TTL (ou não existe)"""
+        idade = self.idade_minutos(dimensao)
+        return idade is None or idade >= self.ttl_minutos.get(dimensao, 0)
+    
+    def marca_date_mod(self, dimensao):
+        """Maior date_mod já armazenado, ponto de partida da renovação incremental"""
+        metadados = self._metadados(dimensao)
+        return metadados[1] if metadados else None
+    
+    def salvar(self, dimensao, itens, completo=False):
+        """Grava itens (id, nome, date_mod) da dimensão; com completo=True a cópia anterior é substituída"""
+        itens = list(itens)
+        marca = None if completo else self.marca_date_mod(dimensao)
+        for _, _, date_mod in itens:
+            if date_mod and (marca is None or date_mod > marca):
+                marca = date_mod
+        
+        with self.conexao:
+            if completo:
+                self.conexao.execute("DELETE FROM itens WHERE dimensao = ?", (dimensao,))
+            self.conexao.executemany(
+                "INSERT OR REPLACE INTO itens (dimensao, id, nome, date_mod) VALUES (?, ?, ?, ?)",
+                [(dimensao, item_id, nome, date_mod) for item_id, nome, date_mod in itens]
+            )
+            self.conexao.execute(
+                "INSERT OR REPLACE INTO dimensoes (dimensao, atualizado_em, date_mod_max) VALUES (?, ?, ?)",
+                (dimensao, time.time(), marca)
+            )
+    
+    def adicionar(self, dimensao, itens):
+        """Grava itens (id, nome, date_mod) avulsos, sem alterar a validade nem a marca da dimensão"""
+        with self.conexao:
+            self.conexao.executemany(
+                "INSERT OR REPLACE INTO itens (dimensao, id, nome, date_mod) VALUES (?, ?, ?, ?)",
+                [(dimensao, item_id, nome, date_mod) for item_id, nome, date_mod in itens]
+            )
+    
+    def fechar(self):
+        """Fecha a conexão com o banco"""
+        self.conexao.close()
+
+
+class CacheLRU(OrderedDict):
+    """Dicionário com capacidade limitada que descarta os itens usados há mais tempo"""
+    
+    def __init__(self, capacidade):
+        """Cria o cache vazio com a capacidade informada"""
+        super().__init__()
+        self.capacidade = capacidade
+    
+    def __getitem__(self, chave):
+        valor = super().__getitem__(chave)
+        self.move_to_end(chave)
+        return valor
+    
+    def get(self, chave, padrao=None):
+        """Retorna o valor (marcando-o como usado) ou o padrão"""
+        if chave in self:
+            return self[chave]
+        return padrao
+    
+    def __setitem__(self, chave, valor):
+        super().__setitem__(chave, valor)
+        self.move_to_end(chave)
+        if len(self) > self.capacidade:
+            self.popitem(last=False)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Colunas derivadas dos tickets usadas nas métricas: TTR, prioridade, SLA, mês e dia da semana de criação
+Cada coluna é calculada uma única vez, no primeiro uso, e reaproveitada por todas as métricas e exportações
+"""
+
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+
+class ColunasDerivadas:
+    """Colunas derivadas de um DataFrame de tickets, calculadas sob demanda e guardadas em cache"""
+    
+    def __init__(self, df, nomes_prioridade, sla_config):
+        """Associa as colunas derivadas ao DataFrame (nomes_prioridade: código -> nome; sla_config: nome -> horas)"""
+        self.df = df
+        self.nomes_prioridade = nomes_prioridade
+        self.sla_config = sla_config
+    
+    @cached_property
+    def resolvidos(self):
+        """Máscara dos tickets resolvidos (tempo de solução preenchido e positivo)"""
+        tempo = self.df['Tempo Solução (min)']
+        return tempo.notna() & (tempo > 0)
+    
+    @cached_property
+    def ttr_horas(self):
+        """Tempo de resolução em horas, apenas dos tickets resolvidos"""
+        return self.df.loc[self.resolvidos, 'Tempo Solução (min)'] / 60
+    
+    @cached_property
+    def prioridade_nome(self):
+        """Nome da prioridade dos tickets resolvidos, como categoria (vazio para códigos sem nome)"""
+        codigos = self.df.loc[self.resolvidos, 'Prioridade']
+        posicoes = codigos.map({codigo: posicao for posicao, codigo in enumerate(self.nomes_prioridade)})
+        nomes = pd.Categorical.from_codes(posicoes.fillna(-1).astype('int8'), categories=list(self.nomes_prioridade.values()))
+        return pd.Series(nomes, index=codigos.index, name='prioridade_nome')
+    
+    @cached_property
+    def sla_horas(self):
+        """Limite de SLA em horas dos tickets resolvidos, pela prioridade (NaN sem prioridade conhecida)"""
+        limites = [self.sla_config.get(nome, np.nan) for nome in self.prioridade_nome.cat.categories]
+        limites = np.array(limites + [np.nan], dtype='float64')
+        return pd.Series(limites[self.prioridade_nome.cat.codes.to_numpy()], index=self.prioridade_nome.index)
+    
+    @cached_property
+    def dentro_sla(self):
+        """Indica, para cada ticket resolvido, se o TTR ficou dentro do limite de SLA"""
+        return pd.Series(self.ttr_horas.to_numpy() <= self.sla_horas.to_numpy(), index=self.ttr_horas.index)
+    
+    @cached_property
+    def mes_criacao(self):
+        """Mês de criação de cada ticket"""
+        return self.df['Data Criação'].dt.to_period('M')
+    
+    @cached_property
+    def dia_semana(self):
+        """Dia da semana de criação de cada ticket (0 = segunda-feira)"""
+        return self.df['Data Criação'].dt.dayofweek
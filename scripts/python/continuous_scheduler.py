@@ -5,13 +5,17 @@ Agendador Contínuo para Pipeline GLPI
 =====================================
 
 Script que executa continuamente, agendando a execução do pipeline
-de extração e análise de dados GLPI a cada 60 minutos.
+de extração e análise de dados GLPI a cada 60 minutos (padrão), em um
+intervalo fixo ou conforme uma expressão cron.
 
 Este script roda indefinidamente até ser interrompido manualmente.
 É uma alternativa ao Windows Task Scheduler.
 
 Uso:
     python continuous_scheduler.py
+    python continuous_scheduler.py --residente  # Pipeline neste processo, com sessão e caches mantidos
+    python continuous_scheduler.py --intervalo 30s  # Intervalo fixo (s, m ou h)
+    python continuous_scheduler.py --cron "*/15 8-18 * * 1-5" --jitter 30 --atrasos recuperar
     
 Para parar: Ctrl+C
 
@@ -19,25 +23,51 @@ Autor: Sistema de Análise GLPI
 Data: 2024
 """
 
-import time
 import signal
 import sys
-from datetime import datetime, timedelta
-from scheduler import SimplePipelineScheduler
+import argparse
+import threading
+from datetime import datetime
+from typing import Optional
+from scheduler import POLITICAS_CONCORRENCIA, SimplePipelineScheduler
+from agenda_execucoes import (AgendaExecucoes, ExpressaoCron, IntervaloFixo, POLITICAS_ATRASO,
+                              interpretar_intervalo)
 
 
 class ContinuousScheduler:
     """
-    Agendador contínuo que executa o pipeline a cada 60 minutos.
+    Agendador contínuo que executa o pipeline nos horários de uma agenda (padrão: a cada 60 minutos).
     """
     
-    def __init__(self):
-        """Inicializa o agendador contínuo."""
-        self.scheduler = SimplePipelineScheduler()
+    def __init__(self, residente: bool = False, agenda: Optional[AgendaExecucoes] = None,
+                 politica_concorrencia: str = 'pular'):
+        """
+        Inicializa o agendador contínuo.
+        
+        Args:
+            residente: Executa o pipeline neste processo, mantendo entre as execuções os módulos
+                importados, a sessão da API e os caches de dimensões (cada execução aplica só o delta)
+            agenda: Horários das execuções (padrão: a cada 60 minutos a partir do início)
+            politica_concorrencia: Horário atingido com outra execução ativa (ex.: scheduler.py
+                disparado pelo Agendador de Tarefas): 'pular', 'coalescer' ou 'aguardar'
+        """
+        # Sinalizado na interrupção: a espera termina na hora, sem aguardar o próximo horário
+        # (nem o fim de outra execução, na política 'aguardar')
+        self.parada = threading.Event()
+        
+        self.scheduler = SimplePipelineScheduler(politica_concorrencia, parada=self.parada)
         self.running = True
         self.interval_minutes = 60
+        self.agenda = agenda or AgendaExecucoes(IntervaloFixo(self.interval_minutes * 60))
         self.next_execution = None
         
+        # No modo residente, o orquestrador (e o extrator dentro dele) vive enquanto o agendador rodar
+        self.residente = residente
+        self.orquestrador = None
+        if residente:
+            from main import PipelineOrchestrator
+            self.orquestrador = PipelineOrchestrator('processo', residente=True)
+        
         # Configurar handler para interrupção
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
@@ -52,15 +82,28 @@ class ContinuousScheduler:
         """
         print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recebido sinal de interrupção...")
         self.running = False
+        self.parada.set()
     
     def calculate_next_execution(self) -> datetime:
         """
-        Calcula o próximo horário de execução.
+        Calcula o próximo horário de execução a partir do horário previsto da execução concluída
+        (a duração da execução não desloca a grade).
         
         Returns:
             datetime: Próximo horário de execução
         """
-        return datetime.now() + timedelta(minutes=self.interval_minutes)
+        return self.agenda.concluir()
+    
+    def executar_pipeline(self) -> bool:
+        """
+        Executa o pipeline: no modo residente, pelo orquestrador deste processo; senão, em um subprocesso.
+        
+        Returns:
+            bool: True se a execução foi bem-sucedida, False caso contrário
+        """
+        if self.orquestrador is not None:
+            return self.scheduler.execute_pipeline(self.orquestrador.executar_pipeline)
+        return self.scheduler.execute_pipeline()
     
     def log_status(self, message: str) -> None:
         """
@@ -79,56 +122,50 @@ class ContinuousScheduler:
         self.log_status("=" * 60)
         self.log_status("AGENDADOR CONTÍNUO - PIPELINE GLPI")
         self.log_status("=" * 60)
-        self.log_status(f"Intervalo de execução: {self.interval_minutes} minutos")
+        self.log_status(f"Agenda: {self.agenda}")
+        self.log_status(f"Modo: {'residente (pipeline neste processo)' if self.residente else 'subprocesso por execução'}")
         self.log_status("Pressione Ctrl+C para parar")
         self.log_status("=" * 60)
         
-        # Executar imediatamente na primeira vez
-        self.log_status("Executando pipeline inicial...")
-        try:
-            sucesso = self.scheduler.execute_pipeline()
-            if sucesso:
-                self.log_status("Pipeline inicial executado com sucesso")
-            else:
-                self.log_status("Pipeline inicial falhou")
-        except Exception as e:
-            self.log_status(f"Erro na execução inicial: {e}")
-        
-        # Calcular próxima execução
-        self.next_execution = self.calculate_next_execution()
-        self.log_status(f"Próxima execução agendada para: {self.next_execution.strftime('%Y-%m-%d %H:%M:%S')}")
+        self.next_execution = self.agenda.iniciar()
+        if self.agenda.executar_ao_iniciar:
+            self.log_status("Executando pipeline inicial...")
+        else:
+            self.log_status(f"Primeira execução agendada para: {self.next_execution.strftime('%Y-%m-%d %H:%M:%S')}")
         
-        # Loop principal
+        # Loop principal: dorme até o horário previsto ou até a interrupção
         while self.running:
             try:
-                current_time = datetime.now()
+                if not self.agenda.aguardar(self.parada):
+                    break
                 
-                # Verificar se é hora de executar
-                if current_time >= self.next_execution:
-                    self.log_status("Iniciando execução agendada...")
-                    
-                    try:
-                        sucesso = self.scheduler.execute_pipeline()
-                        if sucesso:
-                            self.log_status("Execução agendada concluída com sucesso")
-                        else:
-                            self.log_status("Execução agendada falhou")
-                    except Exception as e:
-                        self.log_status(f"Erro durante execução agendada: {e}")
-                    
-                    # Calcular próxima execução
-                    self.next_execution = self.calculate_next_execution()
-                    self.log_status(f"Próxima execução agendada para: {self.next_execution.strftime('%Y-%m-%d %H:%M:%S')}")
+                self.log_status("Iniciando execução agendada...")
+                try:
+                    sucesso = self.executar_pipeline()
+                    if sucesso:
+                        self.log_status("Execução agendada concluída com sucesso")
+                    else:
+                        self.log_status("Execução agendada falhou")
+                except Exception as e:
+                    self.log_status(f"Erro durante execução agendada: {e}")
                 
-                # Aguardar 1 minuto antes de verificar novamente
-                time.sleep(60)
+                # Calcular próxima execução
+                self.next_execution = self.calculate_next_execution()
+                if self.agenda.execucoes_perdidas:
+                    acao = ("executando uma vez agora" if self.agenda.politica_atraso == 'recuperar'
+                            else "seguindo para o próximo horário")
+                    self.log_status(f"[AVISO] {self.agenda.execucoes_perdidas} horário(s) passaram durante a execução; {acao}")
+                self.log_status(f"Próxima execução agendada para: {self.next_execution.strftime('%Y-%m-%d %H:%M:%S')}")
                 
             except KeyboardInterrupt:
                 self.log_status("Interrupção detectada...")
                 break
             except Exception as e:
                 self.log_status(f"Erro inesperado no loop principal: {e}")
-                time.sleep(60)  # Aguardar antes de tentar novamente
+                self.parada.wait(60)  # Aguardar antes de tentar novamente
+        
+        if self.orquestrador is not None:
+            self.orquestrador.encerrar()
         
         self.log_status("=" * 60)
         self.log_status("AGENDADOR CONTÍNUO FINALIZADO")
@@ -137,8 +174,33 @@ class ContinuousScheduler:
 
 def main():
     """Função principal do agendador contínuo."""
+    parser = argparse.ArgumentParser(description="Agendador contínuo do pipeline GLPI")
+    parser.add_argument('--residente', action='store_true',
+                        help="Executa o pipeline neste processo, mantendo sessão, caches e dados entre as execuções")
+    regra = parser.add_mutually_exclusive_group()
+    regra.add_argument('--intervalo', default='60m',
+                       help="Intervalo fixo entre execuções, com sufixo s, m ou h (padrão: 60m)")
+    regra.add_argument('--cron', help='Expressão cron de 5 campos (ex.: "0 * * * *")')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help="Atraso aleatório máximo, em segundos, sobre cada horário (padrão: 0)")
+    parser.add_argument('--atrasos', choices=POLITICAS_ATRASO, default='pular',
+                        help="Horários que passaram durante uma execução: pular ou recuperar com uma execução imediata")
+    parser.add_argument('--concorrencia', choices=POLITICAS_CONCORRENCIA, default='pular',
+                        help="Com outra execução ativa: pular, coalescer (uma nova execução ao final dela) ou aguardar")
+    parser.add_argument('--sem-execucao-inicial', action='store_true',
+                        help="Aguarda o primeiro horário da agenda em vez de executar ao iniciar")
+    args = parser.parse_args()
+    
+    try:
+        regra_agenda = ExpressaoCron(args.cron) if args.cron else IntervaloFixo(interpretar_intervalo(args.intervalo))
+        agenda = AgendaExecucoes(regra_agenda, jitter_segundos=args.jitter, politica_atraso=args.atrasos,
+                                 executar_ao_iniciar=not args.sem_execucao_inicial)
+    except ValueError as e:
+        parser.error(str(e))
+    
     try:
-        scheduler = ContinuousScheduler()
+        scheduler = ContinuousScheduler(residente=args.residente, agenda=agenda,
+                                        politica_concorrencia=args.concorrencia)
         scheduler.run_continuous()
         sys.exit(0)
     except KeyboardInterrupt:
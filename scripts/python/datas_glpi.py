@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Codec de datas dos tickets GLPI (API -> CSV -> análise)
+A API sempre usa o layout fixo 'YYYY-MM-DD HH:MM:SS': a conversão é feita por fatiamento,
+com memoização dos valores repetidos
+"""
+
+from datetime import datetime
+from functools import lru_cache
+
+# Layout das datas retornadas pela API do GLPI
+FORMATO_API = '%Y-%m-%d %H:%M:%S'
+FORMATO_API_DATA = '%Y-%m-%d'
+
+# Formatos de data aceitos no CSV: (data e hora, somente data)
+FORMATOS_CSV = {
+    'br': ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y'),
+    'iso': ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'),
+}
+FORMATO_CSV_PADRAO = 'br'
+
+# Quantidade de valores distintos mantidos em memória por função memoizada
+TAMANHO_CACHE = 65536
+
+
+def _layout_api(texto):
+    """Retorna 19 (data e hora) ou 10 (somente data) se o texto segue o layout fixo da API, senão 0"""
+    tamanho = len(texto)
+    if tamanho < 10 or texto[4] != '-' or texto[7] != '-':
+        return 0
+    
+    if tamanho == 10:
+        digitos = texto[0:4] + texto[5:7] + texto[8:10]
+    elif tamanho == 19 and texto[10] == ' ' and texto[13] == ':' and texto[16] == ':':
+        digitos = texto[0:4] + texto[5:7] + texto[8:10] + texto[11:13] + texto[14:16] + texto[17:19]
+    else:
+        return 0
+    
+    return tamanho if digitos.isascii() and digitos.isdigit() else 0
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def interpretar_data_glpi(texto):
+    """Converte uma data da API em datetime (None se ausente ou inválida)"""
+    if not texto or texto == 'NULL' or not isinstance(texto, str):
+        return None
+    
+    try:
+        if _layout_api(texto):
+            # Layout já validado: fromisoformat (C) só precisa validar o calendário
+            return datetime.fromisoformat(texto)
+        
+        # Layout fora do padrão (ex.: sem zeros à esquerda): caminho lento
+        return datetime.strptime(texto, FORMATO_API if ' ' in texto else FORMATO_API_DATA)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def formatar_data_glpi(texto, formato=FORMATO_CSV_PADRAO):
+    """Formata uma data da API para o CSV ('br' ou 'iso'); valores inválidos são mantidos como texto"""
+    if not texto or texto == 'NULL':
+        return ""
+    if not isinstance(texto, str):
+        return str(texto)
+    
+    try:
+        if _layout_api(texto):
+            # Data válida no layout fixo: apenas reordena os campos, sem strftime
+            datetime.fromisoformat(texto)
+            if formato == 'iso':
+                return texto
+            return texto[8:10] + '/' + texto[5:7] + '/' + texto[0:4] + texto[10:]
+        
+        data = datetime.strptime(texto, FORMATO_API if ' ' in texto else FORMATO_API_DATA)
+    except ValueError:
+        return texto
+    
+    formato_data_hora, formato_data = FORMATOS_CSV[formato]
+    return data.strftime(formato_data_hora if ' ' in texto else formato_data)
+
+
+def detectar_formato_csv(amostra):
+    """Identifica o formato ('br' ou 'iso') de uma data gravada no CSV"""
+    amostra = str(amostra).strip()
+    if len(amostra) >= 10 and amostra[4] == '-':
+        return 'iso'
+    return 'br'
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estado persistido das métricas do analisador, atualizado apenas com os tickets que mudaram no armazém
+Guarda os agregados (contagens, somas de TTR, sketches de quantis, SLA por prioridade) e a contribuição
+de cada ticket; a cada execução só os tickets novos, alterados ou removidos são reprocessados
+Os candidatos ao delta vêm pelos índices do armazém (gravações e remoções após a marca da última execução,
+mais as bordas do período que se deslocaram); a comparação de todas as colunas só é feita na conferência periódica
+"""
+
+import os
+import pickle
+import sqlite3
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import datas_glpi
+
+# Versão do formato do estado: estados gravados com outra versão são recalculados do zero
+VERSAO_ESTADO = 2
+
+# Tickets lidos por consulta ao aplicar o delta
+TAMANHO_LOTE = 50000
+
+# Intervalo entre as conferências completas das contribuições com o armazém, que corrigem qualquer
+# alteração não registrada pela marca (ex.: armazém substituído ou relógio ajustado)
+INTERVALO_RECONCILIACAO = timedelta(hours=24)
+
+
+def _identificador(coluna):
+    """Nome de coluna entre aspas (as colunas do CSV têm acentos e espaços)"""
+    return '"' + coluna.replace('"', '""') + '"'
+
+
+class EstadoMetricas:
+    """Agregados das métricas e contribuição de cada ticket, em um banco SQLite ao lado do armazém"""
+    
+    def __init__(self, arquivo, arquivo_armazem, colunas):
+        """Abre (ou cria) o banco do estado e anexa o armazém (colunas: colunas do armazém usadas nas métricas)"""
+        self.arquivo = arquivo
+        self.colunas = [coluna for coluna in colunas if coluna != 'ID']
+        self.inicio = None
+        self.fim = None
+        self.marca = None
+        self.reconciliacao = False
+        
+        os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+        # Transações controladas explicitamente: o delta e a gravação leem o mesmo instantâneo do armazém
+        self.conexao = sqlite3.connect(arquivo, isolation_level=None)
+        self.conexao.execute("ATTACH DATABASE ? AS armazem", (arquivo_armazem,))
+        
+        colunas_sql = ',\n'.join(f"                {_identificador(coluna)}" for coluna in self.colunas)
+        self.conexao.executescript(f"""
+            CREATE TABLE IF NOT EXISTS main.contribuicoes (
+                id INTEGER PRIMARY KEY,
+{colunas_sql}
+            );
+            CREATE TABLE IF NOT EXISTS main.estado (
+                chave TEXT PRIMARY KEY,
+                valor BLOB
+            );
+        """)
+        self.selecao = ', '.join(['id AS "ID"', *map(_identificador, self.colunas)])
+    
+    def carregar(self, assinatura):
+        """Agregados gravados (None se não houver estado ou se ele foi gerado com outra configuração)"""
+        linha = self.conexao.execute("SELECT valor FROM estado WHERE chave = 'assinatura'").fetchone()
+        if linha is None or pickle.loads(linha[0]) != {'versao': VERSAO_ESTADO, **assinatura}:
+            return None
+        linha = self.conexao.execute("SELECT valor FROM estado WHERE chave = 'agregados'").fetchone()
+        return None if linha is None else pickle.loads(linha[0])
+    
+    def limpar(self):
+        """Descarta os agregados e as contribuições gravados"""
+        self.conexao.execute("DELETE FROM contribuicoes")
+        self.conexao.execute("DELETE FROM estado")
+    
+    def _candidatos(self, marca):
+        """Grava em temp.candidatos os tickets gravados ou removidos no armazém após a marca e os que
+        entraram ou saíram do período com o deslocamento das bordas"""
+        inicios = sorted((marca['inicio'], self.inicio))
+        fins = sorted((marca['fim'], self.fim))
+        self.conexao.execute("DROP TABLE IF EXISTS temp.candidatos")
+        self.conexao.execute("CREATE TEMP TABLE candidatos (id INTEGER PRIMARY KEY)")
+        self.conexao.execute("""
+            INSERT INTO temp.candidatos (id)
+            SELECT id FROM armazem.tickets WHERE execucao > ?
+            UNION SELECT id FROM armazem.tickets_excluidos WHERE execucao > ?
+            UNION SELECT id FROM armazem.tickets WHERE date >= ? AND date < ?
+            UNION SELECT id FROM armazem.tickets WHERE date > ? AND date <= ?
+        """, (marca['execucao'], marca['execucao'], *inicios, *fins))
+    
+    def iniciar(self, inicio, fim):
+        """Abre a transação e seleciona os tickets novos, alterados ou fora do período (inicio a fim) desde a última gravação"""
+        self.inicio = inicio.strftime(datas_glpi.FORMATO_API)
+        self.fim = fim.strftime(datas_glpi.FORMATO_API)
+        self.conexao.execute("BEGIN")
+        
+        # Marca: última gravação ou remoção no armazém vista por esta execução (índices em execucao)
+        linha = self.conexao.execute("SELECT valor FROM estado WHERE chave = 'marca'").fetchone()
+        marca = None if linha is None else pickle.loads(linha[0])
+        registra_remocoes = self.conexao.execute(
+            "SELECT 1 FROM armazem.sqlite_master WHERE type = 'table' AND name = 'tickets_excluidos'").fetchone()
+        if registra_remocoes is None:
+            execucao = None
+        else:
+            execucao = self.conexao.execute("""
+                SELECT MAX(execucao) FROM (
+                    SELECT MAX(execucao) AS execucao FROM armazem.tickets
+                    UNION ALL SELECT MAX(execucao) FROM armazem.tickets_excluidos
+                )
+            """).fetchone()[0]
+        
+        # Sem marca (ou com a conferência vencida), todas as contribuições são comparadas com o armazém
+        agora = datetime.now()
+        self.reconciliacao = marca is None or execucao is None or \
+            agora - marca['reconciliado_em'] > INTERVALO_RECONCILIACAO
+        if self.reconciliacao:
+            origem_tickets = "armazem.tickets t"
+            origem_contribuicoes = "contribuicoes c"
+        else:
+            self._candidatos(marca)
+            origem_tickets = "temp.candidatos k JOIN armazem.tickets t ON t.id = k.id"
+            origem_contribuicoes = "temp.candidatos k JOIN contribuicoes c ON c.id = k.id"
+        self.marca = None if execucao is None else {
+            'execucao': execucao,
+            'inicio': self.inicio,
+            'fim': self.fim,
+            'reconciliado_em': agora if self.reconciliacao else marca['reconciliado_em'],
+        }
+        
+        diferentes = ' OR '.join(f"t.{_identificador(coluna)} IS NOT c.{_identificador(coluna)}" for coluna in self.colunas)
+        self.conexao.execute("DROP TABLE IF EXISTS temp.delta")
+        self.conexao.execute("CREATE TEMP TABLE delta (id INTEGER PRIMARY KEY)")
+        self.conexao.execute(f"""
+            INSERT INTO temp.delta (id)
+            SELECT t.id FROM {origem_tickets} LEFT JOIN contribuicoes c ON c.id = t.id
+            WHERE t.date >= ? AND t.date <= ? AND (c.id IS NULL OR {diferentes})
+            UNION
+            SELECT c.id FROM {origem_contribuicoes}
+            WHERE NOT EXISTS (SELECT 1 FROM armazem.tickets t WHERE t.id = c.id AND t.date >= ? AND t.date <= ?)
+        """, (self.inicio, self.fim, self.inicio, self.fim))
+    
+    def _blocos(self, sql, parametros=()):
+        """DataFrames de até TAMANHO_LOTE linhas de uma consulta"""
+        cursor = self.conexao.execute(sql, parametros)
+        colunas = [descricao[0] for descricao in cursor.description]
+        for linhas in iter(lambda: cursor.fetchmany(TAMANHO_LOTE), []):
+            yield pd.DataFrame(linhas, columns=colunas)
+    
+    def removidos(self):
+        """Contribuições gravadas dos tickets do delta, a retirar dos agregados"""
+        yield from self._blocos(f"SELECT {self.selecao} FROM contribuicoes WHERE id IN (SELECT id FROM temp.delta) ORDER BY id")
+    
+    def adicionados(self):
+        """Linhas atuais do armazém dos tickets do delta ainda no período, a somar aos agregados"""
+        yield from self._blocos(
+            f"SELECT {self.selecao} FROM armazem.tickets "
+            f"WHERE id IN (SELECT id FROM temp.delta) AND date >= ? AND date <= ? ORDER BY id",
+            (self.inicio, self.fim)
+        )
+    
+    def confirmar(self, agregados, assinatura):
+        """Grava as novas contribuições e os agregados (com o período recalculado) e confirma a transação"""
+        try:
+            colunas = ', '.join(map(_identificador, self.colunas))
+            self.conexao.execute("DELETE FROM contribuicoes WHERE id IN (SELECT id FROM temp.delta)")
+            self.conexao.execute(
+                f"INSERT INTO contribuicoes (id, {colunas}) SELECT id, {colunas} FROM armazem.tickets "
+                f"WHERE id IN (SELECT id FROM temp.delta) AND date >= ? AND date <= ?",
+                (self.inicio, self.fim)
+            )
+            
+            # Primeira e última data de criação vêm das contribuições (remoções podem ter mudado os extremos)
+            if 'Data Criação' in self.colunas:
+                data_min, data_max = self.conexao.execute(
+                    'SELECT MIN("Data Criação"), MAX("Data Criação") FROM contribuicoes').fetchone()
+                agregados.data_min = None if data_min is None else pd.Timestamp(data_min)
+                agregados.data_max = None if data_max is None else pd.Timestamp(data_max)
+            
+            self.conexao.executemany(
+                "INSERT OR REPLACE INTO estado (chave, valor) VALUES (?, ?)",
+                [('assinatura', pickle.dumps({'versao': VERSAO_ESTADO, **assinatura})),
+                 ('agregados', pickle.dumps(agregados))]
+            )
+            if self.marca is None:
+                self.conexao.execute("DELETE FROM estado WHERE chave = 'marca'")
+            else:
+                self.conexao.execute("INSERT OR REPLACE INTO estado (chave, valor) VALUES ('marca', ?)",
+                                     (pickle.dumps(self.marca),))
+            self.conexao.execute("COMMIT")
+        except Exception:
+            self.conexao.execute("ROLLBACK")
+            raise
+    
+    def descartar(self):
+        """Desfaz a transação em andamento, mantendo o estado anterior"""
+        if self.conexao.in_transaction:
+            self.conexao.execute("ROLLBACK")
+    
+    def fechar(self):
+        """Fecha a conexão com o banco"""
+        self.descartar()
+        self.conexao.close()
@@ -6,7 +6,7 @@ Esta versão otimizada implementa as recomendações estruturais para
 melhor qualidade e padronização dos dados CSV.
 
 Melhorias implementadas:
-- Padronização de nomes de colunas (snake_case, sem acentos)
+- Esquema de colunas com tipos declarados (nomes originais do CSV)
 - Validação e conversão de formatos de data para ISO 8601
 - Validação de dados numéricos
 - Padronização de categorias
@@ -18,34 +18,80 @@ Data: 2024
 """
 
 import pandas as pd
-import numpy as np
+import argparse
+import codecs
 import os
 import glob
 from datetime import datetime, timedelta
-import json
 import logging
-from typing import Dict, List, Tuple, Any, Optional
+import tracemalloc
+from typing import Dict, Any, Optional
+from pandas.api.types import union_categoricals
 
 # Importar o módulo de validação
 import sys
-import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from agregados_metricas import AgregadosMetricas, explodir_multiplos
+from armazem_tickets import ArmazemTickets, COLUNAS_ARMAZEM
+from colunas_derivadas import ColunasDerivadas
+from datas_glpi import FORMATOS_CSV, detectar_formato_csv
+from estado_metricas import EstadoMetricas
+from saida_colunar import colunas_arquivo_parquet, ler_blocos_parquet
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Esquema das colunas usadas nas métricas: apenas elas são lidas, já com o tipo declarado
+# (datas ficam como texto na leitura e são convertidas com formato explícito)
+ESQUEMA_COLUNAS = {
+    'ID': 'int64',
+    'Status': 'category',
+    'Prioridade': 'float64',
+    'Categoria': 'category',
+    'Entidade': 'category',
+    'Técnico': 'category',
+    'Grupo': 'category',
+    'Data Criação': 'str',
+    'Tempo Solução (min)': 'float64',
+    'Localização': 'Int64',
+}
+COLUNAS_DATA = ['Data Criação', 'Data Modificação', 'Data Solução', 'Data Fechamento']
+
+# Linhas por bloco na análise fora de memória, quando --tamanho-bloco não é informado
+TAMANHO_BLOCO_PADRAO = 100000
+
 class AnalisadorMetricasOtimizado:
     """Analisador de métricas otimizado com validação de dados"""
     
     def __init__(self):
         """Inicializa o analisador com configurações otimizadas"""
         self.df = None
-        self.df_original = None
-        self.metricas_estruturadas = {}
         self.relatorio_qualidade = {}
+        self.resultados = None
+        self.derivadas = None
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
+        # Armazém de tickets gravado pelo extrator e período analisado a partir dele (em dias)
+        self.arquivo_armazem = "../dados/tickets.sqlite"
+        self.dias_periodo = 180
+        
+        # Leitura do CSV: arquivo mapeado em memória (padrão) ou em blocos de tamanho_bloco linhas
+        self.tamanho_bloco = None
+        self.colunas_fonte = []
+        
+        # Análise fora de memória: agregados parciais bloco a bloco, sem carregar o histórico inteiro
+        self.fora_de_memoria = False
+        
+        # Métricas incrementais do armazém: agregados persistidos, atualizados só com os tickets que mudaram
+        self.arquivo_estado_metricas = "../dados/metricas_estado.sqlite"
+        self.incremental = True
+        self.recalcular = False
+        
+        # Pico de memória por etapa (etapa, memória atual, pico), medido quando tracemalloc está ativo
+        self.medicoes_memoria = []
+        
         # Configurações de SLA (em horas)
         self.sla_config = {
             'Baixa': 72,
@@ -55,6 +101,9 @@ class AnalisadorMetricasOtimizado:
             'Crítica': 4
         }
         
+        # Nome de cada código de prioridade do GLPI
+        self.nomes_prioridade = {1: 'Baixa', 2: 'Normal', 3: 'Alta', 4: 'Muito alta', 5: 'Crítica'}
+        
         logger.info("Analisador de Métricas Otimizado inicializado")
     
     def obter_arquivo_fixo(self) -> str:
@@ -66,6 +115,11 @@ class AnalisadorMetricasOtimizado:
         """
         logger.info("Buscando arquivo de dados mais recente...")
         
+        # Prioridade 0: Armazém de tickets (visão dos últimos 6 meses por consulta indexada)
+        if os.path.exists(self.arquivo_armazem):
+            logger.info(f"[OK] Usando armazém de tickets: {os.path.basename(self.arquivo_armazem)}")
+            return self.arquivo_armazem
+        
         # Prioridade 1: Dados filtrados dos últimos 6 meses
         pasta_6_meses = "../dados/tickets_6_meses/"
         if os.path.exists(pasta_6_meses):
@@ -90,60 +144,66 @@ class AnalisadorMetricasOtimizado:
         
         raise FileNotFoundError("[ERRO] Nenhum arquivo de dados encontrado!")
     
-    def carregar_e_validar_dados(self, arquivo_path: str) -> None:
+    def carregar_e_validar_dados(self, arquivo_path: str, dados: Optional[Any] = None) -> None:
         """
-        Carrega e valida os dados do arquivo CSV
+        Carrega e valida os dados do arquivo CSV (ou do armazém de tickets)
         
         Args:
-            arquivo_path (str): Caminho do arquivo CSV
+            arquivo_path (str): Caminho do arquivo CSV ou do banco SQLite do armazém
+            dados (Optional[Any]): Tickets já em memória (DataFrame ou dicionário coluna -> valores),
+                entregues pelo extrator no mesmo processo; quando informados, nada é lido do disco
         """
         logger.info(f"Carregando e validando dados: {arquivo_path}")
         
+        if dados is None and self.incremental and arquivo_path.endswith('.sqlite'):
+            self.atualizar_incremental(arquivo_path)
+            return
+        
+        if dados is None and self.fora_de_memoria:
+            self.agregar_em_blocos(arquivo_path)
+            return
+        
         try:
-            # Tentar diferentes encodings para carregar dados originais
-            encodings_to_try = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-            df_loaded = None
-            
-            for encoding in encodings_to_try:
-                try:
-                    logger.info(f"Tentando carregar arquivo com encoding: {encoding}")
-                    df_loaded = pd.read_csv(arquivo_path, encoding=encoding)
-                    logger.info(f"[OK] Arquivo carregado com sucesso usando encoding: {encoding}")
-                    break
-                except UnicodeDecodeError as e:
-                    logger.warning(f"Falha ao carregar com encoding {encoding}: {str(e)}")
-                    continue
-                except Exception as e:
-                    logger.warning(f"Erro inesperado com encoding {encoding}: {str(e)}")
-                    continue
-            
-            if df_loaded is None:
-                raise ValueError("Não foi possível carregar o arquivo com nenhum dos encodings testados")
-            
-            self.df_original = df_loaded
-            logger.info(f"Dados originais carregados: {len(self.df_original)} registros, {len(self.df_original.columns)} colunas")
+            if dados is not None:
+                # Linhas formatadas pelo extrator: mesmas colunas do CSV, sem passar pelo disco
+                df_loaded = pd.DataFrame(dados)
+                self.colunas_fonte = ['ID', *COLUNAS_ARMAZEM]
+                logger.info(f"[OK] Dados recebidos em memória do extrator: {len(df_loaded)} tickets")
+            elif arquivo_path.endswith('.sqlite'):
+                df_loaded = self.carregar_armazem(arquivo_path)
+            else:
+                # Preferir a cópia Parquet gerada pelo extrator (colunas já tipadas, sem reprocessar texto)
+                df_loaded = self.carregar_arquivo_colunar(arquivo_path)
+                if df_loaded is None:
+                    df_loaded = self.carregar_csv(arquivo_path)
             
-            # Processar e validar dados
-            self.df = self.df_original.copy()
+            # Um único DataFrame: as conversões substituem colunas no lugar, sem cópia dos dados originais
+            self.df = self.aplicar_esquema(df_loaded)
+            logger.info(f"Dados originais carregados: {len(self.df)} registros, {len(self.df.columns)} colunas")
             
             # Converter colunas de data para datetime
-            date_columns = ['Data Criação', 'Data Modificação', 'Data Solução', 'Data Fechamento']
-            for col in date_columns:
-                if col in self.df.columns:
+            for col in COLUNAS_DATA:
+                if col in self.df.columns and not pd.api.types.is_datetime64_any_dtype(self.df[col]):
                     try:
-                        self.df[col] = pd.to_datetime(self.df[col], errors='coerce')
+                        self.df[col] = self.converter_coluna_datas(self.df[col])
                         logger.info(f"Coluna {col} convertida para datetime")
                     except Exception as e:
                         logger.warning(f"Erro ao converter coluna {col} para datetime: {str(e)}")
             
             # Criar relatório de qualidade simples
-            duplicatas_antes = len(self.df)
-            self.df = self.df.drop_duplicates()
-            duplicatas_removidas = duplicatas_antes - len(self.df)
+            # Linhas repetidas têm o mesmo ID: com IDs únicos, a comparação das linhas inteiras é dispensada,
+            # e o DataFrame só é refeito quando há duplicatas a remover
+            duplicatas_removidas = 0
+            if 'ID' not in self.df.columns or not self.df['ID'].is_unique:
+                linhas_duplicadas = self.df.duplicated()
+                duplicatas_removidas = int(linhas_duplicadas.sum())
+                if duplicatas_removidas:
+                    self.df = self.df[~linhas_duplicadas]
+                del linhas_duplicadas
             
             self.relatorio_qualidade = {
                 'total_registros': len(self.df),
-                'total_colunas': len(self.df.columns),
+                'total_colunas': len(self.colunas_fonte),
                 'duplicatas': duplicatas_removidas,
                 'erros_validacao': []
             }
@@ -168,6 +228,357 @@ class AnalisadorMetricasOtimizado:
             logger.error(f"Erro ao carregar dados: {str(e)}")
             raise
     
+    def agregar_em_blocos(self, arquivo_path: str) -> None:
+        """
+        Calcula as métricas bloco a bloco, com agregados parciais mescláveis, sem manter os dados em memória
+        
+        Cada bloco passa pelo mesmo esquema e conversão de datas da carga completa; duplicatas são
+        descartadas pelo ID do ticket. A memória usada depende do tamanho do bloco e da quantidade de
+        valores distintos, não do tamanho do histórico.
+        
+        Args:
+            arquivo_path (str): Caminho do arquivo CSV ou do banco SQLite do armazém
+        """
+        agregados = AgregadosMetricas(self.nomes_prioridade, self.sla_config)
+        total_blocos = 0
+        
+        try:
+            for bloco in self.ler_blocos(arquivo_path):
+                agregados.atualizar(self.preparar_bloco(bloco))
+                total_blocos += 1
+            
+            self.resultados = agregados.finalizar()
+            self.relatorio_qualidade = {
+                'total_registros': agregados.total,
+                'total_colunas': len(self.colunas_fonte),
+                'duplicatas': agregados.duplicatas,
+                'erros_validacao': []
+            }
+            
+            logger.info(f"Dados agregados em {total_blocos} blocos: {self.relatorio_qualidade['total_registros']} registros")
+            logger.info(f"Tickets duplicados descartados: {self.relatorio_qualidade['duplicatas']}")
+            
+            temporal = self.resultados['temporal']
+            if temporal and temporal['data_min'] is not None:
+                logger.info(f"Período dos dados: {temporal['data_min'].strftime('%d/%m/%Y')} a {temporal['data_max'].strftime('%d/%m/%Y')}")
+            
+        except Exception as e:
+            logger.error(f"Erro ao agregar dados: {str(e)}")
+            raise
+    
+    def atualizar_incremental(self, arquivo_path: str) -> None:
+        """
+        Atualiza as métricas do armazém a partir do estado persistido, aplicando apenas o delta de tickets
+        
+        Tickets novos, alterados (em alguma coluna das métricas), removidos ou que saíram do período
+        analisado são retirados e/ou somados aos agregados gravados; o custo depende do tamanho do
+        delta, não do histórico. Os candidatos vêm pela marca de gravação do armazém, e uma vez por
+        dia todas as contribuições são conferidas. Sem estado compatível (primeira execução,
+        configuração de SLA ou de prioridades alterada, ou recalcular=True), todos os tickets do
+        período entram no delta.
+        
+        Args:
+            arquivo_path (str): Caminho do banco SQLite do armazém
+        """
+        fim = datetime.now()
+        inicio = fim - timedelta(days=self.dias_periodo)
+        colunas = [coluna for coluna in ESQUEMA_COLUNAS if coluna in COLUNAS_ARMAZEM]
+        assinatura = {'colunas': colunas, 'sla_config': self.sla_config, 'nomes_prioridade': self.nomes_prioridade}
+        
+        estado = EstadoMetricas(self.arquivo_estado_metricas, arquivo_path, colunas)
+        try:
+            agregados = None if self.recalcular else estado.carregar(assinatura)
+            if agregados is None:
+                logger.info("[DADOS] Estado das métricas ausente ou incompatível: recalculando todo o período")
+                estado.limpar()
+                agregados = AgregadosMetricas(self.nomes_prioridade, self.sla_config, descartar_duplicatas=False)
+            
+            estado.iniciar(inicio, fim)
+            if estado.reconciliacao:
+                logger.info("[DADOS] Conferência completa das métricas gravadas com o armazém")
+            removidos = adicionados = 0
+            for bloco in estado.removidos():
+                agregados.remover(self.preparar_bloco(bloco))
+                removidos += len(bloco)
+            for bloco in estado.adicionados():
+                agregados.atualizar(self.preparar_bloco(bloco))
+                adicionados += len(bloco)
+            estado.confirmar(agregados, assinatura)
+        except Exception as e:
+            logger.error(f"Erro ao atualizar métricas incrementais: {str(e)}")
+            raise
+        finally:
+            estado.fechar()
+        
+        self.colunas_fonte = ['ID', *COLUNAS_ARMAZEM]
+        self.resultados = agregados.finalizar()
+        self.relatorio_qualidade = {
+            'total_registros': agregados.total,
+            'total_colunas': len(self.colunas_fonte),
+            'duplicatas': 0,
+            'erros_validacao': []
+        }
+        
+        logger.info(f"[OK] Métricas incrementais do armazém: {removidos} contribuições retiradas, {adicionados} tickets incorporados")
+        logger.info(f"Dados processados: {agregados.total} registros de {inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}")
+        
+        temporal = self.resultados['temporal']
+        if temporal and temporal['data_min'] is not None:
+            logger.info(f"Período dos dados: {temporal['data_min'].strftime('%d/%m/%Y')} a {temporal['data_max'].strftime('%d/%m/%Y')}")
+    
+    def preparar_bloco(self, bloco: pd.DataFrame) -> pd.DataFrame:
+        """
+        Aplica a um bloco o esquema e a conversão de datas da carga completa
+        
+        Args:
+            bloco (pd.DataFrame): Bloco lido do CSV, do Parquet ou do armazém
+            
+        Returns:
+            pd.DataFrame: Bloco com as colunas do esquema nos tipos declarados e datas convertidas
+        """
+        bloco = self.aplicar_esquema(bloco)
+        for col in COLUNAS_DATA:
+            if col in bloco.columns and not pd.api.types.is_datetime64_any_dtype(bloco[col]):
+                try:
+                    bloco[col] = self.converter_coluna_datas(bloco[col])
+                except Exception as e:
+                    logger.warning(f"Erro ao converter coluna {col} para datetime: {str(e)}")
+        return bloco
+    
+    def ler_blocos(self, arquivo_path: str):
+        """
+        Lê os dados em blocos de tamanho_bloco linhas, com a mesma prioridade de fontes da carga completa
+        
+        Args:
+            arquivo_path (str): Caminho do arquivo CSV ou do banco SQLite do armazém
+            
+        Yields:
+            pd.DataFrame: Colunas do esquema de cada bloco
+        """
+        tamanho = self.tamanho_bloco or TAMANHO_BLOCO_PADRAO
+        
+        if arquivo_path.endswith('.sqlite'):
+            fim = datetime.now()
+            inicio = fim - timedelta(days=self.dias_periodo)
+            
+            armazem = ArmazemTickets(arquivo_path)
+            try:
+                cursor = armazem.consultar(data_inicial=inicio, data_final=fim, colunas=ESQUEMA_COLUNAS)
+                colunas = [descricao[0] for descricao in cursor.description]
+                self.colunas_fonte = ['ID', *COLUNAS_ARMAZEM]
+                logger.info(f"[OK] Armazém consultado em blocos: tickets de {inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}")
+                for linhas in iter(lambda: cursor.fetchmany(tamanho), []):
+                    yield pd.DataFrame(linhas, columns=colunas)
+            finally:
+                armazem.fechar()
+            return
+        
+        arquivo_parquet = os.path.splitext(arquivo_path)[0] + '.parquet'
+        if os.path.exists(arquivo_parquet):
+            try:
+                self.colunas_fonte = colunas_arquivo_parquet(arquivo_parquet)
+            except Exception as e:
+                logger.warning(f"Não foi possível ler o Parquet ({str(e)}), usando o CSV")
+            else:
+                logger.info(f"[OK] Arquivo Parquet lido em blocos: {os.path.basename(arquivo_parquet)}")
+                yield from ler_blocos_parquet(arquivo_parquet,
+                                              [coluna for coluna in self.colunas_fonte if coluna in ESQUEMA_COLUNAS],
+                                              tamanho)
+                return
+        
+        encoding = self.detectar_encoding(arquivo_path)
+        self.colunas_fonte = list(pd.read_csv(arquivo_path, encoding=encoding, nrows=0).columns)
+        colunas = [coluna for coluna in self.colunas_fonte if coluna in ESQUEMA_COLUNAS] or None
+        tipos = {coluna: ESQUEMA_COLUNAS[coluna] for coluna in colunas or []}
+        
+        logger.info(f"[OK] CSV lido em blocos com encoding {encoding}")
+        yield from pd.read_csv(arquivo_path, encoding=encoding, usecols=colunas, dtype=tipos, chunksize=tamanho)
+    
+    def carregar_armazem(self, arquivo_path: str) -> pd.DataFrame:
+        """
+        Consulta no armazém de tickets os tickets criados no período analisado
+        
+        O filtro usa o índice sobre a data de criação; as colunas são as mesmas do CSV,
+        com as datas no layout ISO.
+        
+        Args:
+            arquivo_path (str): Caminho do banco SQLite do armazém
+            
+        Returns:
+            pd.DataFrame: Tickets criados nos últimos dias_periodo dias
+        """
+        fim = datetime.now()
+        inicio = fim - timedelta(days=self.dias_periodo)
+        
+        armazem = ArmazemTickets(arquivo_path)
+        try:
+            cursor = armazem.consultar(data_inicial=inicio, data_final=fim, colunas=ESQUEMA_COLUNAS)
+            colunas = [descricao[0] for descricao in cursor.description]
+            df_armazem = pd.DataFrame(cursor.fetchall(), columns=colunas)
+        finally:
+            armazem.fechar()
+        self.colunas_fonte = ['ID', *COLUNAS_ARMAZEM]
+        
+        logger.info(f"[OK] Armazém consultado: {len(df_armazem)} tickets de {inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}")
+        return df_armazem
+    
+    def carregar_arquivo_colunar(self, arquivo_path: str) -> Optional[pd.DataFrame]:
+        """
+        Carrega a cópia Parquet do arquivo de dados, quando existir
+        
+        O extrator grava o Parquet ao lado de cada CSV, com status, entidade, categoria, grupo e
+        pessoas como categorias e as datas como timestamps nativos.
+        
+        Args:
+            arquivo_path (str): Caminho do arquivo CSV (ou do próprio Parquet)
+        
+        Returns:
+            Optional[pd.DataFrame]: Dados carregados, ou None para seguir com a leitura do CSV
+        """
+        arquivo_parquet = os.path.splitext(arquivo_path)[0] + '.parquet'
+        if not os.path.exists(arquivo_parquet):
+            return None
+        
+        try:
+            self.colunas_fonte = colunas_arquivo_parquet(arquivo_parquet)
+            df_colunar = pd.read_parquet(arquivo_parquet,
+                                         columns=[coluna for coluna in self.colunas_fonte if coluna in ESQUEMA_COLUNAS])
+            
+            # Categorias em ordem alfabética, como os agrupamentos sobre o CSV
+            for coluna in df_colunar.select_dtypes('category').columns:
+                df_colunar[coluna] = df_colunar[coluna].cat.reorder_categories(
+                    sorted(df_colunar[coluna].cat.categories)
+                )
+            logger.info(f"[OK] Arquivo Parquet carregado: {os.path.basename(arquivo_parquet)}")
+            return df_colunar
+        except Exception as e:
+            # Sem pyarrow ou arquivo ilegível: o CSV continua sendo a fonte oficial
+            logger.warning(f"Não foi possível carregar o Parquet ({str(e)}), usando o CSV")
+            return None
+    
+    def detectar_encoding(self, arquivo_path: str) -> str:
+        """
+        Detecta o encoding do CSV com uma única leitura dos bytes, sem reprocessar o arquivo com pandas
+        
+        Args:
+            arquivo_path (str): Caminho do arquivo CSV
+            
+        Returns:
+            str: 'utf-8' (ou 'utf-8-sig', com BOM) se o arquivo inteiro for UTF-8 válido, senão 'latin-1'
+        """
+        decodificador = codecs.getincrementaldecoder('utf-8')()
+        with open(arquivo_path, 'rb') as arquivo:
+            inicio = arquivo.read(len(codecs.BOM_UTF8))
+            encoding = 'utf-8-sig' if inicio == codecs.BOM_UTF8 else 'utf-8'
+            try:
+                decodificador.decode(inicio)
+                for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+                    decodificador.decode(bloco)
+                decodificador.decode(b'', final=True)
+            except UnicodeDecodeError as e:
+                logger.warning(f"Arquivo não está em UTF-8 ({str(e)}), usando latin-1")
+                return 'latin-1'
+        return encoding
+    
+    def carregar_csv(self, arquivo_path: str) -> pd.DataFrame:
+        """
+        Lê do CSV apenas as colunas do esquema, com tipos declarados e encoding detectado uma única vez
+        
+        Por padrão o arquivo é mapeado em memória; com tamanho_bloco definido, é lido em blocos
+        cujas categorias são unificadas ao final.
+        
+        Args:
+            arquivo_path (str): Caminho do arquivo CSV
+            
+        Returns:
+            pd.DataFrame: Colunas usadas nas métricas
+        """
+        encoding = self.detectar_encoding(arquivo_path)
+        self.colunas_fonte = list(pd.read_csv(arquivo_path, encoding=encoding, nrows=0).columns)
+        
+        # Projeção: CSVs de outro layout (sem as colunas do esquema) são lidos por inteiro
+        colunas = [coluna for coluna in self.colunas_fonte if coluna in ESQUEMA_COLUNAS] or None
+        tipos = {coluna: ESQUEMA_COLUNAS[coluna] for coluna in colunas or []}
+        
+        if not self.tamanho_bloco:
+            df_csv = pd.read_csv(arquivo_path, encoding=encoding, usecols=colunas, dtype=tipos, memory_map=True)
+        else:
+            blocos = list(pd.read_csv(arquivo_path, encoding=encoding, usecols=colunas, dtype=tipos,
+                                      chunksize=self.tamanho_bloco))
+            
+            # Categorias iguais em todos os blocos, para a concatenação manter o tipo categórico
+            for coluna, tipo in tipos.items():
+                if tipo == 'category' and len(blocos) > 1:
+                    categorias = union_categoricals([bloco[coluna] for bloco in blocos], sort_categories=True).categories
+                    for bloco in blocos:
+                        bloco[coluna] = bloco[coluna].cat.set_categories(categorias)
+            df_csv = pd.concat(blocos, ignore_index=True) if blocos else pd.DataFrame(columns=colunas)
+        
+        logger.info(f"[OK] CSV carregado com encoding {encoding}: {len(df_csv.columns)} de {len(self.colunas_fonte)} colunas")
+        return df_csv
+    
+    def aplicar_esquema(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Garante os tipos declarados do esquema, qualquer que seja a origem dos dados
+        
+        Args:
+            df (pd.DataFrame): Dados carregados do CSV, do Parquet ou do armazém
+            
+        Returns:
+            pd.DataFrame: Dados com as colunas do esquema nos tipos declarados
+        """
+        for coluna, tipo in ESQUEMA_COLUNAS.items():
+            if coluna not in df.columns or coluna in COLUNAS_DATA or str(df[coluna].dtype) == tipo:
+                continue
+            try:
+                df[coluna] = df[coluna].astype(tipo)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Coluna {coluna} mantida como {df[coluna].dtype}: {str(e)}")
+        return df
+    
+    def converter_coluna_datas(self, serie: pd.Series) -> pd.Series:
+        """
+        Converte uma coluna de datas do CSV para datetime com formato explícito
+        
+        O formato ('br' ou 'iso') é detectado pelo primeiro valor preenchido, e a coluna
+        inteira é convertida em uma única chamada vetorizada, sem inferência por linha.
+        
+        Args:
+            serie (pd.Series): Coluna com datas em texto
+            
+        Returns:
+            pd.Series: Coluna convertida (NaT para valores vazios ou inválidos)
+        """
+        preenchidos = serie.dropna()
+        if preenchidos.empty:
+            return pd.to_datetime(serie, errors='coerce')
+        
+        formato_data_hora, formato_data = FORMATOS_CSV[detectar_formato_csv(preenchidos.iloc[0])]
+        convertida = pd.to_datetime(serie, format=formato_data_hora, errors='coerce')
+        
+        # Valores gravados apenas com a data (sem hora) são convertidos à parte
+        somente_data = convertida.isna() & serie.notna()
+        if somente_data.any():
+            convertida[somente_data] = pd.to_datetime(serie[somente_data], format=formato_data, errors='coerce')
+        
+        return convertida
+    
+    def explodir_multiplos(self, df: pd.DataFrame, coluna: str) -> pd.DataFrame:
+        """
+        Separa colunas com vários vínculos por ticket (ex.: 'Técnico A; Técnico B') em uma linha por valor
+        
+        Cada técnico ou grupo de um ticket com múltiplos atribuídos passa a contar o ticket,
+        em vez de o conjunto inteiro virar uma categoria própria.
+        
+        Args:
+            df (pd.DataFrame): Dados dos tickets
+            coluna (str): Coluna de requerentes, técnicos ou grupos
+            
+        Returns:
+            pd.DataFrame: Dados com uma linha por (ticket, valor da coluna)
+        """
+        return explodir_multiplos(df, coluna)
+    
     def exibir_cabecalho(self) -> None:
         """Exibe cabeçalho informativo otimizado"""
         print("=" * 70)
@@ -201,86 +612,123 @@ class AnalisadorMetricasOtimizado:
         
         print()
     
+    def calcular_resultados(self) -> Dict[str, Any]:
+        """
+        Calcula sobre o DataFrame carregado os resultados exibidos e exportados pelo analisador
+        
+        O DataFrame inteiro é avaliado como um único bloco pelo mesmo motor da análise fora de memória
+        (AgregadosMetricas), com quantis exatos; as métricas são as declaradas em agregados_metricas.
+        
+        Returns:
+            Dict[str, Any]: Contagens e percentuais por dimensão, distribuição temporal, TTR, TTR por dimensão e SLA
+        """
+        # Duplicatas já foram removidas na carga, comparando as linhas inteiras
+        agregados = AgregadosMetricas(self.nomes_prioridade, self.sla_config, limite_exatos=None,
+                                      descartar_duplicatas=False)
+        agregados.atualizar(self.df, self.obter_derivadas())
+        return agregados.finalizar()
+    
+    def obter_derivadas(self) -> ColunasDerivadas:
+        """
+        Colunas derivadas do DataFrame analisado (TTR, SLA, mês e dia da semana), compartilhadas pelas métricas
+        
+        Returns:
+            ColunasDerivadas: Camada de colunas calculadas no primeiro uso e guardadas em cache
+        """
+        if self.derivadas is None or self.derivadas.df is not self.df:
+            self.derivadas = ColunasDerivadas(self.df, self.nomes_prioridade, self.sla_config)
+        return self.derivadas
+    
+    def obter_resultados(self) -> Dict[str, Any]:
+        """
+        Resultados das métricas, calculados uma única vez (na análise fora de memória, já vêm dos agregados)
+        
+        Returns:
+            Dict[str, Any]: Resultados no formato de calcular_resultados
+        """
+        if self.resultados is None:
+            self.resultados = self.calcular_resultados()
+            # Exibição e exportação leem apenas os resultados: as colunas derivadas podem ser liberadas
+            self.derivadas = None
+        return self.resultados
+    
     def calcular_metricas_gerais(self) -> None:
         """Calcula métricas gerais otimizadas"""
         logger.info("Calculando métricas gerais...")
+        resultados = self.obter_resultados()
+        total = resultados['total']
+        contagens = resultados['contagens']
+        percentuais = resultados['percentuais']
         
         print("=" * 70)
         print("[DADOS] MÉTRICAS GERAIS")
         print("=" * 70)
-        print(f"[TICKET] Total de tickets: {len(self.df):,}")
+        print(f"[TICKET] Total de tickets: {total:,}")
         print()
         
         # Distribuição por status
-        if 'Status' in self.df.columns:
+        if 'Status' in contagens:
             print("[GRAFICO] DISTRIBUIÇÃO POR STATUS:")
-            status_counts = self.df['Status'].value_counts()
-            for status, count in status_counts.items():
-                percentage = (count / len(self.df)) * 100
+            for status, count in contagens['Status'].items():
+                percentage = percentuais['Status'][status]
                 print(f"   • {status}: {count:,} ({percentage:.1f}%)")
             print()
         
         # Distribuição por entidade (top 10)
-        if 'Entidade' in self.df.columns:
+        if 'Entidade' in contagens:
             print("[EMPRESA] DISTRIBUIÇÃO POR ENTIDADE (Top 10):")
-            entidade_counts = self.df['Entidade'].value_counts().head(10)
+            entidade_counts = contagens['Entidade'].head(10)
             for entidade, count in entidade_counts.items():
-                percentage = (count / len(self.df)) * 100
+                percentage = percentuais['Entidade'][entidade]
                 print(f"   • {entidade}: {count:,} ({percentage:.1f}%)")
             
-            total_outras = len(self.df) - entidade_counts.sum()
+            total_outras = total - entidade_counts.sum()
             if total_outras > 0:
-                outras_entidades = self.df['Entidade'].nunique() - 10
+                outras_entidades = (contagens['Entidade'] > 0).sum() - 10
                 print(f"   • ... e mais {outras_entidades} entidades ({total_outras:,} tickets)")
             print()
         
         # Distribuição por grupo técnico
-        if 'Grupo' in self.df.columns:
+        if 'Grupo' in contagens:
             print("[GRUPO] DISTRIBUIÇÃO POR GRUPO TÉCNICO:")
-            grupo_counts = self.df['Grupo'].value_counts()
-            for grupo, count in grupo_counts.items():
-                percentage = (count / len(self.df)) * 100
+            for grupo, count in contagens['Grupo'].items():
+                percentage = percentuais['Grupo'][grupo]
                 print(f"   • {grupo}: {count:,} ({percentage:.1f}%)")
             print()
         
         # Top categorias
-        if 'Categoria' in self.df.columns:
+        if 'Categoria' in contagens:
             print("[LISTA] PRINCIPAIS CATEGORIAS (Top 10):")
-            categoria_counts = self.df['Categoria'].value_counts().head(10)
-            for categoria, count in categoria_counts.items():
-                percentage = (count / len(self.df)) * 100
+            for categoria, count in contagens['Categoria'].head(10).items():
+                percentage = percentuais['Categoria'][categoria]
                 print(f"   • {categoria}: {count:,} ({percentage:.1f}%)")
             print()
         
         # Top técnicos
-        if 'Técnico' in self.df.columns:
+        if 'Técnico' in contagens:
             print("[TECNICO] TOP TÉCNICOS (Top 10):")
-            tecnico_counts = self.df['Técnico'].value_counts().head(10)
-            for tecnico, count in tecnico_counts.items():
+            for tecnico, count in contagens['Técnico'].head(10).items():
                 if pd.notna(tecnico) and tecnico.strip():
-                    percentage = (count / len(self.df)) * 100
+                    percentage = percentuais['Técnico'][tecnico]
                     print(f"   • {tecnico}: {count:,} ({percentage:.1f}%)")
             print()
         
         # Top localizações
-        if 'Localização' in self.df.columns:
+        if 'Localização' in contagens:
             print("[LOCAL] PRINCIPAIS LOCALIZAÇÕES (Top 10):")
-            # Converter para string para análise
-            df_loc = self.df.copy()
-            df_loc['localizacao_str'] = df_loc['Localização'].astype(str)
-            localizacao_counts = df_loc['localizacao_str'].value_counts().head(10)
-            
-            for localizacao, count in localizacao_counts.items():
-                if localizacao != 'nan' and localizacao != '0':
-                    percentage = (count / len(self.df)) * 100
+            for localizacao, count in contagens['Localização'].head(10).items():
+                if localizacao not in ('nan', '<NA>', '0'):
+                    percentage = percentuais['Localização'][localizacao]
                     print(f"   • {localizacao}: {count:,} ({percentage:.1f}%)")
             print()
     
     def calcular_metricas_temporais(self) -> None:
         """Calcula métricas temporais otimizadas"""
         logger.info("Calculando métricas temporais...")
+        resultados = self.obter_resultados()
+        temporal = resultados['temporal']
         
-        if 'Data Criação' not in self.df.columns:
+        if temporal is None:
             logger.warning("Coluna 'Data Criação' não encontrada. Pulando métricas temporais.")
             return
         
@@ -289,18 +737,13 @@ class AnalisadorMetricasOtimizado:
         print("=" * 70)
         
         # Tickets por mês
-        df_temporal = self.df.copy()
-        df_temporal['mes_criacao'] = df_temporal['Data Criação'].dt.to_period('M')
-        tickets_por_mes = df_temporal['mes_criacao'].value_counts().sort_index()
-        
         print("[MES] TICKETS POR MÊS:")
-        for mes, count in tickets_por_mes.items():
+        for mes, count in temporal['por_mes'].items():
             print(f"   • {mes}: {count:,} tickets")
         print()
         
         # Tickets por dia da semana
-        df_temporal['dia_semana'] = df_temporal['Data Criação'].dt.day_name()
-        tickets_por_dia = df_temporal['dia_semana'].value_counts()
+        tickets_por_dia = temporal['por_dia']
         
         print("[DIA] TICKETS POR DIA DA SEMANA:")
         dias_ordem = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
@@ -309,65 +752,55 @@ class AnalisadorMetricasOtimizado:
         for dia_en, dia_pt in zip(dias_ordem, dias_pt):
             if dia_en in tickets_por_dia.index:
                 count = tickets_por_dia[dia_en]
-                percentage = (count / len(self.df)) * 100
+                percentage = temporal['percentual_dia'][dia_en]
                 print(f"   • {dia_pt}: {count:,} ({percentage:.1f}%)")
         print()
         
         # Período de análise
-        data_min = df_temporal['Data Criação'].min()
-        data_max = df_temporal['Data Criação'].max()
+        data_min = temporal['data_min']
+        data_max = temporal['data_max']
         periodo_dias = (data_max - data_min).days
         
         print(f"[DADOS] PERÍODO DE ANÁLISE:")
         print(f"   • Data inicial: {data_min.strftime('%d/%m/%Y %H:%M')}")
         print(f"   • Data final: {data_max.strftime('%d/%m/%Y %H:%M')}")
         print(f"   • Período total: {periodo_dias} dias")
-        print(f"   • Média diária: {len(self.df) / max(periodo_dias, 1):.1f} tickets/dia")
+        print(f"   • Média diária: {resultados['total'] / max(periodo_dias, 1):.1f} tickets/dia")
         print()
     
     def calcular_metricas_performance(self) -> None:
         """Calcula métricas de performance otimizadas"""
         logger.info("Calculando métricas de performance...")
+        resultados = self.obter_resultados()
+        ttr = resultados['ttr']
         
         print("=" * 70)
         print("[PERF] MÉTRICAS DE PERFORMANCE")
         print("=" * 70)
         
         # Análise de TTR (Time to Resolution)
-        if 'Tempo Solução (min)' in self.df.columns:
-            df_resolvidos = self.df[self.df['Tempo Solução (min)'].notna() & (self.df['Tempo Solução (min)'] > 0)].copy()
+        if ttr is not None:
+            print("[SLA] TEMPO DE RESOLUÇÃO (TTR):")
+            print(f"   • Tickets resolvidos: {ttr['quantidade']:,}")
+            print(f"   • TTR médio: {ttr['media']:.1f} horas")
+            print(f"   • TTR mediano: {ttr['mediana']:.1f} horas")
+            print(f"   • TTR mínimo: {ttr['minimo']:.1f} horas")
+            print(f"   • TTR máximo: {ttr['maximo']:.1f} horas")
             
-            if len(df_resolvidos) > 0:
-                df_resolvidos['ttr_horas'] = df_resolvidos['Tempo Solução (min)'] / 60
-                
-                print("[SLA] TEMPO DE RESOLUÇÃO (TTR):")
-                print(f"   • Tickets resolvidos: {len(df_resolvidos):,}")
-                print(f"   • TTR médio: {df_resolvidos['ttr_horas'].mean():.1f} horas")
-                print(f"   • TTR mediano: {df_resolvidos['ttr_horas'].median():.1f} horas")
-                print(f"   • TTR mínimo: {df_resolvidos['ttr_horas'].min():.1f} horas")
-                print(f"   • TTR máximo: {df_resolvidos['ttr_horas'].max():.1f} horas")
-                
-                # Percentis
-                p25 = df_resolvidos['ttr_horas'].quantile(0.25)
-                p75 = df_resolvidos['ttr_horas'].quantile(0.75)
-                p90 = df_resolvidos['ttr_horas'].quantile(0.90)
-                p95 = df_resolvidos['ttr_horas'].quantile(0.95)
+            # Percentis
+            for q, valor in ttr['percentis'].items():
+                print(f"   • {q:.0%} resolvidos em até: {valor:.1f} horas")
+            print()
+            
+            # TTR por grupo técnico
+            if 'Grupo' in resultados['ttr_por_dimensao']:
+                print("[GRUPO] TTR MÉDIO POR GRUPO TÉCNICO:")
+                ttr_por_grupo = resultados['ttr_por_dimensao']['Grupo'][['mean', 'count']].round(1)
+                ttr_por_grupo = ttr_por_grupo.sort_values('mean')
                 
-                print(f"   • 25% resolvidos em até: {p25:.1f} horas")
-                print(f"   • 75% resolvidos em até: {p75:.1f} horas")
-                print(f"   • 90% resolvidos em até: {p90:.1f} horas")
-                print(f"   • 95% resolvidos em até: {p95:.1f} horas")
+                for grupo, dados in ttr_por_grupo.iterrows():
+                    print(f"   • {grupo}: {dados['mean']:.1f}h (média) - {dados['count']:,} tickets")
                 print()
-                
-                # TTR por grupo técnico
-                if 'Grupo' in self.df.columns:
-                    print("[GRUPO] TTR MÉDIO POR GRUPO TÉCNICO:")
-                    ttr_por_grupo = df_resolvidos.groupby('Grupo')['ttr_horas'].agg(['mean', 'count']).round(1)
-                    ttr_por_grupo = ttr_por_grupo.sort_values('mean')
-                    
-                    for grupo, dados in ttr_por_grupo.iterrows():
-                        print(f"   • {grupo}: {dados['mean']:.1f}h (média) - {dados['count']:,} tickets")
-                    print()
         
         # Análise de SLA
         self.calcular_sla_performance()
@@ -375,38 +808,27 @@ class AnalisadorMetricasOtimizado:
     def calcular_sla_performance(self) -> None:
         """Calcula métricas de SLA otimizadas"""
         logger.info("Calculando métricas de SLA...")
+        sla = self.obter_resultados()['sla']
         
-        if 'Prioridade' not in self.df.columns or 'Tempo Solução (min)' not in self.df.columns:
+        if sla is None:
             logger.warning("Colunas necessárias para SLA não encontradas")
             return
         
         print("[SLA] ANÁLISE DE SLA (Service Level Agreement):")
         
-        # Mapear prioridades para SLA
-        prioridade_sla = {1: 'Baixa', 2: 'Normal', 3: 'Alta', 4: 'Muito alta', 5: 'Crítica'}
-        
-        df_sla = self.df[self.df['Tempo Solução (min)'].notna() & (self.df['Tempo Solução (min)'] > 0)].copy()
-        df_sla['prioridade_nome'] = df_sla['Prioridade'].map(prioridade_sla)
-        df_sla['sla_horas'] = df_sla['prioridade_nome'].map(self.sla_config)
-        df_sla['ttr_horas'] = df_sla['Tempo Solução (min)'] / 60
-        df_sla['dentro_sla'] = df_sla['ttr_horas'] <= df_sla['sla_horas']
-        
         # Estatísticas gerais de SLA
-        total_sla = len(df_sla)
-        dentro_sla = df_sla['dentro_sla'].sum()
+        total_sla = sla['total']
+        dentro_sla = sla['dentro']
         fora_sla = total_sla - dentro_sla
         
         print(f"   • Total analisado: {total_sla:,} tickets")
-        print(f"   • Dentro do SLA: {dentro_sla:,} ({(dentro_sla/total_sla)*100:.1f}%)")
-        print(f"   • Fora do SLA: {fora_sla:,} ({(fora_sla/total_sla)*100:.1f}%)")
+        print(f"   • Dentro do SLA: {dentro_sla:,} ({(dentro_sla/max(total_sla, 1))*100:.1f}%)")
+        print(f"   • Fora do SLA: {fora_sla:,} ({(fora_sla/max(total_sla, 1))*100:.1f}%)")
         print()
         
         # SLA por prioridade
         print("[DADOS] SLA POR PRIORIDADE:")
-        sla_por_prioridade = df_sla.groupby('prioridade_nome').agg({
-            'dentro_sla': ['count', 'sum'],
-            'ttr_horas': 'mean'
-        }).round(1)
+        sla_por_prioridade = sla['por_prioridade'].round(1)
         
         for prioridade in ['Crítica', 'Muito alta', 'Alta', 'Normal', 'Baixa']:
             if prioridade in sla_por_prioridade.index:
@@ -421,9 +843,30 @@ class AnalisadorMetricasOtimizado:
                     print(f"   • {prioridade} (SLA: {sla_limite}h): {dentro}/{total} ({percentual:.1f}%) - TTR médio: {ttr_medio:.1f}h")
         print()
     
+    def montar_tabela_contagem(self, resultados: Dict[str, Any], coluna: str, rotulo: str) -> pd.DataFrame:
+        """
+        Monta a tabela exportada de uma dimensão a partir das contagens e percentuais já calculados
+        
+        Args:
+            resultados (Dict[str, Any]): Resultados das métricas
+            coluna (str): Dimensão (ex.: 'Status')
+            rotulo (str): Nome da coluna dos valores no CSV (ex.: 'status')
+            
+        Returns:
+            pd.DataFrame: Colunas rotulo, quantidade e percentual (duas casas decimais)
+        """
+        contagem = resultados['contagens'][coluna]
+        return pd.DataFrame({
+            rotulo: contagem.index,
+            'quantidade': contagem.to_numpy(),
+            'percentual': resultados['percentuais'][coluna].round(2).to_numpy(),
+        })
+    
     def exportar_metricas_csv(self) -> None:
         """Exporta métricas em formato CSV otimizado"""
         logger.info("Exportando métricas em CSV...")
+        resultados = self.obter_resultados()
+        contagens = resultados['contagens']
         
         pasta_csv = "../dados/metricas_csv/"
         os.makedirs(pasta_csv, exist_ok=True)
@@ -433,43 +876,34 @@ class AnalisadorMetricasOtimizado:
         
         try:
             # 1. Status
-            if 'Status' in self.df.columns:
-                status_df = self.df['Status'].value_counts().reset_index()
-                status_df.columns = ['status', 'quantidade']
-                status_df['percentual'] = (status_df['quantidade'] / len(self.df) * 100).round(2)
+            if 'Status' in contagens:
+                status_df = self.montar_tabela_contagem(resultados, 'Status', 'status')
                 arquivo_status = os.path.join(pasta_csv, f"status_{self.timestamp}.csv")
                 status_df.to_csv(arquivo_status, index=False, encoding='utf-8')
                 print(f"[OK] Status: {arquivo_status}")
             
             # 2. Entidades
-            if 'Entidade' in self.df.columns:
-                entidades_df = self.df['Entidade'].value_counts().reset_index()
-                entidades_df.columns = ['entidade', 'quantidade']
-                entidades_df['percentual'] = (entidades_df['quantidade'] / len(self.df) * 100).round(2)
+            if 'Entidade' in contagens:
+                entidades_df = self.montar_tabela_contagem(resultados, 'Entidade', 'entidade')
                 arquivo_entidades = os.path.join(pasta_csv, f"entidades_{self.timestamp}.csv")
                 entidades_df.to_csv(arquivo_entidades, index=False, encoding='utf-8')
                 print(f"[OK] Entidades: {arquivo_entidades}")
             
             # 3. Técnicos
-            if 'Técnico' in self.df.columns:
-                tecnicos_df = self.df['Técnico'].value_counts().reset_index()
-                tecnicos_df.columns = ['tecnico', 'quantidade']
-                tecnicos_df['percentual'] = (tecnicos_df['quantidade'] / len(self.df) * 100).round(2)
+            if 'Técnico' in contagens:
+                tecnicos_df = self.montar_tabela_contagem(resultados, 'Técnico', 'tecnico')
                 arquivo_tecnicos = os.path.join(pasta_csv, f"tecnicos_{self.timestamp}.csv")
                 tecnicos_df.to_csv(arquivo_tecnicos, index=False, encoding='utf-8')
                 print(f"[OK] Técnicos: {arquivo_tecnicos}")
             
             # 4. TTR por Grupo
-            if 'Grupo' in self.df.columns and 'Tempo Solução (min)' in self.df.columns:
-                df_ttr = self.df[self.df['Tempo Solução (min)'].notna() & (self.df['Tempo Solução (min)'] > 0)].copy()
-                if len(df_ttr) > 0:
-                    df_ttr['ttr_horas'] = df_ttr['Tempo Solução (min)'] / 60
-                    ttr_grupo_df = df_ttr.groupby('Grupo')['ttr_horas'].agg(['mean', 'median', 'count']).round(2)
-                    ttr_grupo_df.columns = ['ttr_medio_horas', 'ttr_mediano_horas', 'quantidade_tickets']
-                    ttr_grupo_df = ttr_grupo_df.reset_index()
-                    arquivo_ttr = os.path.join(pasta_csv, f"ttr_grupo_{self.timestamp}.csv")
-                    ttr_grupo_df.to_csv(arquivo_ttr, index=False, encoding='utf-8')
-                    print(f"[OK] TTR por Grupo: {arquivo_ttr}")
+            if 'Grupo' in resultados['ttr_por_dimensao']:
+                ttr_grupo_df = resultados['ttr_por_dimensao']['Grupo'][['mean', 'median', 'count']].round(2)
+                ttr_grupo_df.columns = ['ttr_medio_horas', 'ttr_mediano_horas', 'quantidade_tickets']
+                ttr_grupo_df = ttr_grupo_df.reset_index()
+                arquivo_ttr = os.path.join(pasta_csv, f"ttr_grupo_{self.timestamp}.csv")
+                ttr_grupo_df.to_csv(arquivo_ttr, index=False, encoding='utf-8')
+                print(f"[OK] TTR por Grupo: {arquivo_ttr}")
             
             # 5. Relatório de Qualidade
             relatorio_df = pd.DataFrame([
@@ -490,6 +924,43 @@ class AnalisadorMetricasOtimizado:
         
         print()
     
+    def medir_memoria(self, etapa: str) -> None:
+        """
+        Registra a memória alocada e o pico da etapa concluída (requer tracemalloc ativo)
+        
+        Args:
+            etapa (str): Nome da etapa (ex.: 'carga', 'métricas', 'exportação')
+        """
+        if not tracemalloc.is_tracing():
+            return
+        atual, pico = tracemalloc.get_traced_memory()
+        self.medicoes_memoria.append((etapa, atual, pico))
+        tracemalloc.reset_peak()
+    
+    def exibir_relatorio_memoria(self) -> None:
+        """Exibe o tamanho do DataFrame analisado e o pico de memória de cada etapa em relação a ele"""
+        if not self.medicoes_memoria:
+            return
+        
+        mb = 1024 * 1024
+        print("=" * 70)
+        print("[DADOS] USO DE MEMÓRIA")
+        print("=" * 70)
+        
+        tamanho_dados = 0
+        if self.df is not None:
+            tamanho_dados = int(self.df.memory_usage(deep=True).sum())
+            print(f"   • DataFrame analisado: {tamanho_dados / mb:.1f} MB ({len(self.df):,} linhas, {len(self.df.columns)} colunas)")
+            for coluna, tamanho in self.df.memory_usage(deep=True, index=False).sort_values(ascending=False).items():
+                print(f"     - {coluna}: {tamanho / mb:.1f} MB ({self.df[coluna].dtype})")
+        else:
+            print("   • Dados não mantidos em memória (análise em blocos)")
+        
+        for etapa, atual, pico in self.medicoes_memoria:
+            proporcao = f" ({pico / tamanho_dados:.1f}x os dados)" if tamanho_dados else ""
+            print(f"   • {etapa}: pico de {pico / mb:.1f} MB{proporcao}, {atual / mb:.1f} MB ao final")
+        print()
+    
     def gerar_relatorio_final(self) -> None:
         """Gera relatório final otimizado"""
         print("=" * 70)
@@ -512,7 +983,7 @@ class AnalisadorMetricasOtimizado:
         
         print()
         print("[SLA] MELHORIAS IMPLEMENTADAS:")
-        print("   [OK] Padronização de nomes de colunas (snake_case)")
+        print("   [OK] Esquema de colunas com tipos declarados (nomes originais do CSV)")
         print("   [OK] Validação e conversão de datas para ISO 8601")
         print("   [OK] Validação de dados numéricos")
         print("   [OK] Padronização de categorias")
@@ -523,33 +994,65 @@ class AnalisadorMetricasOtimizado:
         print("[SALVAR] Métricas exportadas em formato CSV")
         print("[DOC] Documentação gerada automaticamente")
         print("[FIM] Obrigado por usar o Analisador de Métricas Otimizado!")
-
-
-def main():
-    """Função principal otimizada"""
-    try:
-        # Inicializar analisador
-        analisador = AnalisadorMetricasOtimizado()
-        
-        # Obter arquivo de dados
-        arquivo_dados = analisador.obter_arquivo_fixo()
+    
+    def executar(self, arquivo_path: str, dados: Optional[Any] = None) -> None:
+        """
+        Executa a análise completa: carga, métricas no console, exportação em CSV e relatório final
         
+        Args:
+            arquivo_path (str): Caminho do arquivo CSV ou do banco SQLite do armazém
+            dados (Optional[Any]): Tickets já em memória, entregues pelo extrator no mesmo processo
+        """
         # Carregar e validar dados
-        analisador.carregar_e_validar_dados(arquivo_dados)
+        self.carregar_e_validar_dados(arquivo_path, dados)
+        self.medir_memoria("carga")
         
         # Exibir cabeçalho
-        analisador.exibir_cabecalho()
+        self.exibir_cabecalho()
         
         # Calcular métricas
-        analisador.calcular_metricas_gerais()
-        analisador.calcular_metricas_temporais()
-        analisador.calcular_metricas_performance()
+        self.calcular_metricas_gerais()
+        self.calcular_metricas_temporais()
+        self.calcular_metricas_performance()
+        self.medir_memoria("métricas")
         
         # Exportar resultados
-        analisador.exportar_metricas_csv()
+        self.exportar_metricas_csv()
+        self.medir_memoria("exportação")
+        self.exibir_relatorio_memoria()
         
         # Relatório final
-        analisador.gerar_relatorio_final()
+        self.gerar_relatorio_final()
+
+def main():
+    """Função principal otimizada"""
+    parser = argparse.ArgumentParser(description="Analisa as métricas dos tickets extraídos do GLPI")
+    parser.add_argument('--tamanho-bloco', type=int, default=None, metavar='LINHAS',
+                        help="Lê o CSV em blocos de LINHAS linhas em vez de mapeá-lo em memória")
+    parser.add_argument('--fora-de-memoria', action='store_true',
+                        help="Calcula as métricas bloco a bloco, sem carregar o histórico inteiro em memória")
+    parser.add_argument('--relatorio-memoria', action='store_true',
+                        help="Mede o pico de memória de cada etapa (tracemalloc) e exibe o relatório ao final")
+    parser.add_argument('--recalcular-metricas', action='store_true',
+                        help="Descarta o estado persistido e recalcula as métricas do armazém do zero")
+    parser.add_argument('--sem-incremental', action='store_true',
+                        help="Recalcula as métricas do armazém a cada execução, sem usar nem gravar o estado persistido")
+    args = parser.parse_args()
+    
+    if args.relatorio_memoria:
+        tracemalloc.start()
+    
+    try:
+        # Inicializar analisador
+        analisador = AnalisadorMetricasOtimizado()
+        analisador.tamanho_bloco = args.tamanho_bloco
+        analisador.fora_de_memoria = args.fora_de_memoria
+        analisador.incremental = not args.sem_incremental
+        analisador.recalcular = args.recalcular_metricas
+        
+        # Obter arquivo de dados e executar a análise
+        arquivo_dados = analisador.obter_arquivo_fixo()
+        analisador.executar(arquivo_dados)
         
     except Exception as e:
         logger.error(f"Erro durante a execução: {str(e)}")
@@ -6,13 +6,24 @@ Baseado na funcionalidade da opção 8 do script original
 """
 
 import requests
+import argparse
 import csv
-import html
-import re
+import glob
+import json
 import sys
 import os
+import time
 from datetime import datetime, timedelta
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+import datas_glpi
+from armazem_tickets import ArmazemTickets
+from cache_dimensoes import CacheDimensoes, CacheLRU
+from indice_relacionamentos import IndiceRelacionamentos, PAPEIS, SEPARADOR_MULTIPLOS
+import normalizacao_texto
+from leitor_json_incremental import iterar_itens_array_json
+from saida_colunar import EscritorParquetIncremental, pyarrow_disponivel
 
 # Configurar encoding para Windows
 if os.name == 'nt':  # Windows
@@ -33,8 +44,61 @@ if os.name == 'nt':  # Windows
         sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer)
         sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer)
 
+# Acima desta quantidade de tickets alterados, as relações são lidas das tabelas completas
+# (páginas de 1000) em vez de duas requisições por ticket
+LIMITE_RELACOES_POR_TICKET = 100
+
+# Intervalo entre as conferências completas dos IDs, que detectam exclusões mesmo quando a
+# contagem de tickets na API coincide com a do armazém
+INTERVALO_RECONCILIACAO = timedelta(hours=24)
+
+class PrazoExcedido(TimeoutError):
+    """Prazo da extração (etapa do pipeline em processo) esgotado"""
+
+class EscritorCSVIncremental:
+    def __init__(self, nome_arquivo, descricao="dados"):
+        """Abre um CSV para escrita linha a linha em um arquivo temporário"""
+        self.nome_arquivo = nome_arquivo
+        self.descricao = descricao
+        self.arquivo_parcial = f"{nome_arquivo}.parcial"
+        self.total = 0
+        self.writer = None
+        
+        # Criar diretório se não existir
+        os.makedirs(os.path.dirname(nome_arquivo), exist_ok=True)
+        self.csvfile = open(self.arquivo_parcial, 'w', newline='', encoding='utf-8')
+    
+    def escrever(self, linha):
+        """Grava uma linha; o cabeçalho vem das chaves da primeira linha"""
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.csvfile, fieldnames=linha.keys())
+            self.writer.writeheader()
+        self.writer.writerow(linha)
+        self.total += 1
+    
+    def fechar(self, sucesso=True):
+        """Fecha o arquivo e o publica no destino final (ou o descarta em caso de falha)"""
+        try:
+            self.csvfile.close()
+            if not sucesso:
+                os.remove(self.arquivo_parcial)
+                return False
+            
+            os.replace(self.arquivo_parcial, self.nome_arquivo)
+            print(f"[OK] Arquivo {self.descricao} salvo com sucesso! ({self.total:,} tickets)")
+            return True
+            
+        except Exception as e:
+            print(f"[ERRO] Erro ao salvar {self.descricao}: {e}")
+            return False
+
 class GLPITodosTicketsExtractor:
-    def __init__(self, api_url, app_token, user_token):
+    def __init__(self, api_url, app_token, user_token, modo_incremental=False, pasta_estado='../dados/estado',
+                 workers_paralelos=1, limite_conexoes_host=None, janelas_extras=None,
+                 formato_datas=datas_glpi.FORMATO_CSV_PADRAO, cache_persistente=True, ttl_dimensoes=None,
+                 timeout_dimensoes=30, renovar_caches=False, resolucao_usuarios='completa',
+                 capacidade_cache_usuarios=10000, saida_parquet=None, arquivo_armazem='../dados/tickets.sqlite',
+                 salvar_snapshots=True, retencao_snapshots=3, timeout_requisicoes=120):
         """Inicializa o extrator para buscar TODOS os tickets do GLPI"""
         self.api_url = api_url.rstrip('/')
         self.app_token = app_token
@@ -42,13 +106,102 @@ class GLPITodosTicketsExtractor:
         self.session_token = None
         self.session = requests.Session()
         
+        # Sessão mantida entre extrações (modo residente): o token é reutilizado enquanto a API o aceitar
+        self.manter_sessao = False
+        
+        # Modo incremental: busca apenas tickets modificados desde a última marca (date_mod) e aplica o
+        # delta sobre o armazém de tickets, que guarda os campos da API e as relações de cada ticket
+        self.modo_incremental = modo_incremental
+        self.arquivo_marca = os.path.join(pasta_estado, 'marca_incremental.json')
+        
+        # Resultado da última coleta incremental: None após uma listagem completa; senão, o delta
+        # (tickets alterados, IDs excluídos e se basta gravá-lo no armazém)
+        self.delta_incremental = None
+        
+        # Marca d'água da coleta incremental, salva apenas depois que as saídas forem gravadas
+        self.marca_pendente = None
+        
+        # Janelas extras de saída além do completo e dos últimos 6 meses: {nome: dias}
+        self.janelas_extras = dict(janelas_extras or {})
+        
+        # Formato das datas no CSV: 'br' (dd/mm/aaaa) ou 'iso' (aaaa-mm-dd)
+        if formato_datas not in datas_glpi.FORMATOS_CSV:
+            raise ValueError(f"Formato de datas inválido: {formato_datas} (use {' ou '.join(datas_glpi.FORMATOS_CSV)})")
+        self.formato_datas = formato_datas
+        
+        # Cópia tipada (Parquet) de cada CSV; por padrão, ativada quando o pyarrow está instalado
+        if saida_parquet is None:
+            saida_parquet = pyarrow_disponivel()
+        elif saida_parquet and not pyarrow_disponivel():
+            print("[AVISO] Saída Parquet requer o pacote pyarrow (pip install pyarrow); gerando apenas CSV")
+            saida_parquet = False
+        self.saida_parquet = saida_parquet
+        
+        # Armazém local (SQLite) com upsert por ID: fonte das visões completa e dos últimos 6 meses.
+        # Os arquivos CSV/Parquet com timestamp passam a ser exportações opcionais, das quais apenas
+        # as retencao_snapshots mais recentes de cada tipo são mantidas (None = todas)
+        self.armazem = None
+        if arquivo_armazem:
+            try:
+                self.armazem = ArmazemTickets(arquivo_armazem)
+            except Exception as e:
+                print(f"[AVISO] Armazém de tickets indisponível: {e}")
+        self.salvar_snapshots = salvar_snapshots or self.armazem is None
+        self.retencao_snapshots = retencao_snapshots
+        
+        # Linhas dos últimos 6 meses entregues em memória a quem executa o extrator no mesmo processo
+        # (ex.: o analisador de métricas no pipeline em processo): {coluna: [valores]}, ativado por coletar_em_memoria
+        self.colunas_em_memoria = None
+        self.tickets_em_memoria = None
+        
+        # Busca paralela de páginas de /Ticket (1 worker = modo sequencial)
+        self.workers_paralelos = max(1, int(workers_paralelos or 1))
+        self.limite_conexoes_host = limite_conexoes_host or self.workers_paralelos
+        if self.workers_paralelos > 1:
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.limite_conexoes_host, pool_block=True)
+            self.session.mount('http://', adaptador)
+            self.session.mount('https://', adaptador)
+        
         # Cache para otimização
         self.cache_usuarios = {}
+        
+        # Resolução de usuários: 'completa' carrega a tabela /User inteira; 'sob_demanda' busca apenas
+        # os usuários presentes nos relacionamentos, em lotes, mantendo-os em um LRU limitado
+        if resolucao_usuarios not in ('completa', 'sob_demanda'):
+            raise ValueError(f"Resolução de usuários inválida: {resolucao_usuarios} (use completa ou sob_demanda)")
+        self.resolucao_usuarios = resolucao_usuarios
+        if resolucao_usuarios == 'sob_demanda':
+            self.cache_usuarios = CacheLRU(capacidade_cache_usuarios)
         self.cache_entidades = {}
         self.cache_categorias = {}
         self.cache_localizacoes = {}
         self.cache_grupos = {}
         
+        # Cópia em disco das dimensões: renovada por date_mod quando o TTL expira, usada como
+        # reserva se a API estiver lenta (timeout_dimensoes, em segundos) ou indisponível
+        self.cache_dimensoes = None
+        self.dimensoes_em_memoria = set()
+        self.timeout_dimensoes = timeout_dimensoes
+        
+        # Indica se a extração atual recebeu itens de dimensões da API (nomes possivelmente alterados,
+        # que exigem reformatar todos os tickets em vez de apenas o delta)
+        self.dimensoes_alteradas = False
+        
+        # Tempo máximo de espera por resposta da API em cada requisição (conexão e intervalo entre dados):
+        # no modo em processo o prazo da etapa só é verificado entre requisições, então uma conexão travada
+        # não pode segurar a execução
+        self.timeout_requisicoes = timeout_requisicoes
+        
+        # Instante (time.monotonic) limite da extração, definido pelo pipeline em processo: verificado entre
+        # páginas e lotes, interrompe a extração em vez de segurar a execução (e a trava) indefinidamente
+        self.prazo = None
+        self.renovar_caches = renovar_caches
+        if cache_persistente:
+            try:
+                self.cache_dimensoes = CacheDimensoes(os.path.join(pasta_estado, 'cache_dimensoes.sqlite'), ttl_dimensoes)
+            except Exception as e:
+                print(f"[AVISO] Cache persistente de dimensões indisponível: {e}")
+        
         # Headers padrão
         self.session.headers.update({
             'Content-Type': 'application/json',
@@ -67,7 +220,7 @@ class GLPITodosTicketsExtractor:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.get(url, headers=headers)
+            response = requests.get(url, headers=headers, timeout=self.timeout_requisicoes)
             
             if response.status_code == 200:
                 data = response.json()
@@ -84,68 +237,87 @@ class GLPITodosTicketsExtractor:
             print(f"[ERRO] Erro na conexão: {e}")
             return False
     
-    def processar_dados_tickets(self, tickets, relacionamentos, descricao="tickets"):
-        """Processa e formata dados dos tickets"""
-        print(f"🧹 Processando e formatando {descricao}...")
-        dados_formatados = []
-        
-        for i, ticket in enumerate(tickets):
-            if (i + 1) % 500 == 0:
-                print(f"   [DADOS] Processados {i + 1:,} de {len(tickets):,} {descricao}...")
+    def formatar_ticket(self, ticket, relacionamentos):
+        """Formata um ticket em uma linha do CSV (None se o ticket não puder ser processado)"""
+        try:
+            ticket_id = str(ticket.get('id'))
             
-            try:
-                ticket_id = str(ticket.get('id'))
-                
-                # Buscar dados dos caches
-                entidade = self.cache_entidades.get(str(ticket.get('entities_id', '')), 'Sem Entidade')
-                categoria = self.cache_categorias.get(str(ticket.get('itilcategories_id', '')), 'Sem Categoria')
-                
-                # Buscar relacionamentos
-                rel = relacionamentos[ticket_id]
-                
-                # Montar linha de dados
-                linha = {
-                    'ID': ticket_id,
-                    'Título': self.limpar_campo_texto(ticket.get('name', '')),
-                    'Descrição': self.limpar_descricao(ticket.get('content', '')),
-                    'Status': self.traduzir_status(ticket.get('status', 1)),
-                    'Prioridade': ticket.get('priority', ''),
-                    'Urgência': ticket.get('urgency', ''),
-                    'Impacto': ticket.get('impact', ''),
-                    'Categoria': categoria,
-                    'Entidade': entidade,
-                    'Requerente': rel['requerente'],
-                    'Técnico': rel['tecnico'],
-                    'Grupo': rel['grupo'],
-                    'Data Criação': self.formatar_data(ticket.get('date')),
-                    'Data Modificação': self.formatar_data(ticket.get('date_mod')),
-                    'Data Solução': self.formatar_data(ticket.get('solvedate')),
-                    'Data Fechamento': self.formatar_data(ticket.get('closedate')),
-                    'Tempo Solução (min)': ticket.get('solve_delay_stat', ''),
-                    'Tempo Fechamento (min)': ticket.get('close_delay_stat', ''),
-                    'Satisfação': ticket.get('satisfaction', ''),
-                    'Tipo': ticket.get('type', ''),
-                    'Localização': ticket.get('locations_id', ''),
-                    'Validação': ticket.get('global_validation', '')
-                }
-                
-                dados_formatados.append(linha)
-                
-            except Exception as e:
-                print(f"   [AVISO] Erro ao processar ticket {ticket.get('id', 'N/A')}: {e}")
-                continue
+            # Buscar dados dos caches
+            entidade = self.cache_entidades.get(str(ticket.get('entities_id', '')), 'Sem Entidade')
+            categoria = self.cache_categorias.get(str(ticket.get('itilcategories_id', '')), 'Sem Categoria')
+            
+            # Buscar relacionamentos (todos os vínculos de cada papel, resolvidos para nomes aqui)
+            requerentes = relacionamentos.ids('requerente', ticket_id)
+            tecnicos = relacionamentos.ids('tecnico', ticket_id)
+            grupos = relacionamentos.ids('grupo', ticket_id)
+            
+            # Montar linha de dados
+            return {
+                'ID': ticket_id,
+                'Título': self.limpar_campo_texto(ticket.get('name', '')),
+                'Descrição': self.limpar_descricao(ticket.get('content', '')),
+                'Status': self.traduzir_status(ticket.get('status', 1)),
+                'Prioridade': ticket.get('priority', ''),
+                'Urgência': ticket.get('urgency', ''),
+                'Impacto': ticket.get('impact', ''),
+                'Categoria': categoria,
+                'Entidade': entidade,
+                'Requerente': self.nomes_usuarios(requerentes, 'Sem Requerente'),
+                'Técnico': self.nomes_usuarios(tecnicos, 'Não Atribuído'),
+                'Grupo': self.nomes_grupos(grupos),
+                'Data Criação': self.formatar_data(ticket.get('date')),
+                'Data Modificação': self.formatar_data(ticket.get('date_mod')),
+                'Data Solução': self.formatar_data(ticket.get('solvedate')),
+                'Data Fechamento': self.formatar_data(ticket.get('closedate')),
+                'Tempo Solução (min)': ticket.get('solve_delay_stat', ''),
+                'Tempo Fechamento (min)': ticket.get('close_delay_stat', ''),
+                'Satisfação': ticket.get('satisfaction', ''),
+                'Tipo': ticket.get('type', ''),
+                'Localização': ticket.get('locations_id', ''),
+                'Validação': ticket.get('global_validation', '')
+            }
+            
+        except Exception as e:
+            print(f"   [AVISO] Erro ao processar ticket {ticket.get('id', 'N/A')}: {e}")
+            return None
+    
+    def sessao_valida(self):
+        """Indica se o token de sessão atual ainda é aceito pela API (sessões expiram por inatividade)"""
+        if not self.session_token:
+            return False
         
-        return dados_formatados
+        try:
+            response = self.session.get(f"{self.api_url}/getFullSession", timeout=self.timeout_requisicoes)
+        except requests.RequestException as e:
+            print(f"[AVISO] Não foi possível verificar a sessão: {e}")
+            return False
+        
+        if response.status_code == 200:
+            return True
+        
+        print(f"[AVISO] Sessão expirada ou inválida ({response.status_code}); iniciando nova sessão")
+        self.session_token = None
+        self.session.headers.pop('Session-Token', None)
+        return False
     
     def kill_session(self):
         """Encerra sessão na API do GLPI"""
         if self.session_token:
             try:
                 url = f"{self.api_url}/killSession"
-                response = self.session.get(url)
+                response = self.session.get(url, timeout=self.timeout_requisicoes)
                 print("[EMOJI] Sessão encerrada")
             except:
                 pass
+            self.session_token = None
+            self.session.headers.pop('Session-Token', None)
+    
+    def fechar(self):
+        """Encerra a sessão e fecha os bancos locais; a instância não deve ser usada depois"""
+        self.kill_session()
+        for banco in (self.armazem, self.cache_dimensoes):
+            if banco is not None:
+                banco.fechar()
     
     def limpar_campo_texto(self, texto):
         """Limpa campos de texto para CSV"""
@@ -153,12 +325,7 @@ class GLPITodosTicketsExtractor:
             return ""
         
         try:
-            texto = str(texto)
-            texto = texto.replace('\r', '').replace('\n', ' ').replace('\t', ' ')
-            texto = texto.replace('"', '""')
-            texto = re.sub(r'\s+', ' ', texto)
-            texto = re.sub(r'[\u200b-\u200f\u2028-\u202f\u205f-\u206f]', '', texto)
-            return texto.strip()
+            return normalizacao_texto.limpar_campo_texto(texto)
         except Exception as e:
             print(f"[AVISO] Erro ao limpar campo de texto: {e}")
             return ""
@@ -169,34 +336,14 @@ class GLPITodosTicketsExtractor:
             return ""
         
         try:
-            descricao = html.unescape(str(descricao_raw))
-            descricao = re.sub(r'<[^>]+>', '', descricao)
-            descricao = re.sub(r'\s+', ' ', descricao)
-            descricao = descricao.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
-            descricao = re.sub(r'[\u200b-\u200f\u2028-\u202f\u205f-\u206f]', '', descricao)
-            
-            if len(descricao) > 500:
-                descricao = descricao[:497] + "..."
-            
-            return descricao.strip()
+            return normalizacao_texto.limpar_descricao(descricao_raw)
         except Exception as e:
             print(f"[AVISO] Erro ao limpar descrição: {e}")
             return ""
     
     def formatar_data(self, data_str):
-        """Formata data para o padrão brasileiro"""
-        if not data_str or data_str == 'NULL':
-            return ""
-        
-        try:
-            if ' ' in data_str:
-                data_obj = datetime.strptime(data_str, '%Y-%m-%d %H:%M:%S')
-                return data_obj.strftime('%d/%m/%Y %H:%M:%S')
-            else:
-                data_obj = datetime.strptime(data_str, '%Y-%m-%d')
-                return data_obj.strftime('%d/%m/%Y')
-        except:
-            return str(data_str)
+        """Formata data da API no formato de datas configurado para o CSV"""
+        return datas_glpi.formatar_data_glpi(data_str, self.formato_datas)
     
     def traduzir_status(self, status_id):
         """Traduz ID do status para texto"""
@@ -210,56 +357,227 @@ class GLPITodosTicketsExtractor:
         }
         return status_map.get(int(status_id), f'Status {status_id}')
     
+    def registrar_usuarios(self, users):
+        """Registra uma lista de usuários da API no cache de nomes e retorna os itens (id, nome, date_mod)"""
+        registrados = []
+        for user in users:
+            user_id = str(user.get('id'))
+            firstname = user.get('firstname', '')
+            realname = user.get('realname', '')
+            nome_completo = f"{firstname} {realname}".strip()
+            self.cache_usuarios[user_id] = nome_completo if nome_completo else f"Usuário {user_id}"
+            registrados.append((user_id, self.cache_usuarios[user_id], user.get('date_mod')))
+        return registrados
+    
+    def registrar_dimensao(self, cache, itens, nome_padrao):
+        """Registra itens de uma dimensão (entidade, categoria, grupo) no cache id -> nome e retorna (id, nome, date_mod)"""
+        registrados = []
+        for item in itens:
+            item_id = str(item.get('id'))
+            cache[item_id] = item.get('name', nome_padrao)
+            registrados.append((item_id, cache[item_id], item.get('date_mod')))
+        return registrados
+    
+    # Dimensões em cache: nome -> (endpoint, atributo do cache, nome padrão, descrição, sufixo)
+    DIMENSOES = {
+        'usuarios': ('User', 'cache_usuarios', None, 'usuários', 'carregados'),
+        'entidades': ('Entity', 'cache_entidades', 'Sem Entidade', 'entidades', 'carregadas'),
+        'categorias': ('ITILCategory', 'cache_categorias', 'Sem Categoria', 'categorias', 'carregadas'),
+        'grupos': ('Group', 'cache_grupos', 'Sem Grupo', 'grupos', 'carregados'),
+    }
+    
+    def registrar_itens_dimensao(self, dimensao, itens):
+        """Registra itens da API no cache em memória da dimensão"""
+        _, atributo, nome_padrao, _, _ = self.DIMENSOES[dimensao]
+        if dimensao == 'usuarios':
+            return self.registrar_usuarios(itens)
+        return self.registrar_dimensao(getattr(self, atributo), itens, nome_padrao)
+    
+    def carregar_dimensao_local(self, dimensao):
+        """Carrega a cópia em disco da dimensão; retorna (ainda válida, marca date_mod para renovação incremental)"""
+        if self.cache_dimensoes is None:
+            return False, None
+        
+        # A cópia em disco é lida uma vez por processo; depois, o cache em memória já está sincronizado com ela
+        cache = getattr(self, self.DIMENSOES[dimensao][1])
+        if dimensao not in self.dimensoes_em_memoria:
+            cache.update(self.cache_dimensoes.carregar(dimensao))
+            self.dimensoes_em_memoria.add(dimensao)
+        if not cache or self.renovar_caches:
+            return False, None
+        
+        return not self.cache_dimensoes.expirado(dimensao), self.cache_dimensoes.marca_date_mod(dimensao)
+    
+    def incorporar_itens_dimensao(self, dimensao, itens, marca):
+        """Registra os itens buscados na API (todos, se marca for None) e atualiza a cópia em disco"""
+        _, atributo, _, descricao, sufixo = self.DIMENSOES[dimensao]
+        cache = getattr(self, atributo)
+        
+        if marca is None:
+            cache.clear()
+        registrados = self.registrar_itens_dimensao(dimensao, itens)
+        if registrados:
+            self.dimensoes_alteradas = True
+        
+        if self.cache_dimensoes is not None:
+            self.cache_dimensoes.salvar(dimensao, registrados, completo=marca is None)
+        
+        if marca is None:
+            print(f"   [OK] {len(cache)} {descricao} {sufixo}")
+        else:
+            print(f"   [OK] {len(cache)} {descricao} em cache ({len(registrados)} alterações desde {marca})")
+    
+    def usar_copia_local_dimensao(self, dimensao, erro):
+        """Mantém a cópia em disco desatualizada quando a renovação falha (relança o erro se não houver cópia)"""
+        _, atributo, _, descricao, _ = self.DIMENSOES[dimensao]
+        cache = getattr(self, atributo)
+        if not cache or self.cache_dimensoes is None:
+            raise erro
+        
+        idade = self.cache_dimensoes.idade_minutos(dimensao)
+        print(f"   [AVISO] Falha ao renovar {descricao} ({erro or type(erro).__name__}); usando cópia local de {idade:.0f} min atrás "
+              f"({len(cache)} {descricao})")
+    
+    def carregar_dimensao(self, dimensao):
+        """Carrega uma dimensão do cache em disco, renovando-a pela API (apenas o alterado) quando o TTL expira"""
+        endpoint, atributo, _, descricao, _ = self.DIMENSOES[dimensao]
+        valida, marca = self.carregar_dimensao_local(dimensao)
+        cache = getattr(self, atributo)
+        
+        if valida:
+            print(f"   [OK] {len(cache)} {descricao} do cache local "
+                  f"({self.cache_dimensoes.idade_minutos(dimensao):.0f} min)")
+            return
+        
+        try:
+            # Com cópia local disponível, uma API lenta não segura a extração
+            timeout = self.timeout_dimensoes if cache else None
+            itens = self.buscar_itens_dimensao(endpoint, marca, timeout)
+        except Exception as e:
+            self.usar_copia_local_dimensao(dimensao, e)
+            return
+        
+        self.incorporar_itens_dimensao(dimensao, itens, marca)
+    
+    def buscar_itens_dimensao(self, endpoint, marca=None, timeout=None):
+        """Busca os itens de uma dimensão: todos ou, com marca, apenas os de date_mod >= marca"""
+        params = {'sort': 'date_mod', 'order': 'DESC'} if marca else None
+        inicio = time.monotonic()
+        itens = []
+        
+        for item in self.iterar_itens_paginados(endpoint, params, timeout=timeout):
+            # Ordenado por date_mod decrescente: o primeiro item anterior à marca encerra a busca
+            if marca and (item.get('date_mod') or '') < marca:
+                break
+            itens.append(item)
+            
+            if timeout and time.monotonic() - inicio > timeout:
+                raise TimeoutError(f"{endpoint} excedeu {timeout}s")
+        
+        return itens
+    
     def carregar_cache_usuarios(self):
         """Carrega todos os usuários em cache"""
         print("[GRUPO] Carregando cache de usuários...")
         try:
-            range_start = 0
-            range_limit = 1000
-            
-            while True:
-                url = f"{self.api_url}/User"
-                params = {'range': f'{range_start}-{range_start + range_limit - 1}'}
-                response = self.session.get(url, params=params)
-                
-                if response.status_code in [200, 206]:
-                    users = response.json()
-                    if not users:
-                        break
-                    
-                    for user in users:
-                        user_id = str(user.get('id'))
-                        firstname = user.get('firstname', '')
-                        realname = user.get('realname', '')
-                        nome_completo = f"{firstname} {realname}".strip()
-                        self.cache_usuarios[user_id] = nome_completo if nome_completo else f"Usuário {user_id}"
-                    
-                    if len(users) < range_limit:
-                        break
-                    
-                    range_start += range_limit
-                else:
-                    break
-            
-            print(f"   [OK] {len(self.cache_usuarios)} usuários carregados")
+            if self.resolucao_usuarios == 'sob_demanda':
+                self.renovar_usuarios_persistidos()
+            else:
+                self.carregar_dimensao('usuarios')
         except Exception as e:
             print(f"   [AVISO] Erro ao carregar usuários: {e}")
     
+    def renovar_usuarios_persistidos(self):
+        """No modo sob demanda, apenas aplica à cópia em disco as alterações de usuários desde a última renovação"""
+        marca = self.cache_dimensoes.marca_date_mod('usuarios') if self.cache_dimensoes is not None else None
+        if marca is None or not self.cache_dimensoes.expirado('usuarios'):
+            print("   [OK] Usuários serão resolvidos sob demanda a partir dos relacionamentos")
+            return
+        
+        try:
+            itens = self.buscar_itens_dimensao('User', marca, self.timeout_dimensoes)
+        except Exception as e:
+            print(f"   [AVISO] Falha ao renovar usuários ({e or type(e).__name__}); usando cópia local")
+            return
+        
+        self.incorporar_itens_dimensao('usuarios', itens, marca)
+    
+    def concluir_relacionamentos(self, relacionamentos):
+        """Finaliza o índice de relacionamentos após a passagem e resolve os usuários citados"""
+        if relacionamentos is None:
+            return
+        
+        print(f"   [OK] Índice de relacionamentos: {len(relacionamentos):,} tickets, "
+              f"{relacionamentos.tamanho_bytes() / 1024:,.0f} KB")
+        self.resolver_usuarios_referenciados(relacionamentos)
+    
+    def resolver_usuarios_referenciados(self, relacionamentos):
+        """No modo sob demanda, resolve de uma vez os usuários distintos citados nos relacionamentos"""
+        if self.resolucao_usuarios != 'sob_demanda' or not relacionamentos:
+            return
+        
+        ids = relacionamentos.ids_distintos('requerente') | relacionamentos.ids_distintos('tecnico')
+        self.resolver_usuarios({str(user_id) for user_id in ids})
+    
+    def resolver_usuarios(self, ids):
+        """Garante no LRU os nomes dos usuários: cópia em disco primeiro, API (em lotes) para os demais"""
+        faltantes = [user_id for user_id in ids if user_id not in self.cache_usuarios]
+        
+        if self.cache_dimensoes is not None and not self.renovar_caches:
+            persistidos = self.cache_dimensoes.obter('usuarios', faltantes)
+            self.cache_usuarios.update(persistidos)
+            faltantes = [user_id for user_id in faltantes if user_id not in persistidos]
+        
+        print(f"   [OK] {len(ids):,} usuários referenciados ({len(ids) - len(faltantes):,} em cache, "
+              f"{len(faltantes):,} buscados na API)")
+        if len(ids) > self.cache_usuarios.capacidade and self.cache_dimensoes is None:
+            # Sem cópia em disco, nomes descartados do LRU não podem ser recuperados
+            print(f"   [AVISO] Mais usuários que a capacidade do cache ({self.cache_usuarios.capacidade:,}); "
+                  "aumente CAPACIDADE_CACHE_USUARIOS")
+        
+        if not faltantes:
+            return
+        
+        try:
+            usuarios = self.buscar_itens_por_ids('User', faltantes)
+        except Exception as e:
+            print(f"   [AVISO] Erro ao buscar usuários por ID: {e}")
+            return
+        
+        registrados = self.registrar_usuarios(usuarios)
+        if self.cache_dimensoes is not None:
+            self.cache_dimensoes.adicionar('usuarios', registrados)
+    
+    def nomes_usuarios(self, user_ids, padrao):
+        """Nomes dos usuários de um papel para a saída (padrão se não houver nenhum)"""
+        if not user_ids:
+            return padrao
+        return SEPARADOR_MULTIPLOS.join(self.nome_usuario(user_id) for user_id in user_ids)
+    
+    def nome_usuario(self, user_id):
+        """Nome de um usuário para a saída"""
+        user_id = str(user_id)
+        nome = self.cache_usuarios.get(user_id)
+        if nome is None and self.resolucao_usuarios == 'sob_demanda' and self.cache_dimensoes is not None:
+            # Descartado do LRU: recupera da cópia em disco
+            nome = self.cache_dimensoes.obter('usuarios', [user_id]).get(user_id)
+            if nome is not None:
+                self.cache_usuarios[user_id] = nome
+        
+        return nome if nome is not None else f"Usuário {user_id}"
+    
+    def nomes_grupos(self, group_ids):
+        """Nomes dos grupos técnicos do ticket para a saída"""
+        if not group_ids:
+            return 'Sem Grupo'
+        return SEPARADOR_MULTIPLOS.join(self.cache_grupos.get(str(group_id), f"Grupo {group_id}")
+                                        for group_id in group_ids)
+    
     def carregar_cache_entidades(self):
         """Carrega todas as entidades em cache"""
         print("[EMPRESA] Carregando cache de entidades...")
         try:
-            url = f"{self.api_url}/Entity"
-            params = {'range': '0-1000'}
-            response = self.session.get(url, params=params)
-            
-            if response.status_code in [200, 206]:
-                entities = response.json()
-                for entity in entities:
-                    entity_id = str(entity.get('id'))
-                    self.cache_entidades[entity_id] = entity.get('name', 'Sem Entidade')
-                
-                print(f"   [OK] {len(self.cache_entidades)} entidades carregadas")
+            self.carregar_dimensao('entidades')
         except Exception as e:
             print(f"   [AVISO] Erro ao carregar entidades: {e}")
     
@@ -267,17 +585,7 @@ class GLPITodosTicketsExtractor:
         """Carrega todas as categorias em cache"""
         print("[EMOJI] Carregando cache de categorias...")
         try:
-            url = f"{self.api_url}/ITILCategory"
-            params = {'range': '0-1000'}
-            response = self.session.get(url, params=params)
-            
-            if response.status_code in [200, 206]:
-                categories = response.json()
-                for category in categories:
-                    category_id = str(category.get('id'))
-                    self.cache_categorias[category_id] = category.get('name', 'Sem Categoria')
-                
-                print(f"   [OK] {len(self.cache_categorias)} categorias carregadas")
+            self.carregar_dimensao('categorias')
         except Exception as e:
             print(f"   [AVISO] Erro ao carregar categorias: {e}")
     
@@ -285,17 +593,7 @@ class GLPITodosTicketsExtractor:
         """Carrega todos os grupos em cache"""
         print("[EMOJI]‍[EMOJI]‍[EMOJI]‍[EMOJI] Carregando cache de grupos...")
         try:
-            url = f"{self.api_url}/Group"
-            params = {'range': '0-1000'}
-            response = self.session.get(url, params=params)
-            
-            if response.status_code in [200, 206]:
-                groups = response.json()
-                for group in groups:
-                    group_id = str(group.get('id'))
-                    self.cache_grupos[group_id] = group.get('name', 'Sem Grupo')
-                
-                print(f"   [OK] {len(self.cache_grupos)} grupos carregados")
+            self.carregar_dimensao('grupos')
         except Exception as e:
             print(f"   [AVISO] Erro ao carregar grupos: {e}")
     
@@ -309,184 +607,719 @@ class GLPITodosTicketsExtractor:
         print("[OK] Todos os caches carregados!")
     
     def buscar_todos_tickets(self):
-        """Busca TODOS os tickets sem filtro de data"""
+        """Busca TODOS os tickets sem filtro de data (em paralelo quando configurado)"""
+        if self.workers_paralelos > 1:
+            try:
+                return self.buscar_todos_tickets_paralelo()
+            except PrazoExcedido:
+                raise
+            except Exception as e:
+                print(f"[AVISO] Falha na busca paralela, usando modo sequencial: {e}")
+        
+        return self.buscar_todos_tickets_sequencial()
+    
+    def buscar_pagina_tickets(self, range_start, range_limit):
+        """Busca uma página de tickets e retorna (tickets, total informado no Content-Range)"""
+        url = f"{self.api_url}/Ticket"
+        params = {
+            'range': f'{range_start}-{range_start + range_limit - 1}',
+            'expand_dropdowns': 'false',
+            'get_hateoas': 'false'
+        }
+        
+        response = self.session.get(url, params=params, timeout=self.timeout_requisicoes)
+        
+        if response.status_code not in [200, 206]:
+            raise RuntimeError(f"Erro ao buscar tickets {params['range']}: {response.status_code} - {response.text}")
+        
+        # Content-Range: "0-999/12345"
+        total = None
+        content_range = response.headers.get('Content-Range', '')
+        if '/' in content_range:
+            try:
+                total = int(content_range.rsplit('/', 1)[1])
+            except ValueError:
+                total = None
+        
+        return response.json(), total
+    
+    def buscar_todos_tickets_paralelo(self):
+        """Busca TODOS os tickets disparando as páginas restantes em paralelo"""
+        print(f"[TICKET] Buscando TODOS os tickets em paralelo ({self.workers_paralelos} workers, "
+              f"{self.limite_conexoes_host} conexões por host)...")
+        range_limit = 1000
+        
+        # A primeira página revela o total de tickets via Content-Range
+        primeira_pagina, total = self.buscar_pagina_tickets(0, range_limit)
+        if total is None:
+            raise RuntimeError("Cabeçalho Content-Range ausente na resposta de /Ticket")
+        
+        inicios = list(range(range_limit, total, range_limit))
+        print(f"   [EMOJI] Total informado pela API: {total:,} tickets ({len(inicios) + 1} páginas)")
+        
+        todos_tickets = list(primeira_pagina)
+        with ThreadPoolExecutor(max_workers=self.workers_paralelos) as executor:
+            # executor.map preserva a ordem das páginas
+            for tickets, _ in executor.map(lambda inicio: self.buscar_pagina_tickets(inicio, range_limit), inicios):
+                self.verificar_prazo()
+                todos_tickets.extend(tickets)
+        
+        return todos_tickets
+    
+    def iterar_todos_tickets(self):
+        """Itera ticket a ticket sobre TODOS os tickets, decodificando as páginas em streaming"""
+        params = {
+            'expand_dropdowns': 'false',
+            'get_hateoas': 'false'
+        }
+        
+        for i, ticket in enumerate(self.iterar_itens_paginados('Ticket', params)):
+            if i % 1000 == 0:
+                print(f"   [EMOJI] Recebendo tickets {i} a {i + 999}...")
+            yield ticket
+    
+    def buscar_todos_tickets_sequencial(self):
+        """Busca TODOS os tickets página a página (uma página com erro interrompe a busca com exceção:
+        uma lista parcial seria tomada como completa)"""
         print("[TICKET] Buscando TODOS os tickets (sem filtro de data)...")
+        return list(self.iterar_todos_tickets())
+    
+    def carregar_marca_incremental(self):
+        """Carrega a marca d'água (maior date_mod e último ID) da última execução"""
+        if not os.path.exists(self.arquivo_marca):
+            return None
         
-        todos_tickets = []
+        try:
+            with open(self.arquivo_marca, 'r', encoding='utf-8') as f:
+                marca = json.load(f)
+            if not marca.get('date_mod'):
+                return None
+            return marca
+        except (OSError, ValueError) as e:
+            print(f"   [AVISO] Marca incremental inválida, será feita extração completa: {e}")
+            return None
+    
+    def salvar_marca_incremental(self, tickets, reconciliado_em=None):
+        """Salva a marca d'água com o maior date_mod e o ID do último ticket modificado"""
+        marca = None
+        for ticket in tickets:
+            date_mod = ticket.get('date_mod')
+            if not date_mod:
+                continue
+            chave = (date_mod, int(ticket.get('id', 0)))
+            if marca is None or chave > marca:
+                marca = chave
+        
+        if marca is None:
+            return
+        
+        dados_marca = {
+            'date_mod': marca[0],
+            'ultimo_id': marca[1],
+            'atualizado_em': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'reconciliado_em': reconciliado_em
+        }
+        self._salvar_json_atomico(self.arquivo_marca, dados_marca)
+        print(f"   [OK] Marca incremental salva: date_mod={marca[0]} (ticket {marca[1]})")
+    
+    def _salvar_json_atomico(self, nome_arquivo, dados):
+        """Grava JSON em arquivo temporário e substitui o destino atomicamente"""
+        os.makedirs(os.path.dirname(nome_arquivo), exist_ok=True)
+        arquivo_tmp = f"{nome_arquivo}.tmp"
+        with open(arquivo_tmp, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False)
+        os.replace(arquivo_tmp, nome_arquivo)
+    
+    def buscar_ids_modificados_desde(self, date_mod):
+        """Busca os IDs dos tickets com date_mod >= marca usando os critérios de busca do GLPI"""
+        # 'morethan' é estrito; recuar 1s garante que modificações no mesmo segundo da marca não se percam
+        limite = datetime.strptime(date_mod, datas_glpi.FORMATO_API) - timedelta(seconds=1)
+        criterios = {
+            'criteria[0][field]': 19,  # date_mod
+            'criteria[0][searchtype]': 'morethan',
+            'criteria[0][value]': limite.strftime(datas_glpi.FORMATO_API),
+        }
+        return self.buscar_ids_tickets(criterios)
+    
+    def buscar_ids_tickets(self, criterios=None, range_limit=1000):
+        """Busca os IDs dos tickets (apenas a coluna id) que atendem aos critérios de busca do GLPI (todos, sem critérios)"""
+        ids = []
         range_start = 0
-        range_limit = 1000
         
         while True:
-            print(f"   [EMOJI] Buscando tickets {range_start} a {range_start + range_limit - 1}...")
+            self.verificar_prazo()
+            params = dict(criterios or {})
+            params['forcedisplay[0]'] = 2  # id
+            params['range'] = f'{range_start}-{range_start + range_limit - 1}'
+            resultado = self.buscar_pesquisa_tickets(params)
             
-            url = f"{self.api_url}/Ticket"
-            params = {
-                'range': f'{range_start}-{range_start + range_limit - 1}',
-                'expand_dropdowns': 'false',
-                'get_hateoas': 'false'
-            }
-            
-            response = self.session.get(url, params=params)
+            linhas = resultado.get('data') or []
+            ids.extend(int(linha['2']) for linha in linhas if linha.get('2') is not None)
             
-            if response.status_code in [200, 206]:
-                tickets = response.json()
-                if not tickets:
-                    break
-                
-                # Adicionar TODOS os tickets sem filtro
-                todos_tickets.extend(tickets)
-                
-                if len(tickets) < range_limit:
-                    break
-                
-                range_start += range_limit
-            else:
-                print(f"[ERRO] Erro ao buscar tickets: {response.status_code}")
-                print(f"Resposta: {response.text}")
+            range_start += range_limit
+            if not linhas or range_start >= int(resultado.get('totalcount', 0)):
                 break
         
-        return todos_tickets
+        return ids
+    
+    def contar_tickets_api(self):
+        """Quantidade de tickets na API (uma requisição com uma única linha)"""
+        resultado = self.buscar_pesquisa_tickets({'forcedisplay[0]': 2, 'range': '0-0'})
+        return int(resultado.get('totalcount', 0))
     
-    def buscar_relacionamentos_tickets(self, ticket_ids):
-        """Busca relacionamentos de usuários e grupos para os tickets"""
+    def buscar_pesquisa_tickets(self, params):
+        """Executa uma requisição de search/Ticket e retorna o JSON da resposta"""
+        response = self.session.get(f"{self.api_url}/search/Ticket", params=params, timeout=self.timeout_requisicoes)
+        
+        if response.status_code not in [200, 206]:
+            raise RuntimeError(f"Erro na busca de tickets: {response.status_code} - {response.text}")
+        
+        return response.json()
+    
+    def buscar_tickets_por_ids(self, ids, tamanho_lote=100):
+        """Busca tickets completos em lotes via getMultipleItems"""
+        return self.buscar_itens_por_ids('Ticket', ids, tamanho_lote)
+    
+    def buscar_itens_por_ids(self, itemtype, ids, tamanho_lote=100):
+        """Busca itens de um tipo em lotes via getMultipleItems"""
+        itens = []
+        ids = list(ids)
+        
+        for inicio in range(0, len(ids), tamanho_lote):
+            self.verificar_prazo()
+            lote = ids[inicio:inicio + tamanho_lote]
+            params = {'expand_dropdowns': 'false', 'get_hateoas': 'false'}
+            for i, item_id in enumerate(lote):
+                params[f'items[{i}][itemtype]'] = itemtype
+                params[f'items[{i}][items_id]'] = item_id
+            
+            response = self.session.get(f"{self.api_url}/getMultipleItems", params=params, timeout=self.timeout_requisicoes)
+            
+            if response.status_code not in [200, 206]:
+                raise RuntimeError(f"Erro ao buscar lote de {itemtype}: {response.status_code} - {response.text}")
+            
+            # Itens inexistentes (ex.: excluídos definitivamente) não vêm como objetos
+            itens.extend(item for item in response.json() if isinstance(item, dict) and 'id' in item)
+        
+        return itens
+    
+    def buscar_tickets_incremental(self, marca):
+        """Busca os tickets modificados desde a marca; retorna (tickets alterados, IDs excluídos ou enviados à lixeira)"""
+        print(f"[TICKET] Buscando tickets modificados desde {marca['date_mod']} (último ticket: {marca.get('ultimo_id')})...")
+        ids = self.buscar_ids_modificados_desde(marca['date_mod'])
+        print(f"   [OK] {len(ids):,} tickets modificados encontrados")
+        tickets = self.buscar_tickets_por_ids(ids)
+        
+        # Como na listagem completa, tickets na lixeira ficam fora; os que sumiram foram excluídos definitivamente
+        recebidos = {int(ticket['id']) for ticket in tickets}
+        removidos = {int(ticket['id']) for ticket in tickets if ticket.get('is_deleted')}
+        removidos.update(set(ids) - recebidos)
+        return [ticket for ticket in tickets if int(ticket['id']) not in removidos], removidos
+    
+    def buscar_tickets_excluidos(self, ids_delta, removidos, marca):
+        """IDs do armazém (com o delta aplicado) que não existem mais na API: compara as contagens (uma
+        requisição) e, se a API tiver menos tickets ou a última conferência completa tiver vencido, confere os IDs"""
+        reconciliado_em = marca.get('reconciliado_em')
+        vencida = reconciliado_em is None or \
+            datetime.now() - datetime.strptime(reconciliado_em, '%Y-%m-%d %H:%M:%S') > INTERVALO_RECONCILIACAO
+        
+        if not vencida:
+            total_local = self.armazem.total() + len(ids_delta - self.armazem.existentes(ids_delta)) - \
+                len(self.armazem.existentes(removidos))
+            total_api = self.contar_tickets_api()
+            if total_api >= total_local:
+                return set(), reconciliado_em
+            print(f"   [EMOJI] API com {total_api:,} tickets e armazém com {total_local:,}: conferindo exclusões...")
+        else:
+            print("   [EMOJI] Conferência periódica dos IDs de tickets (exclusões)...")
+        
+        # Os IDs locais só são lidos quando a conferência é necessária
+        ids_locais = (self.armazem.ids() | ids_delta) - removidos
+        ids_api = set(self.buscar_ids_tickets())
+        return ids_locais - ids_api, datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    def buscar_relacionamentos_por_ids(self, ticket_ids):
+        """Busca as relações de usuários e grupos apenas dos tickets informados (sub-itens de cada ticket)"""
+        print(f"[EMOJI] Buscando relacionamentos de {len(ticket_ids):,} tickets alterados...")
+        relacionamentos = self.novo_mapa_relacionamentos()
+        
+        def buscar(ticket_id):
+            return (self.buscar_subitens_ticket(ticket_id, 'Ticket_User'),
+                    self.buscar_subitens_ticket(ticket_id, 'Group_Ticket'))
+        
+        with ThreadPoolExecutor(max_workers=self.workers_paralelos) as executor:
+            for relacoes_usuarios, relacoes_grupos in executor.map(buscar, sorted(ticket_ids)):
+                self.verificar_prazo()
+                self.registrar_relacoes_usuarios(relacionamentos, relacoes_usuarios, None)
+                self.registrar_relacoes_grupos(relacionamentos, relacoes_grupos, None)
+        
+        return relacionamentos
+    
+    def buscar_subitens_ticket(self, ticket_id, itemtype):
+        """Busca os sub-itens de um ticket (ex.: Ticket_User, Group_Ticket)"""
+        response = self.session.get(f"{self.api_url}/Ticket/{ticket_id}/{itemtype}", params={'range': '0-999'},
+                                    timeout=self.timeout_requisicoes)
+        
+        if response.status_code not in [200, 206]:
+            raise RuntimeError(f"Erro ao buscar {itemtype} do ticket {ticket_id}: {response.status_code} - {response.text}")
+        
+        return response.json()
+    
+    def coletar_dados_incrementais(self):
+        """Busca o delta desde a marca (tickets, relações e exclusões) e retorna o que deve ser gravado: o próprio
+        delta ou, quando todas as saídas precisam ser regravadas, os tickets do armazém com o delta aplicado"""
+        marca = self.carregar_marca_incremental()
+        self.delta_incremental = None
+        
+        if marca is None or not self.armazem.completo():
+            # A carga inicial só é gravada (e a marca salva) se a listagem completa terminar: falhas geram exceção
+            print("[TICKET] Modo incremental sem marca anterior (ou armazém sem os dados da API): "
+                  "realizando extração completa inicial...")
+            tickets = self.buscar_todos_tickets()
+            relacionamentos = self.buscar_relacionamentos_tickets({int(ticket['id']) for ticket in tickets},
+                                                                  estrito=True)
+            self.marca_pendente = (tickets, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            return tickets, relacionamentos
+        
+        tickets_delta, removidos = self.buscar_tickets_incremental(marca)
+        ids_delta = {int(ticket['id']) for ticket in tickets_delta}
+        excluidos, reconciliado_em = self.buscar_tickets_excluidos(ids_delta, removidos, marca)
+        removidos |= excluidos
+        
+        novos = len(ids_delta - self.armazem.existentes(ids_delta))
+        print(f"   [OK] Delta: {novos:,} novos, {len(ids_delta) - novos:,} atualizados, {len(removidos):,} excluídos")
+        
+        # As relações gravadas precisam estar completas: aqui, falhas na busca geram exceção
+        if len(ids_delta) > LIMITE_RELACOES_POR_TICKET:
+            relacionamentos_delta = self.buscar_relacionamentos_tickets(ids_delta, estrito=True)
+        else:
+            relacionamentos_delta = self.buscar_relacionamentos_por_ids(ids_delta)
+        
+        # Sem arquivos completos a regravar e sem nomes de dimensões alterados, basta gravar o delta no armazém
+        apenas_delta = not self.salvar_snapshots and self.colunas_em_memoria is None and not self.dimensoes_alteradas
+        self.delta_incremental = {'tickets': tickets_delta, 'removidos': removidos, 'apenas_delta': apenas_delta}
+        
+        # A marca nunca retrocede: com delta vazio, a marca anterior é mantida
+        self.marca_pendente = (tickets_delta + [{'id': marca.get('ultimo_id', 0), 'date_mod': marca['date_mod']}],
+                               reconciliado_em)
+        
+        if apenas_delta:
+            self.concluir_relacionamentos(relacionamentos_delta)
+            return tickets_delta, relacionamentos_delta
+        
+        # Regravação completa: relações gravadas dos demais tickets mais as do delta, e os tickets do armazém
+        # lidos em streaming com o delta aplicado
+        relacionamentos = self.armazem.carregar_relacionamentos(self.novo_mapa_relacionamentos(), ids_delta | removidos)
+        for papel in PAPEIS:
+            for ticket_id in sorted(ids_delta):
+                for valor_id in relacionamentos_delta.ids(papel, ticket_id):
+                    relacionamentos.adicionar(papel, ticket_id, valor_id)
+        self.concluir_relacionamentos(relacionamentos)
+        return self.armazem.tickets_api(tickets_delta, removidos), relacionamentos
+    
+    def buscar_relacionamentos_tickets(self, ticket_ids=None, estrito=False):
+        """Busca relacionamentos de usuários e grupos para os tickets (todos, se ticket_ids for None);
+        com estrito=True, uma falha interrompe a busca em vez de seguir com relações parciais"""
         print("[EMOJI] Buscando relacionamentos de usuários e grupos...")
         
-        relacionamentos = defaultdict(lambda: {
-            'requerente': 'Sem Requerente',
-            'tecnico': 'Não Atribuído',
-            'grupo': 'Sem Grupo'
-        })
+        relacionamentos = self.novo_mapa_relacionamentos()
         
-        # Buscar relacionamentos de usuários
+        # Buscar relacionamentos de usuários (cada página é incorporada assim que chega)
         try:
-            url = f"{self.api_url}/Ticket_User"
-            params = {'range': '0-50000'}
-            response = self.session.get(url, params=params)
-            
-            if response.status_code in [200, 206]:
-                user_relations = response.json()
-                
-                for relation in user_relations:
-                    ticket_id = str(relation.get('tickets_id'))
-                    user_id = str(relation.get('users_id'))
-                    type_user = relation.get('type')
-                    
-                    if ticket_id in ticket_ids:
-                        nome_usuario = self.cache_usuarios.get(user_id, f"Usuário {user_id}")
-                        
-                        if type_user == 1:  # Requerente
-                            relacionamentos[ticket_id]['requerente'] = nome_usuario
-                        elif type_user == 2:  # Técnico
-                            relacionamentos[ticket_id]['tecnico'] = nome_usuario
+            total_relacoes = self.registrar_relacoes_usuarios(
+                relacionamentos, self.iterar_itens_paginados('Ticket_User'), ticket_ids
+            )
+            print(f"   [OK] {total_relacoes:,} relações de usuários processadas")
         except Exception as e:
+            if estrito:
+                raise
             print(f"   [AVISO] Erro ao buscar relacionamentos de usuários: {e}")
         
         # Buscar relacionamentos de grupos
         try:
-            url = f"{self.api_url}/Group_Ticket"
-            params = {'range': '0-50000'}
-            response = self.session.get(url, params=params)
-            
-            if response.status_code in [200, 206]:
-                group_relations = response.json()
-                
-                for relation in group_relations:
-                    ticket_id = str(relation.get('tickets_id'))
-                    group_id = str(relation.get('groups_id'))
-                    type_group = relation.get('type')
-                    
-                    if ticket_id in ticket_ids and type_group == 2:  # Grupo técnico
-                        nome_grupo = self.cache_grupos.get(group_id, f"Grupo {group_id}")
-                        relacionamentos[ticket_id]['grupo'] = nome_grupo
+            total_relacoes = self.registrar_relacoes_grupos(
+                relacionamentos, self.iterar_itens_paginados('Group_Ticket'), ticket_ids
+            )
+            print(f"   [OK] {total_relacoes:,} relações de grupos processadas")
         except Exception as e:
+            if estrito:
+                raise
             print(f"   [AVISO] Erro ao buscar relacionamentos de grupos: {e}")
         
+        self.concluir_relacionamentos(relacionamentos)
         return relacionamentos
     
-    def extrair_todos_tickets(self):
-        """Extrai TODOS os tickets do GLPI e gera dois arquivos: completo e últimos 6 meses"""
-        if not self.init_session():
-            return False
+    def iterar_itens_paginados(self, endpoint, params=None, range_limit=1000, timeout=None):
+        """Itera item a item sobre um endpoint paginado por range, decodificando cada resposta em streaming"""
+        range_start = 0
         
-        try:
-            print("[EMOJI] Iniciando extração de TODOS os tickets...")
-            print("[LISTA] Este script irá gerar 2 arquivos:")
-            print("   1️⃣ Arquivo completo com todos os tickets")
-            print("   2️⃣ Arquivo filtrado com apenas os últimos 6 meses")
-            print()
-            
-            # Carregar caches primeiro
-            self.carregar_todos_caches()
-            
-            # Buscar todos os tickets
-            todos_tickets = self.buscar_todos_tickets()
-            print(f"[OK] Total de tickets encontrados: {len(todos_tickets):,}")
+        while True:
+            self.verificar_prazo()
+            params_pagina = dict(params or {})
+            params_pagina['range'] = f'{range_start}-{range_start + range_limit - 1}'
             
-            if not todos_tickets:
-                print("[ERRO] Nenhum ticket encontrado!")
-                return False
+            with self.session.get(f"{self.api_url}/{endpoint}", params=params_pagina, stream=True,
+                                  timeout=timeout or self.timeout_requisicoes) as response:
+                if response.status_code not in [200, 206]:
+                    raise RuntimeError(f"Erro ao buscar {endpoint} {params_pagina['range']}: "
+                                       f"{response.status_code} - {response.text}")
+                
+                itens_pagina = 0
+                for item in iterar_itens_array_json(response.iter_content(chunk_size=65536)):
+                    itens_pagina += 1
+                    yield item
+                
+                content_range = response.headers.get('Content-Range', '')
             
-            # Buscar relacionamentos
-            ticket_ids = {str(ticket['id']) for ticket in todos_tickets}
-            relacionamentos = self.buscar_relacionamentos_tickets(ticket_ids)
+            if itens_pagina < range_limit:
+                break
             
-            # Calcular período dos últimos 6 meses
-            data_inicial_6m, data_final_6m = self.calcular_periodo_6_meses()
-            print(f"[MES] Período dos últimos 6 meses: {data_inicial_6m.strftime('%d/%m/%Y')} até {data_final_6m.strftime('%d/%m/%Y')}")
+            range_start += range_limit
             
-            # Filtrar tickets dos últimos 6 meses
-            tickets_6_meses = self.filtrar_tickets_por_data(todos_tickets, data_inicial_6m, data_final_6m)
-            print(f"[OK] Tickets dos últimos 6 meses: {len(tickets_6_meses):,}")
-            print()
-            
-            # Processar dados completos
-            dados_completos = self.processar_dados_tickets(todos_tickets, relacionamentos, "todos os tickets")
+            # Content-Range: "0-999/12345" evita pedir um range além do total
+            if '/' in content_range and range_start >= int(content_range.rsplit('/', 1)[1]):
+                break
+    
+    def novo_mapa_relacionamentos(self):
+        """Cria o índice ticket -> IDs de requerentes/técnicos/grupos (os nomes são resolvidos na saída)"""
+        return IndiceRelacionamentos()
+    
+    def registrar_relacoes_usuarios(self, relacionamentos, user_relations, ticket_ids):
+        """Incorpora relações Ticket_User (requerente/técnico) ao índice e retorna quantas foram lidas"""
+        papeis = {1: 'requerente', 2: 'tecnico'}
+        total = 0
+        for relation in user_relations:
+            total += 1
+            ticket_id = relation.get('tickets_id')
+            user_id = relation.get('users_id')
+            papel = papeis.get(relation.get('type'))
             
-            # Processar dados dos últimos 6 meses
-            dados_6_meses = self.processar_dados_tickets(tickets_6_meses, relacionamentos, "tickets dos últimos 6 meses")
+            if papel is None or ticket_id is None or user_id is None:
+                continue
             
-            # Gerar timestamp para os arquivos
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            if ticket_ids is None or int(ticket_id) in ticket_ids:
+                relacionamentos.adicionar(papel, ticket_id, user_id)
+        
+        return total
+    
+    def registrar_relacoes_grupos(self, relacionamentos, group_relations, ticket_ids):
+        """Incorpora relações Group_Ticket (grupo técnico) ao índice e retorna quantas foram lidas"""
+        total = 0
+        for relation in group_relations:
+            total += 1
+            ticket_id = relation.get('tickets_id')
+            group_id = relation.get('groups_id')
+            type_group = relation.get('type')
             
-            # Salvar arquivo completo
-            print()
-            print("=" * 60)
-            print("[EMOJI] SALVANDO ARQUIVO COMPLETO")
-            print("=" * 60)
-            nome_arquivo_completo = f'../dados/tickets_completos/todos_tickets_{timestamp}.csv'
-            sucesso_completo = self.salvar_dados_csv(dados_completos, nome_arquivo_completo, "arquivo completo")
+            if type_group != 2 or ticket_id is None or group_id is None:  # Apenas grupo técnico
+                continue
             
-            # Salvar arquivo dos últimos 6 meses
+            if ticket_ids is None or int(ticket_id) in ticket_ids:
+                relacionamentos.adicionar('grupo', ticket_id, group_id)
+        
+        return total
+    
+    def coletar_dados_api(self):
+        """Carrega caches, tickets e relacionamentos da API"""
+        # Carregar caches primeiro
+        self.carregar_todos_caches()
+        
+        # No modo incremental, apenas o delta (tickets e relações) é buscado
+        if self.usar_modo_incremental():
+            return self.coletar_dados_incrementais()
+        
+        # Buscar todos os tickets
+        todos_tickets = self.buscar_todos_tickets()
+        print(f"[OK] Total de tickets encontrados: {len(todos_tickets):,}")
+        
+        if not todos_tickets:
+            return todos_tickets, None
+        
+        # Buscar relacionamentos
+        ticket_ids = {int(ticket['id']) for ticket in todos_tickets}
+        relacionamentos = self.buscar_relacionamentos_tickets(ticket_ids)
+        
+        return todos_tickets, relacionamentos
+    
+    def extrair_todos_tickets(self):
+        """Extrai TODOS os tickets do GLPI e gera dois arquivos: completo e últimos 6 meses"""
+        if self.manter_sessao and self.sessao_valida():
+            print("[OK] Reutilizando sessão ativa na API do GLPI")
+        elif not self.init_session():
+            return False
+        
+        try:
+            print("[EMOJI] Iniciando extração de TODOS os tickets...")
+            self.dimensoes_alteradas = False
+            self.delta_incremental = None
+            if self.armazem is not None:
+                print(f"[LISTA] Armazém de tickets: {self.armazem.arquivo}")
+            elif self.modo_incremental:
+                print("[AVISO] Modo incremental requer o armazém de tickets: realizando extração completa")
+            if self.salvar_snapshots:
+                print(f"[LISTA] Este script irá gerar {2 + len(self.janelas_extras)} arquivos:")
+                print("   1️⃣ Arquivo completo com todos os tickets")
+                print("   2️⃣ Arquivo filtrado com apenas os últimos 6 meses")
+                for nome, dias in self.janelas_extras.items():
+                    print(f"   ➕ Arquivo da janela {nome} (últimos {dias} dias)")
             print()
-            print("=" * 60)
-            print("[EMOJI] SALVANDO ARQUIVO DOS ÚLTIMOS 6 MESES")
-            print("=" * 60)
-            nome_arquivo_6m = f'../dados/tickets_6_meses/tickets_api_glpi_ultimos_6_meses_{timestamp}.csv'
-            sucesso_6m = self.salvar_dados_csv(dados_6_meses, nome_arquivo_6m, "arquivo dos últimos 6 meses")
             
-            # Resumo final
-            print()
-            print("=" * 60)
-            print("[DADOS] RESUMO DA EXTRAÇÃO")
-            print("=" * 60)
-            print(f"[OK] Total de tickets processados: {len(todos_tickets):,}")
-            print(f"[EMOJI] Arquivo completo: {'[OK] Salvo' if sucesso_completo else '[ERRO] Erro'}")
-            print(f"[EMOJI] Arquivo 6 meses: {'[OK] Salvo' if sucesso_6m else '[ERRO] Erro'}")
-            print()
+            if self.usar_pipeline_streaming():
+                # Caches e relacionamentos precisam estar prontos antes do primeiro ticket
+                print("[EMOJI] Pipeline em streaming: API -> formatação -> CSV em uma única passagem")
+                self.carregar_todos_caches()
+                relacionamentos = self.buscar_relacionamentos_tickets()
+                tickets = self.iterar_todos_tickets()
+            else:
+                # Carregar caches, tickets e relacionamentos
+                tickets, relacionamentos = self.coletar_dados_api()
+                
+                # Um delta incremental vazio é válido: só a listagem completa precisa trazer tickets
+                if self.delta_incremental is None and not tickets:
+                    print("[ERRO] Nenhum ticket encontrado!")
+                    return False
             
-            if sucesso_completo:
-                print(f"[EMOJI] Arquivo completo salvo em: {nome_arquivo_completo}")
-            if sucesso_6m:
-                print(f"[EMOJI] Arquivo 6 meses salvo em: {nome_arquivo_6m}")
+            if self.usar_modo_incremental():
+                return self.gravar_coleta_incremental(tickets, relacionamentos)
             
-            return sucesso_completo and sucesso_6m
+            # Só uma listagem completa (que interrompe com exceção em qualquer página com erro) autoriza
+            # remover do armazém os tickets ausentes
+            return self.gravar_em_passagem_unica(tickets, relacionamentos, sincronizar=True)
             
         except Exception as e:
             print(f"[ERRO] Erro durante extração: {e}")
             return False
         
         finally:
-            self.kill_session()
+            if not self.manter_sessao:
+                self.kill_session()
+    
+    def gravar_coleta_incremental(self, tickets, relacionamentos):
+        """Grava a coleta incremental (passagem completa ou apenas o delta no armazém) e, se as saídas foram
+        gravadas, salva a marca d'água"""
+        delta = self.delta_incremental
+        if delta is not None and delta['apenas_delta']:
+            sucesso = self.gravar_delta_armazem(delta['tickets'], relacionamentos, delta['removidos'])
+        else:
+            # Carga inicial ou armazém inteiro com o delta aplicado: em ambos os casos a passagem traz todos os
+            # tickets, com relações completas, e os ausentes (excluídos) saem do armazém
+            sucesso = self.gravar_em_passagem_unica(tickets, relacionamentos, sincronizar=True, completa=True)
+        
+        # Sem as saídas gravadas, a marca não avança e o mesmo delta é buscado na próxima execução
+        if sucesso:
+            self.salvar_marca_incremental(*self.marca_pendente)
+        return sucesso
+    
+    def gravar_delta_armazem(self, tickets, relacionamentos, removidos):
+        """Formata apenas os tickets alterados e os grava no armazém (upsert), com as exclusões, sem arquivos"""
+        print(f"🧹 Formatando e gravando no armazém apenas o delta: {len(tickets):,} tickets alterados, "
+              f"{len(removidos):,} excluídos...")
+        itens = []
+        for ticket in tickets:
+            linha = self.formatar_ticket(ticket, relacionamentos)
+            if linha is not None:
+                itens.append((ticket, linha, self.relacoes_ticket(relacionamentos, linha['ID'])))
+        
+        self.armazem.upsert(itens, removidos)
+        print(f"[EMOJI] Armazém de tickets: [OK] Atualizado ({self.armazem.total():,} tickets)")
+        return True
+    
+    def verificar_prazo(self):
+        """Interrompe a extração (PrazoExcedido) se o prazo definido pelo pipeline tiver passado"""
+        if self.prazo is not None and time.monotonic() > self.prazo:
+            raise PrazoExcedido("Prazo da etapa de extração esgotado; extração interrompida")
+    
+    def relacoes_ticket(self, relacionamentos, ticket_id):
+        """Relações do ticket por papel, como gravadas no armazém"""
+        return {papel: relacionamentos.ids(papel, ticket_id) for papel in PAPEIS}
+    
+    def usar_modo_incremental(self):
+        """Indica se a extração aplica apenas o delta: o modo incremental depende do armazém de tickets"""
+        return self.modo_incremental and self.armazem is not None
+    
+    def usar_pipeline_streaming(self):
+        """Indica se a extração pode fluir da API ao CSV sem materializar a lista de tickets"""
+        # Os modos incremental e paralelo buscam a lista de tickets antes da gravação (delta / reordenação)
+        return not self.usar_modo_incremental() and self.workers_paralelos == 1
+    
+    def coletar_em_memoria(self, colunas):
+        """Passa a guardar em tickets_em_memoria as colunas indicadas das linhas dos últimos 6 meses"""
+        self.colunas_em_memoria = list(colunas)
+        self.tickets_em_memoria = None
+    
+    def montar_destinos(self, timestamp):
+        """Monta os destinos de saída: arquivo completo, últimos 6 meses e janelas extras configuradas"""
+        data_inicial_6m, data_final_6m = self.calcular_periodo_6_meses()
+        
+        destinos = [
+            {
+                'descricao': 'arquivo completo',
+                'rotulo': 'Arquivo completo',
+                'arquivo': f'../dados/tickets_completos/todos_tickets_{timestamp}.csv',
+                'padrao': '../dados/tickets_completos/todos_tickets_*.csv',
+                'periodo': None
+            },
+            {
+                'descricao': 'arquivo dos últimos 6 meses',
+                'rotulo': 'Arquivo 6 meses',
+                'arquivo': f'../dados/tickets_6_meses/tickets_api_glpi_ultimos_6_meses_{timestamp}.csv',
+                'padrao': '../dados/tickets_6_meses/tickets_api_glpi_ultimos_6_meses_*.csv',
+                'periodo': (data_inicial_6m, data_final_6m)
+            }
+        ]
+        
+        for nome, dias in self.janelas_extras.items():
+            destinos.append({
+                'descricao': f'arquivo da janela {nome}',
+                'rotulo': f'Janela {nome} ({dias} dias)',
+                'arquivo': f'../dados/tickets_janelas/tickets_{nome}_{timestamp}.csv',
+                'padrao': f'../dados/tickets_janelas/tickets_{nome}_*.csv',
+                'periodo': (data_final_6m - timedelta(days=dias), data_final_6m)
+            })
+        
+        return destinos
+    
+    def gravar_em_passagem_unica(self, tickets, relacionamentos, sincronizar=False, completa=False):
+        """Formata cada ticket uma única vez e roteia a linha para todos os destinos cujo período a contém;
+        com sincronizar=True (listagem completa), os tickets ausentes saem do armazém, e completa=True indica
+        relações obtidas sem falhas (o armazém passa a servir de base ao modo incremental)"""
+        # Gerar timestamp para os arquivos
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        destinos = self.montar_destinos(timestamp) if self.salvar_snapshots else []
+        
+        if self.armazem is not None:
+            self.armazem.iniciar_carga()
+        armazem_salvo = False
+        
+        for destino in destinos:
+            if destino['periodo'] is not None:
+                data_inicial, data_final = destino['periodo']
+                print(f"[MES] {destino['rotulo']}: {data_inicial.strftime('%d/%m/%Y')} até {data_final.strftime('%d/%m/%Y')}")
+            destino['escritor'] = EscritorCSVIncremental(destino['arquivo'], destino['descricao'])
+            destino['escritor_parquet'] = None
+            if self.saida_parquet:
+                destino['arquivo_parquet'] = os.path.splitext(destino['arquivo'])[0] + '.parquet'
+                try:
+                    destino['escritor_parquet'] = EscritorParquetIncremental(destino['arquivo_parquet'],
+                                                                             destino['descricao'], self.formato_datas)
+                except Exception as e:
+                    print(f"[AVISO] Parquet {destino['descricao']} desativado nesta execução: {e}")
+        print()
+        print(f"🧹 Processando, formatando e gravando tickets em {len(destinos)} arquivos"
+              f"{' e no armazém' if self.armazem is not None else ''}...")
+        
+        total_tickets = 0
+        sucesso = False
+        
+        # Coleta em memória: apenas as colunas pedidas, com vazios como None (como no armazém)
+        em_memoria = None
+        if self.colunas_em_memoria is not None:
+            em_memoria = {coluna: [] for coluna in self.colunas_em_memoria}
+            periodo_memoria = self.calcular_periodo_6_meses()
+        
+        try:
+            for ticket in tickets:
+                total_tickets += 1
+                if total_tickets % 500 == 0:
+                    print(f"   [DADOS] Processados {total_tickets:,} tickets...")
+                    self.verificar_prazo()
+                
+                linha = self.formatar_ticket(ticket, relacionamentos)
+                if linha is None:
+                    continue
+                
+                if self.armazem is not None:
+                    self.armazem.adicionar(ticket, linha, self.relacoes_ticket(relacionamentos, linha['ID']))
+                
+                # A data de criação é interpretada uma única vez por ticket
+                data_criacao = self.data_criacao_ticket(ticket)
+                
+                for destino in destinos:
+                    periodo = destino['periodo']
+                    if periodo is None or (data_criacao is not None and periodo[0] <= data_criacao <= periodo[1]):
+                        destino['escritor'].escrever(linha)
+                        if destino['escritor_parquet'] is not None:
+                            self.escrever_parquet(destino, linha)
+                
+                if em_memoria is not None and data_criacao is not None and \
+                        periodo_memoria[0] <= data_criacao <= periodo_memoria[1]:
+                    for coluna, valores in em_memoria.items():
+                        valor = linha.get(coluna)
+                        valores.append(None if valor == '' else valor)
+            
+            sucesso = total_tickets > 0
+        finally:
+            # Os arquivos e o armazém só são atualizados se a passagem completa terminar
+            if self.armazem is not None:
+                armazem_salvo = self.armazem.concluir_carga(sucesso, sincronizar=sincronizar, completa=completa)
+            self.tickets_em_memoria = em_memoria if sucesso else None
+            for destino in destinos:
+                destino['salvo'] = destino['escritor'].fechar(sucesso)
+                # O Parquet é complementar: uma falha nele não invalida o CSV
+                destino['parquet_salvo'] = (destino['escritor_parquet'] is not None
+                                            and destino['escritor_parquet'].fechar(sucesso))
+        
+        print(f"[OK] Total de tickets encontrados: {total_tickets:,}")
+        if not total_tickets:
+            print("[ERRO] Nenhum ticket encontrado!")
+            return False
+        
+        # Resumo final
+        print()
+        print("=" * 60)
+        print("[DADOS] RESUMO DA EXTRAÇÃO")
+        print("=" * 60)
+        print(f"[OK] Total de tickets processados: {total_tickets:,}")
+        if self.armazem is not None:
+            print(f"[EMOJI] Armazém de tickets: {'[OK] Atualizado' if armazem_salvo else '[ERRO] Erro'} "
+                  f"({self.armazem.total():,} tickets)")
+        for destino in destinos:
+            print(f"[EMOJI] {destino['rotulo']}: {'[OK] Salvo' if destino['salvo'] else '[ERRO] Erro'} "
+                  f"({destino['escritor'].total:,} tickets)")
+        print()
+        
+        for destino in destinos:
+            if destino['salvo']:
+                print(f"[EMOJI] {destino['rotulo']} salvo em: {destino['arquivo']}")
+            if destino['parquet_salvo']:
+                print(f"[EMOJI] {destino['rotulo']} (Parquet) salvo em: {destino['arquivo_parquet']}")
+        
+        if self.armazem is not None and armazem_salvo:
+            print(f"[EMOJI] Armazém de tickets salvo em: {self.armazem.arquivo}")
+        
+        self.remover_snapshots_antigos(destinos)
+        
+        return all(destino['salvo'] for destino in destinos) and (self.armazem is None or armazem_salvo)
+    
+    def escrever_parquet(self, destino, linha):
+        """Grava a linha no Parquet do destino; em caso de erro, descarta esse Parquet e segue apenas com o CSV"""
+        try:
+            destino['escritor_parquet'].escrever(linha)
+        except Exception as e:
+            print(f"[AVISO] Erro ao gravar Parquet {destino['descricao']}: {e}; arquivo descartado, mantendo o CSV")
+            destino['escritor_parquet'].fechar(False)
+            destino['escritor_parquet'] = None
+    
+    def remover_snapshots_antigos(self, destinos):
+        """Mantém apenas os retencao_snapshots arquivos mais recentes de cada destino (CSV e Parquet)"""
+        if not self.retencao_snapshots:
+            return
+        
+        for destino in destinos:
+            if not destino['salvo']:
+                continue
+            
+            # O timestamp no nome (AAAAMMDD_HHMMSS) ordena os arquivos cronologicamente
+            antigos = sorted(glob.glob(destino['padrao']))[:-self.retencao_snapshots]
+            for arquivo in antigos:
+                for caminho in (arquivo, os.path.splitext(arquivo)[0] + '.parquet'):
+                    try:
+                        if os.path.exists(caminho):
+                            os.remove(caminho)
+                    except OSError as e:
+                        print(f"[AVISO] Não foi possível remover {caminho}: {e}")
+            if antigos:
+                print(f"[EMOJI] {destino['rotulo']}: {len(antigos)} arquivo(s) antigo(s) removido(s)")
 
     def calcular_periodo_6_meses(self):
         """Calcula as datas para os últimos 6 meses"""
@@ -495,60 +1328,46 @@ class GLPITodosTicketsExtractor:
         data_final = hoje
         return data_inicial, data_final
 
-    def filtrar_tickets_por_data(self, tickets, data_inicial, data_final):
-        """Filtra tickets por período de data"""
-        tickets_filtrados = []
-        
-        for ticket in tickets:
-            try:
-                data_criacao_str = ticket.get('date', '')
-                if not data_criacao_str:
-                    continue
-                
-                # Converter string para datetime
-                data_criacao = datetime.strptime(data_criacao_str, '%Y-%m-%d %H:%M:%S')
-                
-                # Verificar se está no período
-                if data_inicial <= data_criacao <= data_final:
-                    tickets_filtrados.append(ticket)
-                    
-            except (ValueError, TypeError):
-                # Se não conseguir converter a data, pula o ticket
-                continue
-        
-        return tickets_filtrados
+    def data_criacao_ticket(self, ticket):
+        """Converte a data de criação do ticket para datetime (None se ausente ou inválida)"""
+        # Datas inválidas ficam fora dos períodos
+        return datas_glpi.interpretar_data_glpi(ticket.get('date', ''))
 
-    def salvar_dados_csv(self, dados_formatados, nome_arquivo, descricao="dados"):
-        """Salva dados formatados em arquivo CSV"""
-        try:
-            # Criar diretório se não existir
-            os.makedirs(os.path.dirname(nome_arquivo), exist_ok=True)
-            
-            print(f"[SALVAR] Salvando {descricao} em: {nome_arquivo}")
-            
-            with open(nome_arquivo, 'w', newline='', encoding='utf-8') as csvfile:
-                if dados_formatados:
-                    fieldnames = dados_formatados[0].keys()
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(dados_formatados)
-            
-            print(f"[OK] Arquivo {descricao} salvo com sucesso!")
-            print(f"[DADOS] Total de tickets exportados: {len(dados_formatados):,}")
-            return True
-            
-        except Exception as e:
-            print(f"[ERRO] Erro ao salvar {descricao}: {e}")
-            return False
+def criar_parser():
+    """Argumentos de linha de comando do extrator"""
+    parser = argparse.ArgumentParser(description="Extrai todos os tickets da API do GLPI")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Busca apenas tickets modificados desde a última execução (marca de date_mod)")
+    parser.add_argument('--async', dest='motor_async', action='store_true',
+                        help="Usa o motor assíncrono (aiohttp) para disparar as requisições em paralelo")
+    parser.add_argument('--janela', action='append', default=[], metavar='NOME=DIAS',
+                        help="Gera também um arquivo com os tickets criados nos últimos DIAS dias (repetível)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Número de páginas de /Ticket buscadas em paralelo (1 = sequencial)")
+    parser.add_argument('--limite-conexoes', type=int, default=None,
+                        help="Máximo de conexões simultâneas por host no modo paralelo")
+    parser.add_argument('--renovar-caches', action='store_true',
+                        help="Ignora o TTL e recarrega da API todas as dimensões (usuários, entidades, categorias, grupos)")
+    parser.add_argument('--sem-cache-dimensoes', action='store_true',
+                        help="Não usa o cache persistente de dimensões em dados/estado")
+    parser.add_argument('--usuarios-sob-demanda', action='store_true',
+                        help="Busca apenas os usuários citados nos relacionamentos, em vez da tabela /User inteira")
+    parser.add_argument('--formato-datas', choices=sorted(datas_glpi.FORMATOS_CSV), default=None,
+                        help="Formato das datas no CSV: br (dd/mm/aaaa, padrão) ou iso (aaaa-mm-dd)")
+    parser.add_argument('--sem-snapshots', action='store_true',
+                        help="Grava apenas no armazém de tickets, sem os arquivos CSV/Parquet com timestamp")
+    parser.add_argument('--retencao-snapshots', type=int, default=None, metavar='N',
+                        help="Quantidade de arquivos com timestamp mantidos por tipo (0 = todos; padrão: 3)")
+    parser.add_argument('--sem-parquet', action='store_true',
+                        help="Não gera a cópia Parquet (colunas tipadas) ao lado de cada CSV")
+    return parser
 
-def main():
-    """Função principal"""
-    print("=" * 70)
-    print("[TICKET] EXTRATOR DE TODOS OS TICKETS DA API GLPI")
-    print("=" * 70)
-    
+
+def criar_extrator(args):
+    """Lê config.py e os argumentos e cria o extrator configurado (encerra o processo se config.py faltar)"""
     # Importar configurações
     try:
+        import config
         from config import API_URL, APP_TOKEN, USER_TOKEN
         print("[OK] Configurações carregadas de config.py")
     except ImportError:
@@ -565,13 +1384,89 @@ def main():
     print(f"[EMOJI] API URL: {API_URL}")
     print(f"[EMOJI] App Token: {APP_TOKEN[:10]}...")
     print(f"[EMOJI] User Token: {USER_TOKEN[:10]}...")
+    
+    # Configurações opcionais (config.py ou linha de comando)
+    modo_incremental = args.incremental or getattr(config, 'MODO_INCREMENTAL', False)
+    workers_paralelos = args.workers or getattr(config, 'WORKERS_PARALELOS', 1)
+    limite_conexoes_host = args.limite_conexoes or getattr(config, 'LIMITE_CONEXOES_HOST', None)
+    print(f"[EMOJI] Modo incremental: {'Ativado' if modo_incremental else 'Desativado'}")
+    motor_async = args.motor_async or getattr(config, 'MOTOR_ASYNC', False)
+    
+    janelas_extras = dict(getattr(config, 'JANELAS_EXTRAS', {}))
+    for janela in args.janela:
+        try:
+            nome, dias = janela.split('=', 1)
+            janelas_extras[nome.strip()] = int(dias)
+        except ValueError:
+            print(f"[ERRO] Janela inválida '{janela}' (use NOME=DIAS)")
+            sys.exit(1)
+    if janelas_extras:
+        print(f"[EMOJI] Janelas extras: {', '.join(f'{nome} ({dias} dias)' for nome, dias in janelas_extras.items())}")
+    print(f"[EMOJI] Workers paralelos: {workers_paralelos}")
+    formato_datas = args.formato_datas or getattr(config, 'FORMATO_DATAS_CSV', datas_glpi.FORMATO_CSV_PADRAO)
+    print(f"[EMOJI] Formato das datas no CSV: {formato_datas}")
+    cache_persistente = not args.sem_cache_dimensoes and getattr(config, 'CACHE_DIMENSOES_PERSISTENTE', True)
+    print(f"[EMOJI] Cache persistente de dimensões: {'Ativado' if cache_persistente else 'Desativado'}")
+    resolucao_usuarios = 'sob_demanda' if args.usuarios_sob_demanda else getattr(config, 'RESOLUCAO_USUARIOS', 'completa')
+    print(f"[EMOJI] Resolução de usuários: {resolucao_usuarios}")
+    salvar_snapshots = not args.sem_snapshots and getattr(config, 'SALVAR_SNAPSHOTS', True)
+    retencao_snapshots = args.retencao_snapshots
+    if retencao_snapshots is None:
+        retencao_snapshots = getattr(config, 'RETENCAO_SNAPSHOTS', 3)
+    print(f"[EMOJI] Arquivos com timestamp: {'Ativados' if salvar_snapshots else 'Desativados'}"
+          f"{f' (mantendo os {retencao_snapshots} mais recentes)' if salvar_snapshots and retencao_snapshots else ''}")
+    saida_parquet = False if args.sem_parquet else getattr(config, 'SAIDA_PARQUET', None)
+    if saida_parquet is False:
+        print("[EMOJI] Saída Parquet: Desativada")
+    else:
+        print(f"[EMOJI] Saída Parquet: {'Ativada' if pyarrow_disponivel() else 'Indisponível (pyarrow não instalado)'}")
+    
+    classe_extrator = GLPITodosTicketsExtractor
+    if motor_async:
+        try:
+            from extrair_todos_tickets_async import GLPITodosTicketsExtractorAsync, aiohttp
+            if aiohttp is None:
+                raise ImportError("pacote aiohttp não instalado")
+            classe_extrator = GLPITodosTicketsExtractorAsync
+        except ImportError as e:
+            print(f"[AVISO] Motor assíncrono indisponível ({e}), usando requests")
+    print(f"[EMOJI] Motor: {'asyncio/aiohttp' if classe_extrator is not GLPITodosTicketsExtractor else 'requests'}")
     print()
     
-    inicio = datetime.now()
+    # Criar extrator
+    extrator = classe_extrator(API_URL, APP_TOKEN, USER_TOKEN, modo_incremental=modo_incremental,
+                               workers_paralelos=workers_paralelos,
+                               limite_conexoes_host=limite_conexoes_host,
+                               janelas_extras=janelas_extras,
+                               formato_datas=formato_datas,
+                               cache_persistente=cache_persistente,
+                               ttl_dimensoes=getattr(config, 'TTL_CACHE_DIMENSOES', None),
+                               timeout_dimensoes=getattr(config, 'TIMEOUT_CACHE_DIMENSOES', 30),
+                               timeout_requisicoes=getattr(config, 'TIMEOUT_REQUISICOES', 120),
+                               renovar_caches=args.renovar_caches,
+                               resolucao_usuarios=resolucao_usuarios,
+                               capacidade_cache_usuarios=getattr(config, 'CAPACIDADE_CACHE_USUARIOS', 10000),
+                               saida_parquet=saida_parquet,
+                               arquivo_armazem=getattr(config, 'ARQUIVO_ARMAZEM', '../dados/tickets.sqlite'),
+                               salvar_snapshots=salvar_snapshots,
+                               retencao_snapshots=retencao_snapshots)
+    return extrator
+
+
+def main():
+    """Função principal"""
+    args = criar_parser().parse_args()
+    
+    print("=" * 70)
+    print("[TICKET] EXTRATOR DE TODOS OS TICKETS DA API GLPI")
+    print("=" * 70)
     
-    # Criar extrator e executar
-    extrator = GLPITodosTicketsExtractor(API_URL, APP_TOKEN, USER_TOKEN)
-    sucesso = extrator.extrair_todos_tickets()
+    extrator = criar_extrator(args)
+    inicio = datetime.now()
+    try:
+        sucesso = extrator.extrair_todos_tickets()
+    finally:
+        extrator.fechar()
     
     fim = datetime.now()
     duracao = fim - inicio
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor assíncrono (asyncio + aiohttp) para a extração de tickets do GLPI
+Mesma interface de GLPITodosTicketsExtractor, com as requisições disparadas em paralelo
+"""
+
+import asyncio
+import itertools
+from collections import deque
+
+from extrair_todos_tickets import GLPITodosTicketsExtractor, PrazoExcedido
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class GLPITodosTicketsExtractorAsync(GLPITodosTicketsExtractor):
+    def __init__(self, api_url, app_token, user_token, **kwargs):
+        """Inicializa o extrator assíncrono com pool de conexões keep-alive"""
+        if aiohttp is None:
+            raise ImportError("Motor assíncrono requer o pacote aiohttp (pip install aiohttp)")
+        
+        super().__init__(api_url, app_token, user_token, **kwargs)
+        
+        # Sem limite explícito, permite várias conexões simultâneas por host
+        if not kwargs.get('limite_conexoes_host'):
+            self.limite_conexoes_host = max(self.workers_paralelos, 8)
+        
+        self.loop = asyncio.new_event_loop()
+        self.sessao_async = None
+    
+    def _executar(self, corrotina):
+        """Executa uma corrotina no event loop do extrator"""
+        return self.loop.run_until_complete(corrotina)
+    
+    async def _obter_sessao_async(self):
+        """Retorna a sessão aiohttp, criando-a (com pool keep-alive) no primeiro uso"""
+        if self.sessao_async is None or self.sessao_async.closed:
+            conector = aiohttp.TCPConnector(limit_per_host=self.limite_conexoes_host, keepalive_timeout=60)
+            self.sessao_async = aiohttp.ClientSession(
+                connector=conector,
+                timeout=aiohttp.ClientTimeout(total=300, sock_read=self.timeout_requisicoes)
+            )
+        return self.sessao_async
+    
+    async def _get(self, endpoint, params=None, headers=None):
+        """GET assíncrono; retorna (status, json, headers)"""
+        sessao = await self._obter_sessao_async()
+        params = {chave: str(valor) for chave, valor in (params or {}).items()}
+        
+        async with sessao.get(f"{self.api_url}/{endpoint}", params=params,
+                              headers=headers or dict(self.session.headers)) as response:
+            if response.status in [200, 206]:
+                dados = await response.json(content_type=None)
+            else:
+                dados = await response.text()
+            return response.status, dados, response.headers
+    
+    async def _iterar_paginas(self, endpoint, params=None, range_limit=1000):
+        """Busca a primeira página e, com o total do Content-Range, dispara as demais em paralelo
+        (no máximo limite_conexoes_host em andamento), entregando cada página na ordem original
+        assim que estiver disponível; sem o total, as páginas são buscadas em sequência"""
+        params = dict(params or {})
+        
+        async def buscar_pagina(inicio):
+            self.verificar_prazo()
+            params_pagina = dict(params, range=f'{inicio}-{inicio + range_limit - 1}')
+            status, pagina, headers = await self._get(endpoint, params_pagina)
+            if status not in [200, 206]:
+                raise RuntimeError(f"Erro ao buscar {endpoint} {params_pagina['range']}: {status} - {pagina}")
+            return pagina, headers
+        
+        primeira_pagina, headers = await buscar_pagina(0)
+        
+        total = None
+        content_range = headers.get('Content-Range', '')
+        if '/' in content_range:
+            try:
+                total = int(content_range.rsplit('/', 1)[1])
+            except ValueError:
+                total = None
+        
+        if primeira_pagina:
+            yield primeira_pagina
+        
+        if len(primeira_pagina) < range_limit:
+            return
+        
+        if total is None:
+            # Sem o total não há como disparar as páginas em paralelo: segue página a página até uma incompleta
+            print(f"[AVISO] Content-Range ausente ou inválido em {endpoint}; buscando as páginas em sequência")
+            inicio = range_limit
+            while True:
+                pagina, _ = await buscar_pagina(inicio)
+                if pagina:
+                    yield pagina
+                if len(pagina) < range_limit:
+                    return
+                inicio += range_limit
+        
+        # Janela deslizante: cada página entregue libera o disparo da próxima, limitando as respostas em memória
+        inicios = iter(range(range_limit, total, range_limit))
+        tarefas = deque(asyncio.ensure_future(buscar_pagina(inicio))
+                        for inicio in itertools.islice(inicios, self.limite_conexoes_host))
+        try:
+            while tarefas:
+                pagina, _ = await tarefas.popleft()
+                proximo = next(inicios, None)
+                if proximo is not None:
+                    tarefas.append(asyncio.ensure_future(buscar_pagina(proximo)))
+                yield pagina
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+    
+    async def _buscar_paginado(self, endpoint, params=None, range_limit=1000):
+        """Busca todas as páginas de um endpoint em paralelo e as concatena em ordem"""
+        itens = []
+        async for pagina in self._iterar_paginas(endpoint, params, range_limit):
+            itens.extend(pagina)
+        return itens
+    
+    async def _init_session(self):
+        """Inicia sessão na API do GLPI"""
+        try:
+            print("[EMOJI] Iniciando sessão na API do GLPI (motor assíncrono)...")
+            
+            headers = {
+                'Authorization': f'user_token {self.user_token}',
+                'App-Token': self.app_token,
+                'Content-Type': 'application/json'
+            }
+            status, dados, _ = await self._get('initSession', headers=headers)
+            
+            if status == 200:
+                self.session_token = dados.get('session_token')
+                # Mantém a sessão requests sincronizada para os métodos herdados
+                self.session.headers.update({'Session-Token': self.session_token})
+                print("[OK] Sessão iniciada com sucesso!")
+                return True
+            else:
+                print(f"[ERRO] Erro ao iniciar sessão: {status}")
+                print(f"Resposta: {dados}")
+                return False
+        
+        except Exception as e:
+            print(f"[ERRO] Erro na conexão: {e}")
+            return False
+    
+    async def _kill_session(self):
+        """Encerra sessão na API do GLPI e fecha o pool de conexões"""
+        if self.session_token:
+            try:
+                await self._get('killSession')
+                print("[EMOJI] Sessão encerrada")
+            except Exception:
+                pass
+            self.session_token = None
+            self.session.headers.pop('Session-Token', None)
+        
+        if self.sessao_async is not None and not self.sessao_async.closed:
+            await self.sessao_async.close()
+    
+    async def _buscar_alterados(self, endpoint, marca, range_limit=1000):
+        """Busca, página a página por date_mod decrescente, os itens de date_mod >= marca"""
+        itens = []
+        inicio = 0
+        
+        while True:
+            self.verificar_prazo()
+            params = {'sort': 'date_mod', 'order': 'DESC', 'range': f'{inicio}-{inicio + range_limit - 1}'}
+            status, pagina, _ = await self._get(endpoint, params)
+            if status not in [200, 206]:
+                raise RuntimeError(f"Erro ao buscar {endpoint} {params['range']}: {status} - {pagina}")
+            
+            for item in pagina:
+                if (item.get('date_mod') or '') < marca:
+                    return itens
+                itens.append(item)
+            
+            if len(pagina) < range_limit:
+                return itens
+            inicio += range_limit
+    
+    async def _renovar_usuarios_persistidos(self):
+        """No modo sob demanda, apenas aplica à cópia em disco as alterações de usuários desde a última renovação"""
+        marca = self.cache_dimensoes.marca_date_mod('usuarios') if self.cache_dimensoes is not None else None
+        if marca is None or not self.cache_dimensoes.expirado('usuarios'):
+            print("   [OK] Usuários serão resolvidos sob demanda a partir dos relacionamentos")
+            return
+        
+        try:
+            itens = await asyncio.wait_for(self._buscar_alterados('User', marca), self.timeout_dimensoes)
+        except Exception as e:
+            print(f"   [AVISO] Falha ao renovar usuários ({e or type(e).__name__}); usando cópia local")
+            return
+        
+        self.incorporar_itens_dimensao('usuarios', itens, marca)
+    
+    async def _carregar_dimensao(self, dimensao):
+        """Carrega uma dimensão do cache em disco, renovando-a pela API quando o TTL expira"""
+        endpoint, atributo, _, descricao, _ = self.DIMENSOES[dimensao]
+        
+        if dimensao == 'usuarios' and self.resolucao_usuarios == 'sob_demanda':
+            # A tabela /User não é carregada: os usuários citados são resolvidos após os relacionamentos
+            try:
+                await self._renovar_usuarios_persistidos()
+            except Exception as e:
+                print(f"   [AVISO] Erro ao carregar {descricao}: {e}")
+            return
+        
+        valida, marca = self.carregar_dimensao_local(dimensao)
+        cache = getattr(self, atributo)
+        
+        try:
+            if valida:
+                print(f"   [OK] {len(cache)} {descricao} do cache local "
+                      f"({self.cache_dimensoes.idade_minutos(dimensao):.0f} min)")
+                return
+            
+            try:
+                # Carga completa com páginas em paralelo; renovação incremental sequencial (delta pequeno)
+                busca = self._buscar_paginado(endpoint) if marca is None else self._buscar_alterados(endpoint, marca)
+                itens = await asyncio.wait_for(busca, self.timeout_dimensoes if cache else None)
+            except Exception as e:
+                self.usar_copia_local_dimensao(dimensao, e)
+                return
+            
+            self.incorporar_itens_dimensao(dimensao, itens, marca)
+        except Exception as e:
+            print(f"   [AVISO] Erro ao carregar {descricao}: {e}")
+    
+    async def _carregar_todos_caches(self):
+        """Carrega os quatro caches em paralelo"""
+        print("[EMOJI] Carregando caches em paralelo...")
+        await asyncio.gather(*(self._carregar_dimensao(dimensao) for dimensao in self.DIMENSOES))
+        print("[OK] Todos os caches carregados!")
+    
+    async def _buscar_todos_tickets(self):
+        """Busca TODOS os tickets com as páginas disparadas em paralelo"""
+        print(f"[TICKET] Buscando TODOS os tickets (motor assíncrono, {self.limite_conexoes_host} conexões por host)...")
+        return await self._buscar_paginado('Ticket', {'expand_dropdowns': 'false', 'get_hateoas': 'false'})
+    
+    async def _incorporar_relacoes(self, relacionamentos, tarefa_ticket_ids):
+        """Pagina Ticket_User e Group_Ticket em paralelo, incorporando cada página ao mapa assim que chega"""
+        async def consumir(endpoint, registrar, descricao):
+            try:
+                total_relacoes = 0
+                async for pagina in self._iterar_paginas(endpoint):
+                    # O filtro depende da lista de tickets (os nomes só são resolvidos na saída)
+                    ticket_ids = await tarefa_ticket_ids
+                    registrar(relacionamentos, pagina, ticket_ids)
+                    total_relacoes += len(pagina)
+                print(f"   [OK] {total_relacoes:,} relações de {descricao} processadas")
+            except Exception as e:
+                print(f"   [AVISO] Erro ao buscar relacionamentos de {descricao}: {e}")
+        
+        await asyncio.gather(
+            consumir('Ticket_User', self.registrar_relacoes_usuarios, 'usuários'),
+            consumir('Group_Ticket', self.registrar_relacoes_grupos, 'grupos')
+        )
+    
+    async def _buscar_relacionamentos_tickets(self, ticket_ids):
+        """Busca relacionamentos de usuários e grupos para os tickets"""
+        print("[EMOJI] Buscando relacionamentos de usuários e grupos (em paralelo)...")
+        relacionamentos = self.novo_mapa_relacionamentos()
+        tarefa_ticket_ids = self.loop.create_future()
+        tarefa_ticket_ids.set_result(ticket_ids)
+        await self._incorporar_relacoes(relacionamentos, tarefa_ticket_ids)
+        return relacionamentos
+    
+    async def _coletar_dados_api(self):
+        """Dispara caches, páginas de tickets e relacionamentos em uma única rodada concorrente"""
+        tarefa_caches = asyncio.ensure_future(self._carregar_todos_caches())
+        tarefa_tickets = asyncio.ensure_future(self._buscar_todos_tickets())
+        
+        async def obter_ticket_ids():
+            return {int(ticket['id']) for ticket in await tarefa_tickets}
+        
+        tarefa_ticket_ids = asyncio.ensure_future(obter_ticket_ids())
+        relacionamentos = self.novo_mapa_relacionamentos()
+        
+        try:
+            await asyncio.gather(tarefa_caches, tarefa_tickets,
+                                 self._incorporar_relacoes(relacionamentos, tarefa_ticket_ids))
+        finally:
+            tarefa_ticket_ids.cancel()
+        
+        todos_tickets = tarefa_tickets.result()
+        print(f"[OK] Total de tickets encontrados: {len(todos_tickets):,}")
+        
+        if not todos_tickets:
+            return todos_tickets, None
+        
+        return todos_tickets, relacionamentos
+    
+    # Interface síncrona compatível com GLPITodosTicketsExtractor
+    
+    def init_session(self):
+        """Inicia sessão na API do GLPI"""
+        return self._executar(self._init_session())
+    
+    def kill_session(self):
+        """Encerra sessão na API do GLPI"""
+        self._executar(self._kill_session())
+    
+    def carregar_cache_usuarios(self):
+        """Carrega todos os usuários em cache"""
+        print("[GRUPO] Carregando cache de usuários...")
+        self._executar(self._carregar_dimensao('usuarios'))
+    
+    def carregar_cache_entidades(self):
+        """Carrega todas as entidades em cache"""
+        print("[EMPRESA] Carregando cache de entidades...")
+        self._executar(self._carregar_dimensao('entidades'))
+    
+    def carregar_cache_categorias(self):
+        """Carrega todas as categorias em cache"""
+        print("[EMOJI] Carregando cache de categorias...")
+        self._executar(self._carregar_dimensao('categorias'))
+    
+    def carregar_cache_grupos(self):
+        """Carrega todos os grupos em cache"""
+        print("[EMOJI] Carregando cache de grupos...")
+        self._executar(self._carregar_dimensao('grupos'))
+    
+    def carregar_todos_caches(self):
+        """Carrega todos os caches necessários (em paralelo)"""
+        self._executar(self._carregar_todos_caches())
+    
+    def buscar_todos_tickets(self):
+        """Busca TODOS os tickets sem filtro de data"""
+        try:
+            return self._executar(self._buscar_todos_tickets())
+        except PrazoExcedido:
+            raise
+        except Exception as e:
+            print(f"[AVISO] Falha no motor assíncrono, usando modo sequencial: {e}")
+            return self.buscar_todos_tickets_sequencial()
+    
+    def buscar_relacionamentos_tickets(self, ticket_ids=None, estrito=False):
+        """Busca relacionamentos de usuários e grupos para os tickets (todos, se ticket_ids for None)"""
+        if estrito:
+            # Relações que serão gravadas no armazém como base do modo incremental: busca herdada, que interrompe na falha
+            return super().buscar_relacionamentos_tickets(ticket_ids, estrito=True)
+        relacionamentos = self._executar(self._buscar_relacionamentos_tickets(ticket_ids))
+        self.concluir_relacionamentos(relacionamentos)
+        return relacionamentos
+    
+    def coletar_dados_api(self):
+        """Carrega caches, tickets e relacionamentos da API concorrentemente"""
+        # O delta incremental é pequeno e usa os critérios de busca síncronos herdados
+        # (os caches continuam carregados em paralelo)
+        if self.usar_modo_incremental():
+            return super().coletar_dados_api()
+        try:
+            todos_tickets, relacionamentos = self._executar(self._coletar_dados_api())
+            self.concluir_relacionamentos(relacionamentos)
+            return todos_tickets, relacionamentos
+        except PrazoExcedido:
+            raise
+        except Exception as e:
+            print(f"[AVISO] Falha na coleta assíncrona, repetindo etapa a etapa: {e}")
+            return super().coletar_dados_api()
+    
+    def usar_pipeline_streaming(self):
+        """O motor assíncrono sempre usa a coleta concorrente de caches, tickets e relacionamentos"""
+        return False
+    
+    def fechar(self):
+        """Encerra a sessão, fecha os bancos locais, o pool de conexões e o event loop"""
+        super().fechar()
+        self.loop.close()
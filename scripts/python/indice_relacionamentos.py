@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice compacto dos relacionamentos dos tickets GLPI (requerentes, técnicos e grupos)
+Guarda todos os vínculos de cada ticket em arrays de inteiros; os nomes só são resolvidos na saída
+"""
+
+from array import array
+from bisect import bisect_left
+
+PAPEIS = ('requerente', 'tecnico', 'grupo')
+
+# Separador usado no CSV quando um ticket tem mais de um requerente, técnico ou grupo
+SEPARADOR_MULTIPLOS = '; '
+
+
+class IndiceRelacionamentos:
+    """Índice ticket -> IDs por papel, no formato de linhas comprimidas (tickets, offsets, valores)"""
+    
+    def __init__(self):
+        """Cria o índice vazio"""
+        # Relações recebidas e ainda não indexadas: arrays paralelos (ticket, id)
+        self.pendentes = {papel: (array('i'), array('i')) for papel in PAPEIS}
+        
+        # Índice compacto: os IDs do ticket tickets[i] estão em valores[offsets[i]:offsets[i + 1]]
+        self.tickets = {papel: array('i') for papel in PAPEIS}
+        self.offsets = {papel: array('i', [0]) for papel in PAPEIS}
+        self.valores = {papel: array('i') for papel in PAPEIS}
+    
+    def adicionar(self, papel, ticket_id, valor_id):
+        """Registra um vínculo ticket -> usuário/grupo no papel informado"""
+        tickets_pendentes, valores_pendentes = self.pendentes[papel]
+        tickets_pendentes.append(int(ticket_id))
+        valores_pendentes.append(int(valor_id))
+    
+    def _compactar(self, papel):
+        """Incorpora as relações pendentes ao índice compacto do papel"""
+        tickets_pendentes, valores_pendentes = self.pendentes[papel]
+        if not tickets_pendentes:
+            return
+        
+        # Só as relações novas são ordenadas; a ordenação estável mantém, dentro de cada ticket, a ordem de chegada
+        ordem = sorted(range(len(tickets_pendentes)), key=tickets_pendentes.__getitem__)
+        
+        tickets, offsets, valores = self.tickets[papel], self.offsets[papel], self.valores[papel]
+        novos_tickets = array('i')
+        novos_offsets = array('i', [0])
+        novos_valores = array('i')
+        
+        def copiar_bloco(inicio, fim):
+            """Copia sem alteração os tickets inicio a fim - 1 do índice atual"""
+            if inicio == fim:
+                return
+            deslocamento = len(novos_valores) - offsets[inicio]
+            novos_tickets.extend(tickets[inicio:fim])
+            novos_valores.extend(valores[offsets[inicio]:offsets[fim]])
+            novos_offsets.extend(offset + deslocamento for offset in offsets[inicio + 1:fim + 1])
+        
+        # Intercalação linear: os tickets atuais sem relações novas são copiados em bloco
+        posicao = 0
+        j = 0
+        while j < len(ordem):
+            ticket_id = tickets_pendentes[ordem[j]]
+            fim = bisect_left(tickets, ticket_id, posicao)
+            copiar_bloco(posicao, fim)
+            posicao = fim
+            
+            # Vínculos atuais do ticket seguidos dos novos; relações repetidas são gravadas uma única vez
+            vinculos = []
+            if posicao < len(tickets) and tickets[posicao] == ticket_id:
+                vinculos.extend(valores[offsets[posicao]:offsets[posicao + 1]])
+                posicao += 1
+            vistos = set(vinculos)
+            while j < len(ordem) and tickets_pendentes[ordem[j]] == ticket_id:
+                valor_id = valores_pendentes[ordem[j]]
+                if valor_id not in vistos:
+                    vistos.add(valor_id)
+                    vinculos.append(valor_id)
+                j += 1
+            
+            novos_tickets.append(ticket_id)
+            novos_valores.extend(vinculos)
+            novos_offsets.append(len(novos_valores))
+        
+        copiar_bloco(posicao, len(tickets))
+        
+        self.tickets[papel] = novos_tickets
+        self.offsets[papel] = novos_offsets
+        self.valores[papel] = novos_valores
+        self.pendentes[papel] = (array('i'), array('i'))
+    
+    def ids(self, papel, ticket_id):
+        """IDs vinculados ao ticket no papel, na ordem em que as relações foram recebidas"""
+        self._compactar(papel)
+        tickets = self.tickets[papel]
+        ticket_id = int(ticket_id)
+        
+        posicao = bisect_left(tickets, ticket_id)
+        if posicao == len(tickets) or tickets[posicao] != ticket_id:
+            return ()
+        
+        offsets = self.offsets[papel]
+        return self.valores[papel][offsets[posicao]:offsets[posicao + 1]]
+    
+    def ids_distintos(self, papel):
+        """Conjunto de IDs distintos citados no papel (ex.: usuários a resolver)"""
+        self._compactar(papel)
+        return set(self.valores[papel])
+    
+    def __len__(self):
+        """Quantidade de tickets com ao menos um vínculo"""
+        for papel in PAPEIS:
+            self._compactar(papel)
+        return len(set().union(*(self.tickets[papel] for papel in PAPEIS)))
+    
+    def tamanho_bytes(self):
+        """Memória ocupada pelos arrays do índice"""
+        for papel in PAPEIS:
+            self._compactar(papel)
+        return sum(
+            arrays[papel].itemsize * len(arrays[papel])
+            for arrays in (self.tickets, self.offsets, self.valores)
+            for papel in PAPEIS
+        )
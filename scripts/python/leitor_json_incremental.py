@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Decodificação incremental de arrays JSON (respostas paginadas da API do GLPI)
+Entrega os itens do array um a um, à medida que os bytes chegam, sem materializar a resposta inteira
+"""
+
+import codecs
+import json
+
+
+class DecodificadorArrayJSON:
+    """Decodificador incremental de um array JSON de nível superior"""
+    
+    def __init__(self, encoding='utf-8'):
+        """Inicializa o decodificador vazio"""
+        self.decoder = json.JSONDecoder()
+        self.decodificador_texto = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self.buffer = ''
+        self.posicao = 0
+        self.iniciado = False
+        self.finalizado = False
+    
+    def _pular_espacos(self):
+        """Avança a posição sobre espaços em branco"""
+        buffer = self.buffer
+        posicao = self.posicao
+        while posicao < len(buffer) and buffer[posicao] in ' \t\r\n':
+            posicao += 1
+        self.posicao = posicao
+    
+    def alimentar(self, bloco, final=False):
+        """Recebe um bloco de bytes e retorna a lista de itens completos decodificados"""
+        self.buffer += self.decodificador_texto.decode(bloco, final=final)
+        itens = []
+        
+        while not self.finalizado:
+            self._pular_espacos()
+            if self.posicao >= len(self.buffer):
+                break
+            
+            caractere = self.buffer[self.posicao]
+            
+            if not self.iniciado:
+                if caractere != '[':
+                    raise ValueError(f"Resposta não é um array JSON (início: {self.buffer[self.posicao:self.posicao + 80]!r})")
+                self.iniciado = True
+                self.posicao += 1
+                continue
+            
+            if caractere == ',':
+                self.posicao += 1
+                continue
+            
+            if caractere == ']':
+                self.finalizado = True
+                self.posicao += 1
+                break
+            
+            try:
+                item, fim = self.decoder.raw_decode(self.buffer, self.posicao)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break  # Item incompleto: aguarda o próximo bloco
+            
+            # Números e literais no fim do buffer podem estar truncados
+            if fim >= len(self.buffer) and not final and not isinstance(item, (dict, list, str)):
+                break
+            
+            itens.append(item)
+            self.posicao = fim
+        
+        # Descarta o trecho já consumido para manter o buffer pequeno
+        if self.posicao > 65536 or self.posicao == len(self.buffer):
+            self.buffer = self.buffer[self.posicao:]
+            self.posicao = 0
+        
+        if final and not self.finalizado:
+            raise ValueError("Array JSON incompleto")
+        
+        return itens
+
+
+def iterar_itens_array_json(blocos, encoding='utf-8'):
+    """Itera sobre os itens de um array JSON a partir de um iterável de blocos de bytes"""
+    decodificador = DecodificadorArrayJSON(encoding)
+    
+    for bloco in blocos:
+        if bloco:
+            yield from decodificador.alimentar(bloco)
+    
+    yield from decodificador.alimentar(b'', final=True)
@@ -14,18 +14,39 @@ Fluxo de Execução:
 3. Extração e análise de métricas (extrair_metricas_tickets_otimizado.py)
 4. Validação final dos resultados
 
+Modos de execução:
+- subprocesso (padrão): cada script roda em um interpretador separado (isolamento
+  total), com timeout por etapa
+- processo: extrator e analisador são importados e executados neste
+  interpretador, e os tickets extraídos chegam ao analisador em memória; sem
+  timeout rígido por etapa: a extração verifica o prazo da etapa entre páginas
+  e lotes, e cada requisição à API tem timeout próprio
+
 Autor: Sistema de Análise GLPI
 Data: 2024
 """
 
 import os
 import sys
+import argparse
+import contextlib
 import logging
+import sqlite3
 import subprocess
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Tuple, Optional, Dict, Any
+from typing import Tuple, Optional, Dict, Any, Callable
+
+from saida_subprocesso import SaidaPorLinha, executar_com_saida_continua
+
+# Modos de execução das etapas: no próprio interpretador ou em interpretadores separados
+MODOS_EXECUCAO = ('processo', 'subprocesso')
+MODO_EXECUCAO_PADRAO = 'subprocesso'
+
+# Tempo máximo de cada etapa, em segundos (no modo processo, prazo verificado pelo extrator)
+TIMEOUT_EXTRACAO = 7200
+TIMEOUT_ANALISE = 3600
 
 
 class PipelineOrchestrator:
@@ -37,12 +58,36 @@ class PipelineOrchestrator:
     das operações.
     """
     
-    def __init__(self):
-        """Inicializa o orquestrador do pipeline."""
+    def __init__(self, modo_execucao: str = MODO_EXECUCAO_PADRAO, residente: bool = False):
+        """
+        Inicializa o orquestrador do pipeline.
+        
+        Args:
+            modo_execucao: 'processo' (etapas neste interpretador, dados em memória)
+                ou 'subprocesso' (um interpretador por script)
+            residente: Mantém o extrator entre execuções (sessão e caches em memória); cada
+                execução aplica apenas o delta ao armazém (requer modo 'processo')
+        """
+        if modo_execucao not in MODOS_EXECUCAO:
+            raise ValueError(f"Modo de execução inválido: {modo_execucao} (use {' ou '.join(MODOS_EXECUCAO)})")
+        if residente and modo_execucao != 'processo':
+            raise ValueError("O modo residente requer o modo de execução 'processo'")
+        
         self.setup_logging()
         self.script_dir = Path(__file__).parent
         self.dados_dir = self.script_dir.parent / "dados"
         self.logger = logging.getLogger(__name__)
+        self.modo_execucao = modo_execucao
+        
+        # Tickets dos últimos 6 meses entregues pelo extrator ao analisador no modo em processo
+        self.tickets_em_memoria = None
+        
+        # Instante (time.monotonic) limite da etapa em execução no modo em processo
+        self.prazo_etapa = None
+        
+        # Extrator reaproveitado entre execuções no modo residente (criado na primeira extração)
+        self.residente = residente
+        self.extrator = None
         
         # Caminhos dos scripts
         self.script_extracao = self.script_dir / "extrair_todos_tickets.py"
@@ -52,10 +97,18 @@ class PipelineOrchestrator:
         self.dir_tickets_completos = self.dados_dir / "tickets_completos"
         self.dir_tickets_6_meses = self.dados_dir / "tickets_6_meses"
         self.dir_metricas_csv = self.dados_dir / "metricas_csv"
+        self.arquivo_armazem = self.dados_dir / "tickets.sqlite"
         
         self.logger.info("=" * 80)
         self.logger.info("INICIANDO PIPELINE DE EXTRAÇÃO E ANÁLISE DE DADOS GLPI")
         self.logger.info("=" * 80)
+        self.logger.info(f"Modo de execução: {self.modo_execucao}")
+        if self.modo_execucao == 'processo':
+            self.logger.warning(
+                f"[AVISO] Modo 'processo'{' residente' if residente else ''}: as etapas não têm timeout rígido. "
+                f"A extração é interrompida ao exceder {TIMEOUT_EXTRACAO}s apenas entre páginas e lotes da API; "
+                f"a análise não tem prazo"
+            )
         
     def setup_logging(self) -> None:
         """Configura o sistema de logging do pipeline."""
@@ -108,7 +161,7 @@ class PipelineOrchestrator:
         
     def executar_script(self, script_path: Path, descricao: str, timeout: int = 3600) -> Tuple[bool, str]:
         """
-        Executa um script Python e monitora sua execução.
+        Executa um script Python e monitora sua execução, registrando a saída no log linha a linha.
         
         Args:
             script_path: Caminho para o script a ser executado
@@ -124,33 +177,28 @@ class PipelineOrchestrator:
         inicio = time.time()
         
         try:
-            # Executar o script usando subprocess
-            resultado = subprocess.run(
+            # Executar o script usando subprocess: cada linha da saída vai para o log assim que é produzida,
+            # e apenas as últimas ficam em memória para o relatório de erro
+            codigo, linhas_finais = executar_com_saida_continua(
                 [sys.executable, str(script_path)],
                 cwd=str(self.script_dir),
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                encoding='utf-8',
-                errors='replace'
+                ao_receber_linha=lambda linha: self.logger.info(f"    {linha}"),
+                timeout=timeout
             )
             
             fim = time.time()
             duracao = fim - inicio
+            saida_final = '\n'.join(linhas_finais)
             
-            if resultado.returncode == 0:
+            if codigo == 0:
                 self.logger.info(f"[OK] {descricao} executado com sucesso")
                 self.logger.info(f"[OK] Tempo de execução: {duracao:.2f} segundos")
-                if resultado.stdout:
-                    self.logger.info(f"Saída do script:\n{resultado.stdout}")
-                return True, resultado.stdout
+                return True, saida_final
             else:
-                self.logger.error(f"[ERRO] {descricao} falhou com código: {resultado.returncode}")
-                if resultado.stderr:
-                    self.logger.error(f"Erro detalhado:\n{resultado.stderr}")
-                if resultado.stdout:
-                    self.logger.error(f"Saída do script:\n{resultado.stdout}")
-                return False, resultado.stderr
+                self.logger.error(f"[ERRO] {descricao} falhou com código: {codigo}")
+                if linhas_finais:
+                    self.logger.error(f"Últimas {len(linhas_finais)} linhas da saída:\n{saida_final}")
+                return False, saida_final
                 
         except subprocess.TimeoutExpired:
             self.logger.error(f"[ERRO] {descricao} excedeu o timeout de {timeout} segundos")
@@ -160,6 +208,124 @@ class PipelineOrchestrator:
             self.logger.error(f"[ERRO] Erro inesperado ao executar {descricao}: {str(e)}")
             return False, str(e)
     
+    def executar_em_processo(self, etapa: Callable[[], bool], descricao: str,
+                             timeout: int = 3600) -> Tuple[bool, str]:
+        """
+        Executa uma etapa neste interpretador, com o diretório dos scripts como diretório de trabalho.
+        
+        Os módulos já importados (pandas, requests) são reaproveitados. A etapa não pode ser
+        interrompida de fora como um subprocesso: o prazo (prazo_etapa) é verificado pela própria
+        etapa entre páginas e lotes da API, e cada requisição tem timeout próprio (TIMEOUT_REQUISICOES).
+        Como no modo subprocesso, a saída da etapa é registrada no log linha a linha e apenas
+        as últimas linhas ficam em memória para o relatório de erro.
+        
+        Args:
+            etapa: Função da etapa, que retorna True em caso de sucesso
+            descricao: Descrição da etapa para logs
+            timeout: Prazo da etapa em segundos (padrão: 1 hora)
+            
+        Returns:
+            Tuple[bool, str]: (sucesso, mensagem_de_saida)
+        """
+        self.logger.info(f"Iniciando execução em processo: {descricao}")
+        
+        inicio = time.time()
+        self.prazo_etapa = time.monotonic() + timeout
+        diretorio_original = os.getcwd()
+        saida = SaidaPorLinha(lambda linha: self.logger.info(f"    {linha}"))
+        
+        try:
+            # Os scripts usam caminhos relativos à sua pasta (../dados)
+            os.chdir(self.script_dir)
+            with saida, contextlib.redirect_stdout(saida):
+                sucesso = etapa()
+            duracao = time.time() - inicio
+            linhas_finais = saida.linhas_finais()
+            saida_final = '\n'.join(linhas_finais)
+            
+            if sucesso:
+                self.logger.info(f"[OK] {descricao} executado com sucesso")
+                self.logger.info(f"[OK] Tempo de execução: {duracao:.2f} segundos")
+                return True, saida_final
+            
+            self.logger.error(f"[ERRO] {descricao} falhou")
+            if linhas_finais:
+                self.logger.error(f"Últimas {len(linhas_finais)} linhas da saída:\n{saida_final}")
+            return False, saida_final or f"{descricao} falhou"
+        
+        except SystemExit as e:
+            # Os scripts encerram o processo em erros de configuração (ex.: config.py ausente)
+            self.logger.error(f"[ERRO] {descricao} encerrado com código: {e.code}")
+            return False, '\n'.join(saida.linhas_finais() + [f"Encerrado com código {e.code}"])
+            
+        except Exception as e:
+            self.logger.error(f"[ERRO] Erro inesperado ao executar {descricao}: {str(e)}")
+            return False, '\n'.join(saida.linhas_finais() + [str(e)])
+        
+        finally:
+            os.chdir(diretorio_original)
+    
+    def extrair_em_processo(self) -> bool:
+        """
+        Extrai os tickets com o extrator importado, guardando em memória as colunas usadas pelo analisador.
+        
+        Returns:
+            bool: True se a extração foi concluída com sucesso
+        """
+        # Importados sob demanda: o modo subprocesso não carrega pandas/requests neste interpretador
+        from extrair_metricas_tickets_otimizado import ESQUEMA_COLUNAS
+        from extrair_todos_tickets import criar_extrator, criar_parser
+        
+        if self.residente:
+            # Sessão e caches ficam quentes entre as execuções; as métricas
+            # vêm do armazém, pelo estado incremental do analisador, em vez da cópia em memória do período.
+            # Com o armazém, os CSV/Parquet completos não são regravados: cada execução grava só o delta nele
+            if self.extrator is None:
+                self.extrator = criar_extrator(criar_parser().parse_args([]))
+                self.extrator.modo_incremental = True
+                self.extrator.manter_sessao = True
+                self.extrator.salvar_snapshots = self.extrator.armazem is None
+            self.extrator.prazo = self.prazo_etapa
+            return self.extrator.extrair_todos_tickets()
+        
+        extrator = criar_extrator(criar_parser().parse_args([]))
+        extrator.prazo = self.prazo_etapa
+        extrator.coletar_em_memoria(ESQUEMA_COLUNAS)
+        try:
+            sucesso = extrator.extrair_todos_tickets()
+        finally:
+            extrator.fechar()
+        self.tickets_em_memoria = extrator.tickets_em_memoria if sucesso else None
+        return sucesso
+    
+    def encerrar(self) -> None:
+        """Encerra a sessão do extrator residente e fecha seus bancos locais."""
+        if self.extrator is None:
+            return
+        
+        self.extrator.fechar()
+        self.extrator = None
+    
+    def analisar_em_processo(self) -> bool:
+        """
+        Analisa as métricas com o analisador importado, a partir dos tickets recebidos do extrator.
+        
+        Sem tickets em memória (ex.: extração feita em outro processo), o analisador lê
+        a fonte de dados padrão do disco.
+        
+        Returns:
+            bool: True se a análise foi concluída com sucesso
+        """
+        from extrair_metricas_tickets_otimizado import AnalisadorMetricasOtimizado
+        
+        analisador = AnalisadorMetricasOtimizado()
+        if self.tickets_em_memoria is None:
+            analisador.executar(analisador.obter_arquivo_fixo())
+        else:
+            analisador.executar("tickets extraídos (memória)", self.tickets_em_memoria)
+        self.tickets_em_memoria = None
+        return True
+    
     def verificar_dados_brutos(self) -> bool:
         """
         Verifica se os dados brutos foram gerados corretamente após a extração.
@@ -169,6 +335,26 @@ class PipelineOrchestrator:
         """
         self.logger.info("ETAPA 3: Verificando integridade dos dados brutos gerados...")
         
+        # O armazém de tickets é a fonte principal; os arquivos com timestamp são exportações opcionais
+        armazem_valido = False
+        if self.arquivo_armazem.exists():
+            try:
+                conexao = sqlite3.connect(self.arquivo_armazem)
+                try:
+                    total_tickets = conexao.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+                finally:
+                    conexao.close()
+            except sqlite3.Error as e:
+                self.logger.error(f"[ERRO] Erro ao ler armazém de tickets {self.arquivo_armazem}: {str(e)}")
+                return False
+            
+            if not total_tickets:
+                self.logger.error("[ERRO] Armazém de tickets vazio")
+                return False
+            
+            armazem_valido = True
+            self.logger.info(f"[OK] Armazém de tickets: {total_tickets} registros")
+        
         # Verificar se os diretórios foram criados
         diretorios_esperados = [
             (self.dir_tickets_completos, "Tickets completos"),
@@ -176,12 +362,16 @@ class PipelineOrchestrator:
         ]
         
         for diretorio, descricao in diretorios_esperados:
+            arquivos = list(diretorio.glob("*.csv")) if diretorio.exists() else []
+            if not arquivos and armazem_valido:
+                self.logger.info(f"Sem arquivos CSV em {descricao} (dados disponíveis no armazém)")
+                continue
+            
             if not diretorio.exists():
                 self.logger.error(f"[ERRO] Diretório não encontrado: {descricao} ({diretorio})")
                 return False
             
             # Verificar se há arquivos no diretório
-            arquivos = list(diretorio.glob("*.csv"))
             if not arquivos:
                 self.logger.error(f"[ERRO] Nenhum arquivo CSV encontrado em: {descricao}")
                 return False
@@ -251,11 +441,18 @@ class PipelineOrchestrator:
             
             # ETAPA 2: Executar extração de todos os tickets
             self.logger.info("ETAPA 2: Executando extração de todos os tickets...")
-            sucesso_extracao, saida_extracao = self.executar_script(
-                self.script_extracao,
-                "Extração de todos os tickets",
-                timeout=7200  # 2 horas para extração
-            )
+            if self.modo_execucao == 'processo':
+                sucesso_extracao, saida_extracao = self.executar_em_processo(
+                    self.extrair_em_processo,
+                    "Extração de todos os tickets",
+                    timeout=TIMEOUT_EXTRACAO
+                )
+            else:
+                sucesso_extracao, saida_extracao = self.executar_script(
+                    self.script_extracao,
+                    "Extração de todos os tickets",
+                    timeout=TIMEOUT_EXTRACAO
+                )
             
             if not sucesso_extracao:
                 self.logger.error("[ERRO] Falha na extração de tickets. Abortando pipeline.")
@@ -268,11 +465,18 @@ class PipelineOrchestrator:
             
             # ETAPA 4: Executar análise de métricas
             self.logger.info("ETAPA 4: Executando análise de métricas...")
-            sucesso_metricas, saida_metricas = self.executar_script(
-                self.script_metricas,
-                "Análise de métricas de tickets",
-                timeout=3600  # 1 hora para análise
-            )
+            if self.modo_execucao == 'processo':
+                sucesso_metricas, saida_metricas = self.executar_em_processo(
+                    self.analisar_em_processo,
+                    "Análise de métricas de tickets",
+                    timeout=TIMEOUT_ANALISE
+                )
+            else:
+                sucesso_metricas, saida_metricas = self.executar_script(
+                    self.script_metricas,
+                    "Análise de métricas de tickets",
+                    timeout=TIMEOUT_ANALISE
+                )
             
             if not sucesso_metricas:
                 self.logger.error("[ERRO] Falha na análise de métricas. Pipeline parcialmente concluído.")
@@ -312,7 +516,8 @@ class PipelineOrchestrator:
                 "dados": str(self.dados_dir),
                 "tickets_completos": str(self.dir_tickets_completos),
                 "tickets_6_meses": str(self.dir_tickets_6_meses),
-                "metricas_csv": str(self.dir_metricas_csv)
+                "metricas_csv": str(self.dir_metricas_csv),
+                "armazem": str(self.arquivo_armazem)
             },
             "arquivos_gerados": {}
         }
@@ -340,6 +545,19 @@ class PipelineOrchestrator:
 
 def main():
     """Função principal do pipeline."""
+    # Modo padrão de config.py (MODO_PIPELINE), quando disponível
+    try:
+        import config
+        modo_padrao = getattr(config, 'MODO_PIPELINE', MODO_EXECUCAO_PADRAO)
+    except ImportError:
+        modo_padrao = MODO_EXECUCAO_PADRAO
+    
+    parser = argparse.ArgumentParser(description="Pipeline de extração e análise de dados GLPI")
+    parser.add_argument('--modo', choices=MODOS_EXECUCAO, default=modo_padrao,
+                        help="subprocesso: um interpretador por script, com timeout por etapa (padrão); "
+                             "processo: etapas neste interpretador, com os dados em memória")
+    args = parser.parse_args()
+    
     print("=" * 80)
     print("PIPELINE DE EXTRAÇÃO E ANÁLISE DE DADOS GLPI")
     print("=" * 80)
@@ -347,7 +565,7 @@ def main():
     print()
     
     # Criar e executar o orquestrador
-    orquestrador = PipelineOrchestrator()
+    orquestrador = PipelineOrchestrator(args.modo)
     
     try:
         # Executar pipeline
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Saída colunar (Parquet) dos tickets GLPI, gravada junto com os CSVs
+Colunas tipadas: categorias para status/entidade/categoria/grupo/pessoas, timestamps nativos para as datas
+Requer o pacote pyarrow (opcional: sem ele, apenas os CSVs são gerados)
+"""
+
+import os
+
+from datas_glpi import FORMATOS_CSV
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Linhas acumuladas antes de gravar cada row group
+LINHAS_POR_GRUPO = 50000
+
+COLUNAS_CATEGORICAS = ['Status', 'Categoria', 'Entidade', 'Requerente', 'Técnico', 'Grupo']
+COLUNAS_DATA = ['Data Criação', 'Data Modificação', 'Data Solução', 'Data Fechamento']
+COLUNAS_INTEIRAS = ['ID', 'Prioridade', 'Urgência', 'Impacto', 'Tempo Solução (min)', 'Tempo Fechamento (min)',
+                    'Tipo', 'Localização', 'Validação']
+COLUNAS_DECIMAIS = ['Satisfação']
+COLUNAS_TEXTO = ['Título', 'Descrição']
+
+# Ordem das colunas igual à do CSV
+ORDEM_COLUNAS = ['ID', 'Título', 'Descrição', 'Status', 'Prioridade', 'Urgência', 'Impacto', 'Categoria', 'Entidade',
+                 'Requerente', 'Técnico', 'Grupo', 'Data Criação', 'Data Modificação', 'Data Solução',
+                 'Data Fechamento', 'Tempo Solução (min)', 'Tempo Fechamento (min)', 'Satisfação', 'Tipo',
+                 'Localização', 'Validação']
+
+
+def pyarrow_disponivel():
+    """Indica se o pacote pyarrow está instalado"""
+    return pa is not None
+
+
+def colunas_arquivo_parquet(arquivo):
+    """Nomes das colunas de um arquivo Parquet, lidos apenas dos metadados"""
+    if pa is None:
+        raise ImportError("Leitura de Parquet requer o pacote pyarrow (pip install pyarrow)")
+    return pq.read_schema(arquivo).names
+
+
+def ler_blocos_parquet(arquivo, colunas=None, tamanho_bloco=LINHAS_POR_GRUPO):
+    """Lê um arquivo Parquet em DataFrames de até tamanho_bloco linhas, sem carregá-lo inteiro"""
+    if pa is None:
+        raise ImportError("Leitura de Parquet requer o pacote pyarrow (pip install pyarrow)")
+    for lote in pq.ParquetFile(arquivo).iter_batches(batch_size=tamanho_bloco, columns=colunas):
+        yield lote.to_pandas()
+
+
+def esquema_tickets():
+    """Esquema Arrow das colunas dos tickets"""
+    tipos = {}
+    for coluna in COLUNAS_CATEGORICAS:
+        tipos[coluna] = pa.dictionary(pa.int32(), pa.string())
+    for coluna in COLUNAS_DATA:
+        tipos[coluna] = pa.timestamp('s')
+    for coluna in COLUNAS_INTEIRAS:
+        tipos[coluna] = pa.int64()
+    for coluna in COLUNAS_DECIMAIS:
+        tipos[coluna] = pa.float64()
+    for coluna in COLUNAS_TEXTO:
+        tipos[coluna] = pa.string()
+    return pa.schema([(coluna, tipos[coluna]) for coluna in ORDEM_COLUNAS])
+
+
+def _numero(valor, conversor):
+    """Converte um valor da API em número (None se vazio ou inválido)"""
+    if valor is None or valor == '':
+        return None
+    try:
+        return conversor(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+class EscritorParquetIncremental:
+    """Grava linhas de tickets em um arquivo Parquet, em row groups, publicando-o apenas ao final"""
+    
+    def __init__(self, nome_arquivo, descricao="dados", formato_datas='br'):
+        """Prepara o arquivo Parquet temporário"""
+        if pa is None:
+            raise ImportError("Saída Parquet requer o pacote pyarrow (pip install pyarrow)")
+        
+        self.nome_arquivo = nome_arquivo
+        self.descricao = descricao
+        self.arquivo_parcial = f"{nome_arquivo}.parcial"
+        self.formato_data_hora, self.formato_data = FORMATOS_CSV[formato_datas]
+        self.esquema = esquema_tickets()
+        self.total = 0
+        self.buffer = {coluna: [] for coluna in ORDEM_COLUNAS}
+        
+        os.makedirs(os.path.dirname(nome_arquivo), exist_ok=True)
+        self.writer = pq.ParquetWriter(self.arquivo_parcial, self.esquema, compression='snappy')
+    
+    def escrever(self, linha):
+        """Acumula uma linha formatada (mesmas chaves do CSV)"""
+        for coluna, valores in self.buffer.items():
+            valores.append(linha.get(coluna))
+        self.total += 1
+        
+        if len(self.buffer['ID']) >= LINHAS_POR_GRUPO:
+            self._gravar_grupo()
+    
+    def _gravar_grupo(self):
+        """Converte o buffer em colunas tipadas e grava um row group"""
+        colunas = []
+        for campo in self.esquema:
+            valores = self.buffer[campo.name]
+            
+            if campo.name in COLUNAS_DATA:
+                # Conversão vetorizada de todo o bloco, com o formato explícito do CSV
+                textos = pa.array([valor or None for valor in valores], type=pa.string())
+                convertidas = pc.strptime(textos, format=self.formato_data_hora, unit='s', error_is_null=True)
+                
+                # Valores gravados apenas com a data (sem hora) são convertidos à parte
+                somente_data = pc.and_(pc.is_null(convertidas), pc.is_valid(textos))
+                if pc.any(somente_data).as_py():
+                    datas = pc.strptime(textos, format=self.formato_data, unit='s', error_is_null=True)
+                    convertidas = pc.if_else(somente_data, datas, convertidas)
+                colunas.append(convertidas)
+            elif campo.name in COLUNAS_INTEIRAS:
+                colunas.append(pa.array([_numero(valor, int) for valor in valores], type=campo.type))
+            elif campo.name in COLUNAS_DECIMAIS:
+                colunas.append(pa.array([_numero(valor, float) for valor in valores], type=campo.type))
+            else:
+                colunas.append(pa.array([None if valor is None else str(valor) for valor in valores], type=campo.type))
+        
+        self.writer.write_table(pa.Table.from_arrays(colunas, schema=self.esquema))
+        self.buffer = {coluna: [] for coluna in ORDEM_COLUNAS}
+    
+    def fechar(self, sucesso=True):
+        """Grava o restante e publica o arquivo no destino final (ou o descarta em caso de falha)"""
+        try:
+            if sucesso and (self.buffer['ID'] or not self.total):
+                self._gravar_grupo()
+            self.writer.close()
+            
+            if not sucesso:
+                self._remover_parcial()
+                return False
+            
+            os.replace(self.arquivo_parcial, self.nome_arquivo)
+            print(f"[OK] Arquivo Parquet {self.descricao} salvo com sucesso! ({self.total:,} tickets)")
+            return True
+        
+        except Exception as e:
+            print(f"[AVISO] Erro ao salvar Parquet {self.descricao}: {e}")
+            self._remover_parcial()
+            return False
+    
+    def _remover_parcial(self):
+        """Remove o arquivo temporário, se existir"""
+        try:
+            os.remove(self.arquivo_parcial)
+        except OSError:
+            pass
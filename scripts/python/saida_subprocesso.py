@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Execução de scripts em subprocesso com a saída lida linha a linha, à medida que é produzida
+Apenas as últimas linhas ficam em memória (para os relatórios de erro), qualquer que seja o volume da saída
+Para etapas executadas no próprio processo, SaidaPorLinha entrega os prints da mesma forma e guarda as mesmas linhas finais
+"""
+
+import io
+import os
+import subprocess
+import threading
+from collections import deque
+
+# Linhas finais da saída guardadas para os relatórios de erro
+LINHAS_FINAIS_PADRAO = 50
+
+
+def executar_com_saida_continua(comando, cwd, ao_receber_linha, timeout=None, linhas_finais=LINHAS_FINAIS_PADRAO):
+    """Executa o comando repassando cada linha da saída (stdout e stderr juntos) a ao_receber_linha; retorna (código, últimas linhas)"""
+    # Sem buffer no filho: cada print chega assim que é escrito, e sempre em UTF-8
+    ambiente = dict(os.environ, PYTHONUNBUFFERED='1', PYTHONIOENCODING='utf-8')
+    finais = deque(maxlen=linhas_finais)
+    
+    processo = subprocess.Popen(comando, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                encoding='utf-8', errors='replace', env=ambiente)
+    
+    # O timeout encerra o processo; a leitura termina quando a saída é fechada
+    expirado = threading.Event()
+    temporizador = None
+    if timeout:
+        temporizador = threading.Timer(timeout, lambda: (expirado.set(), processo.kill()))
+        temporizador.daemon = True
+        temporizador.start()
+    
+    try:
+        with processo.stdout:
+            for linha in processo.stdout:
+                linha = linha.rstrip('\r\n')
+                finais.append(linha)
+                ao_receber_linha(linha)
+        codigo = processo.wait()
+    except BaseException:
+        processo.kill()
+        processo.wait()
+        raise
+    finally:
+        if temporizador is not None:
+            temporizador.cancel()
+    
+    if expirado.is_set():
+        raise subprocess.TimeoutExpired(comando, timeout, output='\n'.join(finais))
+    return codigo, list(finais)
+
+
+class SaidaPorLinha(io.TextIOBase):
+    """Saída de texto (para contextlib.redirect_stdout) que repassa cada linha completa a ao_receber_linha"""
+    
+    encoding = 'utf-8'
+    
+    def __init__(self, ao_receber_linha, linhas_finais=LINHAS_FINAIS_PADRAO):
+        """Guarda a função que recebe as linhas e o limite de linhas finais mantidas em memória"""
+        super().__init__()
+        self.ao_receber_linha = ao_receber_linha
+        self.finais = deque(maxlen=linhas_finais)
+        self.pendente = ''
+        self.trava = threading.Lock()
+    
+    def writable(self):
+        """A saída aceita escrita"""
+        return True
+    
+    def write(self, texto):
+        """Repassa as linhas completas; o trecho após a última quebra aguarda a próxima escrita"""
+        with self.trava:
+            linhas = (self.pendente + texto).split('\n')
+            self.pendente = linhas.pop()
+        for linha in linhas:
+            self._repassar(linha)
+        return len(texto)
+    
+    def _repassar(self, linha):
+        """Guarda a linha entre as finais e a entrega a ao_receber_linha"""
+        linha = linha.rstrip('\r')
+        self.finais.append(linha)
+        self.ao_receber_linha(linha)
+    
+    def linhas_finais(self):
+        """Últimas linhas recebidas, da mais antiga para a mais recente"""
+        return list(self.finais)
+    
+    def reconfigure(self, **_):
+        """Sem efeito: o texto já é repassado como str (compatível com sys.stdout.reconfigure)"""
+    
+    def close(self):
+        """Repassa a linha incompleta restante e fecha a saída"""
+        with self.trava:
+            pendente, self.pendente = self.pendente, ''
+        if pendente:
+            self._repassar(pendente)
+        super().close()
@@ -10,6 +10,8 @@ execuções sobrepostas.
 
 Uso:
     python scheduler.py  # Execução única
+    python scheduler.py --concorrencia coalescer  # Se já houver execução, pede uma nova ao final dela
+    python scheduler.py --concorrencia aguardar --espera-maxima 1800  # Aguarda a vez por até 30 minutos
     
 Para automação contínua, use Windows Task Scheduler ou execute
 o script continuous_scheduler.py
@@ -21,25 +23,54 @@ Data: 2024
 import os
 import sys
 import time
-import subprocess
+import argparse
+import threading
 from pathlib import Path
 from datetime import datetime
+from typing import Callable, Optional
+
+from saida_subprocesso import executar_com_saida_continua
+from trava_pipeline import TravaPipeline
+
+# Pedidos recebidos durante uma execução: ignorar, agrupar em uma execução ao final ou aguardar a vez
+POLITICAS_CONCORRENCIA = ('pular', 'coalescer', 'aguardar')
+
+# Intervalo entre as tentativas de obter a trava na política 'aguardar' (segundos)
+INTERVALO_ESPERA_TRAVA = 5
 
 
 class SimplePipelineScheduler:
     """
     Agendador simples para execução do pipeline GLPI.
     
-    Controla a execução do main.py com verificação básica
+    Controla a execução do main.py com uma trava entre processos
     para evitar execuções sobrepostas.
     """
     
-    def __init__(self):
-        """Inicializa o agendador."""
+    def __init__(self, politica_concorrencia: str = 'pular', parada: Optional[threading.Event] = None,
+                 espera_maxima: Optional[float] = None):
+        """
+        Inicializa o agendador.
+        
+        Args:
+            politica_concorrencia: Pedido recebido com outra execução ativa: 'pular' (ignora),
+                'coalescer' (registra e a execução ativa roda mais uma vez ao final, agrupando os pedidos)
+                ou 'aguardar' (espera a trava e executa em seguida)
+            parada: Evento que, sinalizado, interrompe a espera pela trava (ex.: encerramento do
+                agendador contínuo)
+            espera_maxima: Tempo máximo de espera pela trava na política 'aguardar', em segundos
+                (None: sem limite)
+        """
+        if politica_concorrencia not in POLITICAS_CONCORRENCIA:
+            raise ValueError(f"Política de concorrência inválida: {politica_concorrencia}")
         self.script_dir = Path(__file__).parent
         self.lock_file = self.script_dir / "pipeline.lock"
         self.main_script = self.script_dir / "main.py"
         self.log_file = self.script_dir / "scheduler.log"
+        self.politica_concorrencia = politica_concorrencia
+        self.parada = parada or threading.Event()
+        self.espera_maxima = espera_maxima
+        self.trava = TravaPipeline(self.lock_file, registrar=self.log_message)
         
     def log_message(self, message: str) -> None:
         """
@@ -63,71 +94,125 @@ class SimplePipelineScheduler:
     
     def is_pipeline_running(self) -> bool:
         """
-        Verifica se o pipeline já está em execução.
+        Verifica se o pipeline já está em execução (trava de um processo ativo).
         
         Returns:
             bool: True se o pipeline está rodando, False caso contrário
         """
-        if not self.lock_file.exists():
-            return False
-        
-        # Verificar se o lock não é muito antigo (mais de 3 horas)
-        try:
-            lock_age = time.time() - self.lock_file.stat().st_mtime
-            if lock_age > 10800:  # 3 horas em segundos
-                self.log_message("Lock antigo detectado. Removendo...")
-                self.lock_file.unlink()
-                return False
-        except Exception as e:
-            self.log_message(f"Erro ao verificar idade do lock: {e}")
-            return True
-        
-        return True
+        dono = self.trava.dono()
+        return dono is not None and self.trava.dono_ativo(dono)
     
     def create_lock(self) -> bool:
         """
-        Cria arquivo de lock para indicar execução em andamento.
+        Adquire a trava de execução (criação exclusiva do arquivo de lock).
         
         Returns:
-            bool: True se o lock foi criado com sucesso, False caso contrário
+            bool: True se o lock foi adquirido, False se outra execução está ativa ou houve erro
         """
         try:
-            self.lock_file.touch()
-            return True
+            return self.trava.adquirir()
         except Exception as e:
             self.log_message(f"Erro ao criar lock: {e}")
             return False
     
     def remove_lock(self) -> None:
-        """Remove o arquivo de lock."""
+        """Remove o arquivo de lock, se pertencer a esta execução."""
         try:
-            if self.lock_file.exists():
-                self.lock_file.unlink()
+            self.trava.liberar()
         except Exception as e:
             self.log_message(f"Erro ao remover lock: {e}")
     
-    def execute_pipeline(self) -> bool:
+    def aguardar_trava(self) -> bool:
+        """
+        Aguarda o término da execução ativa e adquire a trava.
+        
+        A espera termina sem a trava quando o evento de parada é sinalizado ou quando
+        o tempo máximo de espera se esgota.
+        
+        Returns:
+            bool: True quando a trava é adquirida, False em caso de erro, parada ou tempo esgotado
+        """
+        dono = self.trava.dono()
+        if dono is not None:
+            self.log_message(f"Pipeline em execução ({self.trava.descrever(dono)}). Aguardando término...")
+        limite = None if self.espera_maxima is None else time.monotonic() + self.espera_maxima
+        while True:
+            try:
+                if self.trava.adquirir():
+                    return True
+            except Exception as e:
+                self.log_message(f"Erro ao criar lock: {e}")
+                return False
+            
+            espera = INTERVALO_ESPERA_TRAVA
+            if limite is not None:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self.log_message(f"Tempo máximo de espera pela trava esgotado ({self.espera_maxima:g}s). "
+                                     "Execução cancelada.")
+                    return False
+                espera = min(espera, restante)
+            if self.parada.wait(espera):
+                self.log_message("Espera pela trava interrompida. Execução cancelada.")
+                return False
+    
+    def execute_pipeline(self, executar: Optional[Callable[[], bool]] = None) -> bool:
         """
-        Executa o pipeline principal (main.py).
+        Executa o pipeline principal (main.py), com o controle de execuções sobrepostas.
+        
+        Args:
+            executar: Função que executa o pipeline neste processo (ex.: orquestrador residente);
+                sem ela, main.py é executado em um subprocesso
         
         Returns:
             bool: True se a execução foi bem-sucedida, False caso contrário
         """
         # Verificar se o script principal existe
-        if not self.main_script.exists():
+        if executar is None and not self.main_script.exists():
             self.log_message(f"ERRO: Script principal não encontrado: {self.main_script}")
             return False
         
-        # Verificar se já está executando
-        if self.is_pipeline_running():
-            self.log_message("Pipeline já em execução. Pulando esta execução.")
-            return True
-        
-        # Criar lock
+        # Adquirir a trava; com outra execução ativa, aplicar a política de concorrência
         if not self.create_lock():
-            self.log_message("ERRO: Não foi possível criar arquivo de lock.")
-            return False
+            dono = self.trava.dono()
+            if dono is None:
+                self.log_message("ERRO: Não foi possível criar arquivo de lock.")
+                return False
+            
+            if self.politica_concorrencia == 'pular':
+                self.log_message(f"Pipeline já em execução ({self.trava.descrever(dono)}). Pulando esta execução.")
+                return True
+            
+            if self.politica_concorrencia == 'coalescer':
+                self.trava.marcar_pendente()
+                # A execução ativa pode ter terminado antes do registro: nesse caso, executar aqui
+                if not self.create_lock():
+                    self.log_message(f"Pipeline já em execução ({self.trava.descrever(dono)}). "
+                                     "Pedido registrado para uma nova execução ao final dela.")
+                    return True
+            elif not self.aguardar_trava():
+                return False
         
+        # Com a trava: executar e repetir enquanto houver pedidos registrados durante a execução
+        while True:
+            self.trava.consumir_pendente()
+            sucesso = self._executar_com_trava(executar)
+            
+            # Pedido registrado depois da última verificação: retomar a trava e atendê-lo
+            if not (self.trava.pendente() and self.create_lock()):
+                return sucesso
+            self.log_message("Pedidos recebidos durante a execução. Executando novamente...")
+    
+    def _executar_com_trava(self, executar: Optional[Callable[[], bool]]) -> bool:
+        """
+        Executa o pipeline uma vez, com a trava já adquirida, e libera a trava ao final.
+        
+        Args:
+            executar: Função que executa o pipeline neste processo; sem ela, main.py em subprocesso
+        
+        Returns:
+            bool: True se a execução foi bem-sucedida, False caso contrário
+        """
         try:
             self.log_message("=" * 60)
             self.log_message("INICIANDO EXECUÇÃO DO PIPELINE")
@@ -135,33 +220,35 @@ class SimplePipelineScheduler:
             
             inicio = time.time()
             
-            # Executar main.py
-            resultado = subprocess.run(
+            if executar is not None:
+                # Pipeline no próprio processo: a saída já vai para o console e para pipeline_execution.log
+                sucesso = executar()
+                duracao = time.time() - inicio
+                if sucesso:
+                    self.log_message(f"SUCESSO: Pipeline concluído em {duracao:.2f} segundos")
+                else:
+                    self.log_message(f"ERRO: Pipeline falhou após {duracao:.2f} segundos")
+                return sucesso
+            
+            # Executar main.py: a saída aparece no console linha a linha e já é gravada pelo próprio
+            # main.py em pipeline_execution.log; no log do agendador ficam só as últimas linhas das falhas
+            codigo, linhas_finais = executar_com_saida_continua(
                 [sys.executable, str(self.main_script)],
                 cwd=str(self.script_dir),
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace'
+                ao_receber_linha=lambda linha: print(linha, flush=True)
             )
             
             fim = time.time()
             duracao = fim - inicio
             
-            if resultado.returncode == 0:
+            if codigo == 0:
                 self.log_message(f"SUCESSO: Pipeline concluído em {duracao:.2f} segundos")
-                if resultado.stdout:
-                    self.log_message("Saída do pipeline:")
-                    self.log_message(resultado.stdout)
                 return True
             else:
-                self.log_message(f"ERRO: Pipeline falhou com código {resultado.returncode}")
-                if resultado.stderr:
-                    self.log_message("Erro detalhado:")
-                    self.log_message(resultado.stderr)
-                if resultado.stdout:
-                    self.log_message("Saída do pipeline:")
-                    self.log_message(resultado.stdout)
+                self.log_message(f"ERRO: Pipeline falhou com código {codigo}")
+                if linhas_finais:
+                    self.log_message(f"Últimas {len(linhas_finais)} linhas da saída do pipeline:")
+                    self.log_message('\n'.join(linhas_finais))
                 return False
                 
         except Exception as e:
@@ -186,6 +273,13 @@ class SimplePipelineScheduler:
 
 def main():
     """Função principal do agendador."""
+    parser = argparse.ArgumentParser(description="Agendador simples do pipeline GLPI (execução única)")
+    parser.add_argument('--concorrencia', choices=POLITICAS_CONCORRENCIA, default='pular',
+                        help="Com outra execução ativa: pular, coalescer (uma nova execução ao final dela) ou aguardar")
+    parser.add_argument('--espera-maxima', type=float, default=None,
+                        help="Com --concorrencia aguardar: tempo máximo de espera pela trava, em segundos (padrão: sem limite)")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("AGENDADOR SIMPLES - PIPELINE GLPI")
     print("=" * 60)
@@ -193,7 +287,7 @@ def main():
     print()
     
     # Criar e executar o agendador
-    scheduler = SimplePipelineScheduler()
+    scheduler = SimplePipelineScheduler(politica_concorrencia=args.concorrencia, espera_maxima=args.espera_maxima)
     
     try:
         sucesso = scheduler.run_once()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Trava de Execução do Pipeline GLPI
+==================================
+
+Impede execuções sobrepostas do pipeline entre processos (agendador único,
+agendador contínuo, Agendador de Tarefas do Windows):
+
+- Criação exclusiva do arquivo (O_CREAT | O_EXCL): só um processo obtém a trava
+- O arquivo registra PID, host e início; a data de modificação é o heartbeat,
+  renovado periodicamente enquanto a execução dura
+- Dono encerrado é detectado na hora (PID inexistente no mesmo host) ou pelo
+  heartbeat parado (outro host, PID reaproveitado), e a trava é retomada
+- A remoção de uma trava (abandonada ou liberada) é feita sob uma trava do
+  sistema operacional (flock/msvcrt.locking) sobre um arquivo de guarda, que o
+  sistema libera se o processo morrer: a conferência do dono e a remoção não
+  se intercalam com a de outro processo
+- Pedidos recebidos durante uma execução podem ser registrados em um arquivo
+  de pendência, atendidos por uma única execução ao final da atual
+
+Autor: Sistema de Análise GLPI
+Data: 2024
+"""
+
+import contextlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+# Intervalo de renovação do heartbeat e idade a partir da qual o dono é considerado encerrado (segundos)
+INTERVALO_HEARTBEAT = 30
+VALIDADE_HEARTBEAT = 120
+
+
+def processo_ativo(pid: int) -> bool:
+    """
+    Verifica se um processo existe neste host.
+    
+    Args:
+        pid: Identificador do processo
+    
+    Returns:
+        bool: True se o processo está em execução
+    """
+    if os.name == 'nt':
+        # No Windows, os.kill(pid, 0) encerraria o processo: consulta o código de saída
+        import ctypes
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return ctypes.get_last_error() == 5  # Acesso negado: o processo existe
+        try:
+            codigo = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(codigo))
+            return codigo.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Processo de outro usuário
+    return True
+
+
+class TravaPipeline:
+    """
+    Trava entre processos baseada na criação exclusiva de um arquivo, com PID, host e heartbeat.
+    """
+    
+    def __init__(self, arquivo: Path, registrar: Optional[Callable[[str], None]] = None,
+                 intervalo_heartbeat: float = INTERVALO_HEARTBEAT, validade_heartbeat: float = VALIDADE_HEARTBEAT):
+        """
+        Inicializa a trava (sem adquiri-la).
+        
+        Args:
+            arquivo: Arquivo da trava
+            registrar: Função de log (padrão: print)
+            intervalo_heartbeat: Intervalo de renovação do heartbeat, em segundos
+            validade_heartbeat: Idade do heartbeat a partir da qual o dono é considerado encerrado
+        """
+        self.arquivo = Path(arquivo)
+        self.arquivo_pendente = self.arquivo.with_suffix('.pendente')
+        self.arquivo_guarda = self.arquivo.with_suffix('.guarda')
+        self.registrar = registrar or print
+        self.intervalo_heartbeat = intervalo_heartbeat
+        self.validade_heartbeat = validade_heartbeat
+        self.host = socket.gethostname()
+        
+        # Identificador da posse atual e thread do heartbeat (None quando a trava não é deste objeto)
+        self.token = None
+        self._parar_heartbeat = None
+    
+    def dono(self) -> Optional[dict]:
+        """
+        Lê os dados do dono atual da trava.
+        
+        Returns:
+            Optional[dict]: pid, host, inicio, token e heartbeat (timestamp); None se não houver trava.
+                Travas sem conteúdo legível (em criação ou de versões antigas) trazem apenas o heartbeat
+        """
+        try:
+            heartbeat = os.stat(self.arquivo).st_mtime
+            with open(self.arquivo, 'r', encoding='utf-8') as f:
+                conteudo = f.read()
+        except FileNotFoundError:
+            return None
+        
+        try:
+            dados = json.loads(conteudo)
+            if not isinstance(dados, dict):
+                dados = {}
+        except ValueError:
+            dados = {}
+        dados['heartbeat'] = heartbeat
+        return dados
+    
+    def dono_ativo(self, dono: dict) -> bool:
+        """
+        Verifica se o dono da trava ainda está em execução.
+        
+        Args:
+            dono: Dados lidos por dono()
+        
+        Returns:
+            bool: False se o heartbeat parou ou se o PID não existe mais neste host
+        """
+        if time.time() - dono['heartbeat'] > self.validade_heartbeat:
+            return False
+        if dono.get('host') == self.host and isinstance(dono.get('pid'), int):
+            return processo_ativo(dono['pid'])
+        return True
+    
+    def descrever(self, dono: dict) -> str:
+        """
+        Descreve o dono da trava para os logs.
+        
+        Args:
+            dono: Dados lidos por dono()
+        
+        Returns:
+            str: PID, host e início da execução
+        """
+        if 'pid' not in dono:
+            return "dono desconhecido"
+        return f"PID {dono['pid']} em {dono.get('host')}, desde {dono.get('inicio')}"
+    
+    def adquirir(self) -> bool:
+        """
+        Tenta adquirir a trava, retomando-a se o dono anterior foi encerrado.
+        
+        Returns:
+            bool: True se a trava foi adquirida, False se outra execução está ativa
+        """
+        # Duas tentativas: a segunda após remover a trava de um dono encerrado
+        for _ in range(2):
+            try:
+                descritor = os.open(self.arquivo, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                dono = self.dono()
+                if dono is None:
+                    continue  # Liberada entre as duas chamadas
+                if self.dono_ativo(dono):
+                    return False
+                self.registrar(f"[AVISO] Trava abandonada ({self.descrever(dono)}). Retomando...")
+                self._remover_abandonada(dono)
+                continue
+            
+            self.token = uuid.uuid4().hex
+            dados = {
+                'pid': os.getpid(),
+                'host': self.host,
+                'inicio': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'token': self.token,
+            }
+            with os.fdopen(descritor, 'w', encoding='utf-8') as f:
+                json.dump(dados, f)
+            
+            self._parar_heartbeat = threading.Event()
+            threading.Thread(target=self._manter_heartbeat, args=(self._parar_heartbeat,), daemon=True).start()
+            return True
+        return False
+    
+    @contextlib.contextmanager
+    def _guarda(self):
+        """
+        Exclusão mútua entre processos para conferir e remover a trava, com uma trava do sistema
+        operacional sobre o arquivo de guarda (liberada automaticamente se o processo morrer).
+        
+        O arquivo de guarda nunca é removido: removê-lo permitiria que dois processos obtivessem
+        a guarda em arquivos diferentes.
+        """
+        with open(self.arquivo_guarda, 'a+b') as f:
+            if os.name == 'nt':
+                import msvcrt
+                f.seek(0)
+                # LK_LOCK tenta por até 10 segundos; a guarda só é mantida durante uma conferência
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    
+    def _remover_se_dono(self, token: Optional[str], heartbeat: Optional[float] = None) -> None:
+        """
+        Remove a trava se ela ainda pertencer ao token (e, se informado, mantiver o heartbeat).
+        
+        A conferência e a remoção acontecem sob a guarda: outro processo não consegue retomar
+        a trava e tê-la removida entre as duas.
+        
+        Args:
+            token: Token do dono cuja trava deve ser removida
+            heartbeat: Heartbeat lido ao decidir pela remoção; None na liberação pelo próprio dono,
+                cujo heartbeat ainda pode ser renovado durante a liberação
+        """
+        with self._guarda():
+            atual = self.dono()
+            if atual is None or atual.get('token') != token or \
+                    (heartbeat is not None and atual['heartbeat'] != heartbeat):
+                return
+            try:
+                self.arquivo.unlink()
+            except FileNotFoundError:
+                pass
+    
+    def _remover_abandonada(self, dono: dict) -> None:
+        """
+        Remove a trava de um dono encerrado, desde que ela não tenha sido retomada por outro processo.
+        
+        Args:
+            dono: Dados lidos por dono() ao decidir pela remoção
+        """
+        self._remover_se_dono(dono.get('token'), dono['heartbeat'])
+    
+    def _manter_heartbeat(self, parar: threading.Event) -> None:
+        """
+        Renova a data de modificação da trava até a liberação.
+        
+        Args:
+            parar: Evento sinalizado na liberação
+        """
+        while not parar.wait(self.intervalo_heartbeat):
+            try:
+                os.utime(self.arquivo)
+            except OSError as e:
+                self.registrar(f"[AVISO] Falha ao renovar o heartbeat da trava: {e}")
+    
+    def liberar(self) -> None:
+        """Libera a trava, se pertencer a este objeto."""
+        if self.token is None:
+            return
+        self._parar_heartbeat.set()
+        
+        self._remover_se_dono(self.token)
+        self.token = None
+    
+    def marcar_pendente(self) -> None:
+        """Registra um pedido de execução recebido enquanto outra execução está ativa."""
+        with open(self.arquivo_pendente, 'w', encoding='utf-8') as f:
+            json.dump({'pid': os.getpid(), 'host': self.host,
+                       'pedido': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}, f)
+    
+    def pendente(self) -> bool:
+        """Indica se há pedido de execução registrado."""
+        return self.arquivo_pendente.exists()
+    
+    def consumir_pendente(self) -> bool:
+        """
+        Remove o pedido de execução registrado.
+        
+        Returns:
+            bool: True se havia pedido
+        """
+        try:
+            self.arquivo_pendente.unlink()
+            return True
+        except FileNotFoundError:
+            return False